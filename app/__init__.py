@@ -4,7 +4,6 @@ from app.extensions import db, migrate, login_manager, csrf, encryptor
 from flask_wtf.csrf import CSRFProtect
 import logging
 from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from .forms import csrf
 import os
 from app.scheduler import init_scheduler
@@ -18,15 +17,15 @@ def create_app(config_class=None):
     load_dotenv(override=True)
     app = Flask(__name__)
 
-    #Initialises scheduler
-    init_scheduler(app)
-
     # Determine configuration
     if config_class:
         app.config.from_object(config_class)
     else:
         env_config = os.getenv('FLASK_ENV', 'development').capitalize() + 'Config'
         app.config.from_object(f'config.{env_config}')
+
+    #Initialises scheduler
+    init_scheduler(app)
     
     # Configure logging only outside tests
     if not app.config.get('TESTING'):
@@ -46,13 +45,14 @@ def create_app(config_class=None):
     csrf.init_app(app)
     encryptor.init_app(app)
 
-    
-    # Create jobstore within app context
-    with app.app_context():
-        app.scheduler_jobstore = SQLAlchemyJobStore(engine=db.get_engine())
+    from app.celery_app import init_celery
+    init_celery(app)
+
 
-    from app.scheduler.cli import start_scheduler
+    from app.scheduler.cli import request_histogram_command, start_scheduler, train_relevance_model_command
     app.cli.add_command(start_scheduler)
+    app.cli.add_command(train_relevance_model_command)
+    app.cli.add_command(request_histogram_command)
 
         
     # Register blueprints
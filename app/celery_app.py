@@ -0,0 +1,25 @@
+from celery import Celery
+
+celery = Celery('app')
+celery.conf.update(
+    # Acknowledge after the task has run, so a worker dying mid-scrape hands it to another
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    worker_prefetch_multiplier=1,
+    task_default_queue='default',
+    task_serializer='json',
+    accept_content=['json'],
+)
+
+
+def init_celery(app):
+    """Point the Celery app at the configured broker; nothing connects until a task is sent"""
+    celery.conf.update(
+        broker_url=app.config.get('CELERY_BROKER_URL'),
+        result_backend=app.config.get('CELERY_RESULT_BACKEND'),
+        task_always_eager=app.config.get('CELERY_TASK_ALWAYS_EAGER', False),
+    )
+    return celery
+
+
+__all__ = ['celery', 'init_celery']
@@ -1,4 +1,6 @@
 from .api import EbayAPI
+from .async_api import AsyncEbayAPI
+from .rate_limit import RateLimitExceeded, DailyQuotaExceeded
+from .records import ItemRecord
 
-__all__ = ['EbayAPI']
-
+__all__ = ['EbayAPI', 'AsyncEbayAPI', 'RateLimitExceeded', 'DailyQuotaExceeded', 'ItemRecord']
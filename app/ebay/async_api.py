@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import aiohttp
+from flask import current_app
+from tenacity import retry, retry_if_not_exception_type, wait_exponential
+from app.utils.text_helpers import filter_items_by_keywords
+from .api import EbayAPI
+from .constants import MAX_RESULT_WINDOW
+from .rate_limit import RateLimitExceeded
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 200
+
+class AsyncEbayAPI(EbayAPI):
+    """
+    asyncio flavour of EbayAPI for full scans.
+    The first page is fetched on its own to learn `total`, then the
+    remaining offsets are fetched concurrently (bounded by max_concurrency).
+    Token handling, filters and parsing are shared with EbayAPI.
+    """
+    def __init__(self, marketplace='EBAY_GB', max_concurrency=None, response_cache=None):
+        super().__init__(marketplace, response_cache=response_cache)
+        self.max_concurrency = max_concurrency or current_app.config.get('EBAY_MAX_CONCURRENT_PAGES', 4)
+
+    async def raw_search(self, keywords, filters=None, limit=200, offset=0, sort_order=None, session=None):
+        """Search with optional sorting (same response as EbayAPI.raw_search)"""
+        if session is None:
+            async with aiohttp.ClientSession() as own_session:
+                return await self.raw_search(keywords, filters, limit, offset, sort_order, session=own_session)
+
+        filters = filters or {}
+        params = self._search_params(keywords, filters, limit, offset, sort_order)
+
+        cache_key = self.response_cache.make_key(params, self.marketplace)
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        # Reading (or refreshing) the shared token locks the store and may POST to eBay,
+        # so it runs off the event loop like the rate limiter
+        headers = await asyncio.to_thread(self._search_headers)
+
+        # Only this coroutine waits for the bucket, the other pages keep going
+        await self.rate_limiter.acquire_async()
+
+        async with session.get(
+            f"{self.base_url}/item_summary/search",
+            headers=headers,
+            params=params
+        ) as response:
+            logger.debug(f"Request URL: {response.url}")
+            if response.status == 429:
+                retry_after = int(response.headers.get('Retry-After', 60))
+                self.rate_limiter.block_for(retry_after)
+                raise RateLimitExceeded(retry_after)
+            response.raise_for_status()
+            data = await response.json()
+        self.response_cache.set(cache_key, data)
+        return data
+
+    @retry(wait=wait_exponential(multiplier=1, min=2, max=10), retry=retry_if_not_exception_type(RateLimitExceeded))
+    async def custom_search_query(self, keywords, filters=None, sort_order=None, max_pages=None, marketplace=None, search_for_sold=False, required_keywords=None, excluded_keywords=None, page_size=PAGE_SIZE):
+        """
+        Same contract as EbayAPI.custom_search_query, but every page after
+        the first is requested concurrently
+        """
+        if marketplace:
+            self.marketplace = marketplace
+
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            first_page = await self.raw_search(
+                keywords=keywords,
+                filters=filters,
+                limit=page_size,
+                offset=0,
+                sort_order=sort_order,
+                session=session
+            )
+
+            # eBay will not page past MAX_RESULT_WINDOW, whatever total says
+            total = min(first_page.get('total', 0), MAX_RESULT_WINDOW)
+            offsets = range(page_size, total, page_size)
+            if max_pages is not None:
+                offsets = offsets[:max(max_pages - 1, 0)]
+
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+
+            async def fetch_page(offset):
+                async with semaphore:
+                    return await self.raw_search(
+                        keywords=keywords,
+                        filters=filters,
+                        limit=page_size,
+                        offset=offset,
+                        sort_order=sort_order,
+                        session=session
+                    )
+
+            other_pages = await asyncio.gather(*(fetch_page(offset) for offset in offsets))
+
+        returned_items = []
+        for raw_response in [first_page, *other_pages]:
+            parsed_items = self.parse_response(raw_response)
+            returned_items.extend(filter_items_by_keywords(parsed_items, required_keywords, excluded_keywords))
+
+        return self._unique_items(returned_items)
+
+
+__all__ = ['AsyncEbayAPI']
@@ -0,0 +1,118 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+import requests
+from flask import current_app
+from .shared_state import get_state_store
+
+logger = logging.getLogger(__name__)
+
+API_SCOPE = 'https://api.ebay.com/oauth/api_scope'  # Public data
+
+
+class TokenProvider:
+    """
+    Client-credentials token shared by every EbayAPI in the process.
+    The token is stored in a shared state store, so other worker
+    processes reuse it instead of requesting their own. A daemon thread
+    refreshes it `refresh_margin` seconds before expiry, so searches only
+    wait on the token endpoint when there is no valid token at all.
+    """
+    def __init__(self, client_id, client_secret, token_url, store, refresh_margin=300):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.token_url = token_url
+        self.store = store
+        self.refresh_margin = refresh_margin
+        self.state_key = f"ebay_token_{hashlib.sha256(client_id.encode()).hexdigest()[:12]}"
+
+        self.session = requests.Session()
+        self._token = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._refresher = None
+        self._refresher_pid = None
+
+    def get_token(self):
+        """Return a valid token, only blocking if none is cached anywhere"""
+        if not self._is_valid(self._expires_at):
+            with self._lock:
+                if not self._is_valid(self._expires_at):
+                    self._adopt(self.store.read(self.state_key))
+                if not self._is_valid(self._expires_at):
+                    self.refresh()
+        self._ensure_refresher()
+        return self._token
+
+    def refresh(self, force=False):
+        """Fetch a new token unless another thread/process just did"""
+        with self.store.transaction(self.state_key) as state:
+            if not force and self._is_valid(state.get('expires_at', 0), margin=self.refresh_margin):
+                self._adopt(state)
+                return self._token
+
+            response = self.session.post(
+                self.token_url,
+                auth=(self.client_id, self.client_secret),
+                headers={'Content-Type': 'application/x-www-form-urlencoded'},
+                data={'grant_type': 'client_credentials', 'scope': API_SCOPE}
+            )
+            response.raise_for_status()
+            token_data = response.json()
+
+            state['access_token'] = token_data['access_token']
+            state['expires_at'] = time.time() + token_data['expires_in']
+            self._adopt(state)
+            logger.debug("Fetched new eBay access token")
+            return self._token
+
+    def _adopt(self, state):
+        if state.get('access_token') and state.get('expires_at', 0) > self._expires_at:
+            self._token = state['access_token']
+            self._expires_at = state['expires_at']
+
+    def _is_valid(self, expires_at, margin=30):
+        return time.time() < expires_at - margin
+
+    def _ensure_refresher(self):
+        # Threads do not survive a fork, so check the pid as well
+        if self._refresher and self._refresher.is_alive() and self._refresher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._refresher and self._refresher.is_alive() and self._refresher_pid == os.getpid():
+                return
+            self._refresher = threading.Thread(target=self._refresh_loop, name='ebay-token-refresher', daemon=True)
+            self._refresher_pid = os.getpid()
+            self._refresher.start()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(max(self._expires_at - self.refresh_margin - time.time(), 5))
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Background token refresh failed: {str(e)}")
+
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+def get_token_provider(client_id, client_secret, token_url, config=None):
+    """Process-wide TokenProvider for these credentials"""
+    config = config or current_app.config
+    key = (client_id, token_url)
+    with _providers_lock:
+        if key not in _providers:
+            _providers[key] = TokenProvider(
+                client_id,
+                client_secret,
+                token_url,
+                get_state_store(config['EBAY_SHARED_STATE_URL']),
+                refresh_margin=config.get('EBAY_TOKEN_REFRESH_MARGIN', 300)
+            )
+        return _providers[key]
+
+
+__all__ = ['TokenProvider', 'get_token_provider']
@@ -0,0 +1,137 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+
+
+class ResponseCache:
+    """
+    Cache for raw Browse API search responses.
+    An in-process LRU with a TTL, optionally backed by gzip-compressed
+    files on disk so other worker processes (and restarts) can reuse them.
+    """
+    def __init__(self, max_entries=512, ttl=60, directory=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.directory = directory
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._entries = OrderedDict()  # key -> (expires_at, response)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(params, marketplace):
+        """Stable key for a search request (q is case and whitespace insensitive)"""
+        normalized = [
+            marketplace,
+            ' '.join(str(params.get('q', '')).lower().split()),
+            params.get('filter', ''),
+            params.get('sort', ''),
+            int(params.get('offset', 0)),
+            int(params.get('limit', 0)),
+        ]
+        return hashlib.sha256(json.dumps(normalized).encode()).hexdigest()
+
+    def get(self, key):
+        if self.ttl <= 0:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self._entries.pop(key, None)
+
+        entry = self._read_disk(key)
+        if entry and entry[0] > now:
+            with self._lock:
+                self._store(key, entry)
+                self.disk_hits += 1
+            return entry[1]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, response):
+        if self.ttl <= 0:
+            return
+        entry = (time.time() + self.ttl, response)
+        with self._lock:
+            self._store(key, entry)
+        self._write_disk(key, entry)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.disk_hits = self.misses = 0
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json.gz")
+
+    def _read_disk(self, key):
+        if not self.directory:
+            return None
+        try:
+            with gzip.open(self._disk_path(key), 'rt') as f:
+                data = json.load(f)
+            return data['expires_at'], data['response']
+        except (FileNotFoundError, ValueError, KeyError, OSError):
+            return None
+
+    def _write_disk(self, key, entry):
+        if not self.directory:
+            return
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, 'wt') as f:
+            json.dump({'expires_at': entry[0], 'response': entry[1]}, f)
+        os.replace(tmp_path, path)
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_response_cache(config=None):
+    """Process-wide ResponseCache built from the app config"""
+    config = config or current_app.config
+    settings = (
+        config.get('EBAY_RESPONSE_CACHE_SIZE', 512),
+        config.get('EBAY_RESPONSE_CACHE_TTL', 60),
+        config.get('EBAY_RESPONSE_CACHE_DIR'),
+    )
+    with _caches_lock:
+        if settings not in _caches:
+            _caches[settings] = ResponseCache(*settings)
+        return _caches[settings]
+
+
+__all__ = ['ResponseCache', 'get_response_cache']
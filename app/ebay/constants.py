@@ -6,6 +6,9 @@ CONDITION_IDS = {
     'seller_refurbished': '2500'
 }
 
+# The Browse API will not return results past this offset
+MAX_RESULT_WINDOW = 10000
+
 TIER_LIMITS = {
     'free': 0,
     'individual': 1500,
@@ -101,4 +104,4 @@ MARKETPLACE_IDS = {
     }
 }
 
-__all__ = ['CONDITION_IDS', 'MARKETPLACE_IDS']  # Explicit exports 
\ No newline at end of file
+__all__ = ['CONDITION_IDS', 'MARKETPLACE_IDS', 'MAX_RESULT_WINDOW']  # Explicit exports 
\ No newline at end of file
@@ -0,0 +1,159 @@
+import asyncio
+import math
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from .shared_state import get_state_store
+
+
+class RateLimitExceeded(Exception):
+    """Raised instead of parking a worker thread when we have to back off for a while"""
+    def __init__(self, retry_after, message=None):
+        self.retry_after = retry_after
+        super().__init__(message or f"eBay rate limit reached, retry in {retry_after:.0f}s")
+
+
+class DailyQuotaExceeded(RateLimitExceeded):
+    """The daily Browse API call allowance has been used up"""
+
+
+class RateLimiter:
+    """
+    Token bucket plus a daily call ledger, kept in a shared state store so
+    every thread and worker process draws from the same allowance.
+    Short waits (bucket spacing) are slept; anything longer than max_wait,
+    including a Retry-After from eBay, raises RateLimitExceeded so the job
+    gives up its thread and runs again on its next schedule.
+    """
+    def __init__(self, store, rate, burst, daily_limit, max_wait=2.0, key='browse_rate_limit', histogram_window=600):
+        self.store = store
+        self.rate = rate
+        self.burst = burst
+        self.daily_limit = daily_limit
+        self.max_wait = max_wait
+        self.key = key
+        self.histogram_window = histogram_window
+
+    def try_acquire(self):
+        """Take one call if possible. Returns 0 on success, otherwise the seconds to wait"""
+        now = time.time()
+        with self.store.transaction(self.key) as state:
+            today = datetime.now(timezone.utc).date().isoformat()
+            if state.get('day') != today:
+                state['day'] = today
+                state['calls'] = 0
+
+            if state['calls'] >= self.daily_limit:
+                raise DailyQuotaExceeded(
+                    _seconds_until_utc_midnight(),
+                    f"Daily eBay call limit of {self.daily_limit} reached"
+                )
+
+            blocked_until = state.get('blocked_until', 0)
+            if blocked_until > now:
+                return blocked_until - now
+
+            elapsed = max(now - state.get('updated', now), 0)
+            tokens = min(self.burst, state.get('tokens', self.burst) + elapsed * self.rate)
+            state['updated'] = now
+            if tokens >= 1:
+                state['tokens'] = tokens - 1
+                state['calls'] += 1
+                self._count_second(state, now)
+                return 0
+            state['tokens'] = tokens
+            return (1 - tokens) / self.rate
+
+    def acquire(self):
+        """Block for at most max_wait per attempt until a call is available"""
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            if wait > self.max_wait:
+                raise RateLimitExceeded(wait)
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Same as acquire, but only the calling coroutine waits"""
+        while True:
+            # The store transaction locks and does file/Redis I/O, so it runs off the event loop
+            wait = await asyncio.to_thread(self.try_acquire)
+            if not wait:
+                return
+            if wait > self.max_wait:
+                raise RateLimitExceeded(wait)
+            await asyncio.sleep(wait)
+
+    def _count_second(self, state, now):
+        # Calls per wall-clock second over the last histogram_window seconds
+        per_second = state.setdefault('per_second', {})
+        second = str(int(now))
+        if second not in per_second:
+            cutoff = int(now) - self.histogram_window
+            for old in [key for key in per_second if int(key) <= cutoff]:
+                del per_second[old]
+        per_second[second] = per_second.get(second, 0) + 1
+
+    def request_histogram(self, window=None):
+        """
+        Distribution of calls per second over the last `window` seconds, idle seconds
+        included: {'histogram': {calls: seconds}, 'mean', 'max', 'p99', ...}.
+        Flat load means max and p99 stay close to the mean
+        """
+        window = min(window or self.histogram_window, self.histogram_window)
+        per_second = self.store.read(self.key).get('per_second', {})
+        now = int(time.time())
+        counts = sorted(per_second.get(str(second), 0) for second in range(now - window + 1, now + 1))
+        return {
+            'window': window,
+            'calls': sum(counts),
+            'mean': round(sum(counts) / window, 3),
+            'max': counts[-1],
+            'p99': counts[min(math.ceil(0.99 * window), window) - 1],
+            'busy_seconds': sum(1 for count in counts if count),
+            'histogram': dict(sorted(Counter(counts).items())),
+        }
+
+    def block_for(self, seconds):
+        """Stop handing out calls for `seconds` (e.g. eBay's Retry-After)"""
+        with self.store.transaction(self.key) as state:
+            state['blocked_until'] = max(state.get('blocked_until', 0), time.time() + seconds)
+
+    def usage(self):
+        """Calls made today and the daily limit"""
+        state = self.store.read(self.key)
+        today = datetime.now(timezone.utc).date().isoformat()
+        calls = state.get('calls', 0) if state.get('day') == today else 0
+        return {'calls': calls, 'limit': self.daily_limit, 'remaining': max(self.daily_limit - calls, 0)}
+
+
+def _seconds_until_utc_midnight():
+    now = datetime.now(timezone.utc)
+    midnight = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (midnight - now).total_seconds()
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def get_rate_limiter(config=None):
+    """Process-wide RateLimiter built from the app config"""
+    config = config or current_app.config
+    url = config['EBAY_SHARED_STATE_URL']
+    with _limiters_lock:
+        if url not in _limiters:
+            _limiters[url] = RateLimiter(
+                get_state_store(url),
+                rate=config.get('EBAY_RATE_LIMIT_PER_SECOND', 5),
+                burst=config.get('EBAY_RATE_LIMIT_BURST', 10),
+                daily_limit=config.get('EBAY_DAILY_CALL_LIMIT', 5000),
+                max_wait=config.get('EBAY_RATE_LIMIT_MAX_WAIT', 2.0),
+                histogram_window=config.get('EBAY_RATE_HISTOGRAM_WINDOW', 600)
+            )
+        return _limiters[url]
+
+
+__all__ = ['RateLimiter', 'RateLimitExceeded', 'DailyQuotaExceeded', 'get_rate_limiter']
@@ -0,0 +1,168 @@
+import hashlib
+import json
+from app.utils.parsing_helpers import parse_date
+
+
+class ItemRecord:
+    """
+    One parsed item summary from the Browse API.
+    Slotted so a full scan's worth of them stays small, and the JSON text
+    columns (categories, images, buying_options, auction_details) are only
+    encoded when the item is persisted. Supports the read-only dict
+    interface (get, [], in) that the keyword filters rely on.
+    """
+    __slots__ = (
+        'ebay_id', 'legacy_id', 'title', 'price', 'currency', 'url', 'image_url',
+        'seller', 'seller_rating', 'condition', 'location_country', 'postal_code',
+        'start_time', 'end_time', 'marketplace',
+        '_buying_options', '_auction', '_categories', '_thumbnails',
+    )
+
+    # Keys of the dict parse_response used to return
+    KEYS = (
+        'ebay_id', 'legacy_id', 'title', 'price', 'currency', 'url', 'image_url',
+        'seller', 'seller_rating', 'condition', 'location', 'start_time', 'end_time',
+        'buying_options', 'auction_details', 'categories', 'marketplace', 'images',
+    )
+
+    @classmethod
+    def from_summary(cls, item_data, default_currency):
+        """Build a record from one entry of `itemSummaries`"""
+        record = cls.__new__(cls)
+        price_info = item_data.get('price', {})
+        seller = item_data.get('seller', {})
+        location = item_data.get('itemLocation', {})
+
+        record.ebay_id = item_data.get('itemId')
+        record.legacy_id = item_data.get('legacyItemId')
+        record.title = item_data.get('title', 'No Title')
+        record.price = float(price_info.get('value', 0))
+        record.currency = price_info.get('currency', default_currency)
+        record.url = item_data.get('itemWebUrl')
+        record.image_url = item_data.get('image', {}).get('imageUrl')
+        record.seller = seller.get('username')
+        record.seller_rating = seller.get('feedbackPercentage')
+        record.condition = item_data.get('condition')
+        record.location_country = location.get('country')
+        record.postal_code = location.get('postalCode')
+        record.start_time = parse_date(item_data.get('itemCreationDate'))
+        record.end_time = parse_date(item_data.get('itemEndDate'))
+        record.marketplace = item_data.get('listingMarketplaceId')
+
+        # Raw pieces, encoded lazily
+        record._buying_options = item_data.get('buyingOptions', [])
+        record._categories = item_data.get('categories', [])
+        record._thumbnails = item_data.get('thumbnailImages', [])
+        if 'AUCTION' in record._buying_options:
+            current_bid = item_data.get('currentBidPrice', {})
+            record._auction = (
+                item_data.get('bidCount', 0),
+                float(current_bid.get('value', 0)),
+                current_bid.get('currency', default_currency),
+                item_data.get('itemEndDate'),
+            )
+        else:
+            record._auction = None
+        return record
+
+    @property
+    def location(self):
+        return {'country': self.location_country, 'postal_code': self.postal_code}
+
+    @property
+    def buying_options(self):
+        return json.dumps(self._buying_options)
+
+    @property
+    def auction_details(self):
+        if self._auction is None:
+            return None
+        bid_count, bid_value, bid_currency, end_time = self._auction
+        return json.dumps({
+            'bid_count': bid_count,
+            'current_bid': {'value': bid_value, 'currency': bid_currency},
+            'end_time': end_time,
+            'marketplace_id': self.marketplace
+        })
+
+    @property
+    def categories(self):
+        return json.dumps({
+            'ids': [cat['categoryId'] for cat in self._categories],
+            'names': [cat['categoryName'] for cat in self._categories]
+        })
+
+    @property
+    def images(self):
+        return json.dumps({
+            'main': self.image_url,
+            'thumbnails': [img.get('imageUrl') for img in self._thumbnails]
+        })
+
+    def __getitem__(self, key):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        if key not in self.KEYS:
+            return default
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in self.KEYS
+
+    def keys(self):
+        return iter(self.KEYS)
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self.KEYS}
+
+    @property
+    def content_hash(self):
+        """
+        Hash of the parsed listing fields. Built from the raw values rather than
+        the encoded JSON columns, so it is stable across runs and databases.
+        """
+        canonical = [
+            self.ebay_id, self.legacy_id, self.title, self.price, self.currency, self.url,
+            self.image_url, self.seller, self.seller_rating, self.condition,
+            self.location_country, self.postal_code,
+            self.start_time.isoformat() if self.start_time else None,
+            self.end_time.isoformat() if self.end_time else None,
+            self.marketplace, self._buying_options, self._auction,
+            [(cat.get('categoryId'), cat.get('categoryName')) for cat in self._categories],
+            [img.get('imageUrl') for img in self._thumbnails],
+        ]
+        return hashlib.sha256(json.dumps(canonical).encode()).hexdigest()
+
+    def to_row(self):
+        """Column values for an Item row (this is where the JSON fields get encoded)"""
+        return {
+            'ebay_id': self.ebay_id,
+            'legacy_id': self.legacy_id,
+            'title': self.title,
+            'price': self.price,
+            'currency': self.currency,
+            'url': self.url,
+            'image_url': self.image_url,
+            'seller': self.seller,
+            'seller_rating': self.seller_rating,
+            'condition': self.condition,
+            'location_country': self.location_country,
+            'postal_code': self.postal_code,
+            'start_time': self.start_time,
+            'end_time': self.end_time,
+            'buying_options': self.buying_options,
+            'auction_details': self.auction_details,
+            'categories': self.categories,
+            'marketplace': self.marketplace,
+            'images': self.images,
+            'content_hash': self.content_hash,
+        }
+
+    def __repr__(self):
+        return f"<ItemRecord {self.ebay_id} {self.title!r}>"
+
+
+__all__ = ['ItemRecord']
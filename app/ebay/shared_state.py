@@ -0,0 +1,94 @@
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+import redis
+
+
+class FileStateStore:
+    """
+    Small JSON documents kept in a directory.
+    Writes are guarded by an flock so every thread and worker process on
+    the host sees the same state.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._thread_locks = {}
+        self._guard = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _thread_lock(self, key):
+        # flock is per process, so threads also need their own lock
+        with self._guard:
+            return self._thread_locks.setdefault(key, threading.Lock())
+
+    def read(self, key):
+        """Current document for key ({} if it has never been written)"""
+        try:
+            with open(self._path(key)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    @contextmanager
+    def transaction(self, key):
+        """Yield the document for key under an exclusive lock and save it afterwards"""
+        with self._thread_lock(key):
+            with open(os.path.join(self.directory, f"{key}.lock"), 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    state = self.read(key)
+                    yield state
+                    tmp_path = f"{self._path(key)}.{os.getpid()}.tmp"
+                    with open(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as f:
+                        json.dump(state, f)
+                    os.replace(tmp_path, self._path(key))
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class RedisStateStore:
+    """Same interface as FileStateStore, shared by every host using the Redis server"""
+    def __init__(self, url, prefix='ebay_browser'):
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _key(self, key):
+        return f"{self.prefix}:{key}"
+
+    def read(self, key):
+        raw = self.client.get(self._key(key))
+        return json.loads(raw) if raw else {}
+
+    @contextmanager
+    def transaction(self, key):
+        with self.client.lock(f"{self._key(key)}:lock", timeout=30, blocking_timeout=30):
+            state = self.read(key)
+            yield state
+            self.client.set(self._key(key), json.dumps(state))
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_state_store(url):
+    """
+    One store per URL per process.
+    redis:// and rediss:// URLs use Redis, anything else is a directory
+    (an optional file:// prefix is stripped).
+    """
+    with _stores_lock:
+        if url not in _stores:
+            if url.startswith(('redis://', 'rediss://')):
+                _stores[url] = RedisStateStore(url)
+            else:
+                directory = url[len('file://'):] if url.startswith('file://') else url
+                _stores[url] = FileStateStore(directory)
+        return _stores[url]
+
+
+__all__ = ['FileStateStore', 'RedisStateStore', 'get_state_store']
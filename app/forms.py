@@ -1,11 +1,19 @@
 from flask_wtf import FlaskForm
 from wtforms import FieldList, HiddenField, StringField, PasswordField, SubmitField, FloatField, SelectField, IntegerField, SelectMultipleField, DecimalField
-from wtforms.validators import DataRequired, Email, EqualTo, NumberRange, Optional, InputRequired, Regexp
+from wtforms.validators import DataRequired, Email, EqualTo, NumberRange, Optional, InputRequired, Regexp, ValidationError
 from flask_wtf.csrf import CSRFProtect
 from app.ebay.constants import MARKETPLACE_IDS
+from app.utils.search_expressions import SearchExpressionError, validate_search_expression
 
 csrf = CSRFProtect()
 
+def search_expression(form, field):
+    """Comma-separated keywords, or an expression (no commas) such as: charizard AND (holo OR "1st edition") NOT proxy"""
+    try:
+        validate_search_expression(field.data)
+    except SearchExpressionError as e:
+        raise ValidationError(f'Invalid search expression: {e}')
+
 class LoginForm(FlaskForm):
     email = StringField('Email', validators=[
         DataRequired(message='Email is required'),
@@ -38,8 +46,8 @@ class QueryForm(FlaskForm):
         'Check Every (minutes)', 
         validators=[InputRequired(), NumberRange(min=5, max=120)]
     )
-    required_keywords = StringField('Required Keywords', validators=[Optional()])
-    excluded_keywords = StringField('Excluded Keywords', validators=[Optional()])
+    required_keywords = StringField('Required Keywords', validators=[Optional(), search_expression])
+    excluded_keywords = StringField('Excluded Keywords', validators=[Optional(), search_expression])
     marketplace = SelectField(
     'Marketplace',
     choices=[
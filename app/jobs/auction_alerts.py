@@ -0,0 +1,178 @@
+import heapq
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.orm import joinedload
+from app import db
+from app.models import Item, User, UserQuery, UserQueryItems
+from app.utils.notifications import NotificationManager
+
+
+def utcnow():
+    """Naive UTC now, matching how end_time is stored"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class AuctionAlertEngine:
+    """
+    Sends auction-ending alerts at fixed lead times (12h and 1h by default)
+    before Item.end_time, independently of scraping.
+
+    Upcoming alerts sit in a min-heap of (fire_at, item_id, lead, end_time).
+    reload() tops the heap up from the end_time index: only endings beyond
+    the window already loaded, plus items stored since the last reload.
+    """
+    def __init__(self, lead_minutes=(720, 60), reload_interval=60):
+        self.leads = sorted(lead_minutes, reverse=True)
+        self.reload_interval = reload_interval
+
+        self._heap = []
+        self._scheduled = set()  # (item_id, lead) pairs on the heap
+        self._loaded_until = None
+        self._max_item_id = 0
+        self._next_reload = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def reload(self, now=None):
+        """Load endings that entered the window since the last reload"""
+        now = now or utcnow()
+        horizon = now + timedelta(minutes=self.leads[0], seconds=2 * self.reload_interval)
+        conditions = [Item.end_time > now, Item.end_time <= horizon]
+        if self._loaded_until is not None:
+            conditions.append(or_(Item.end_time > self._loaded_until, Item.item_id > self._max_item_id))
+
+        max_item_id = db.session.execute(select(func.max(Item.item_id))).scalar() or 0
+        rows = db.session.execute(select(Item.item_id, Item.end_time).where(*conditions)).all()
+        for item_id, end_time in rows:
+            self.schedule(item_id, end_time, now)
+
+        self._loaded_until = horizon
+        self._max_item_id = max_item_id
+        self._next_reload = now + timedelta(seconds=self.reload_interval)
+        return len(rows)
+
+    def schedule(self, item_id, end_time, now=None):
+        """Queue an item's alerts; lead times already passed collapse into the closest one"""
+        now = now or utcnow()
+        end_time = end_time.replace(tzinfo=None)
+        passed = [lead for lead in self.leads if end_time - timedelta(minutes=lead) <= now]
+        for lead in self.leads:
+            if lead in passed and lead != min(passed):
+                continue
+            if (item_id, lead) in self._scheduled:
+                continue
+            self._scheduled.add((item_id, lead))
+            heapq.heappush(self._heap, (end_time - timedelta(minutes=lead), item_id, lead, end_time))
+
+    def pop_due(self, now=None):
+        """Remove due alerts from the heap, returning {lead: [item_id, ...]}"""
+        now = now or utcnow()
+        closest = {}
+        while self._heap and self._heap[0][0] <= now:
+            _, item_id, lead, end_time = heapq.heappop(self._heap)
+            self._scheduled.discard((item_id, lead))
+            if end_time <= now:
+                continue
+            # If several lead times came due at once, only the closest one is sent
+            closest[item_id] = min(lead, closest.get(item_id, lead))
+
+        due = defaultdict(list)
+        for item_id, lead in closest.items():
+            due[lead].append(item_id)
+        return dict(due)
+
+    def fire(self, lead, item_ids):
+        """
+        Alert every active query tracking these items that has not had this (or a closer) alert.
+        The links are claimed with one compare-and-set UPDATE ... RETURNING before sending, so
+        when several scheduler nodes run an engine each alert goes out from exactly one of them
+        """
+        claimed = db.session.execute(
+            update(UserQueryItems).where(
+                UserQueryItems.item_id.in_(item_ids),
+                UserQueryItems.query_id.in_(select(UserQuery.query_id).where(UserQuery.is_active == True)),
+                or_(
+                    UserQueryItems.auction_alert_lead_minutes.is_(None),
+                    UserQueryItems.auction_alert_lead_minutes > lead
+                )
+            ).values(
+                auction_ending_notification_sent=True,
+                auction_alert_lead_minutes=lead
+            ).returning(UserQueryItems.query_id, UserQueryItems.item_id)
+            .execution_options(synchronize_session=False)
+        ).all()
+        db.session.commit()
+        if not claimed:
+            return 0
+
+        by_query = defaultdict(list)
+        for query_id, item_id in claimed:
+            by_query[query_id].append(item_id)
+
+        items = {item.item_id: item for item in Item.query.filter(Item.item_id.in_(item_ids))}
+        queries = UserQuery.query.options(joinedload(UserQuery.keyword)).filter(UserQuery.query_id.in_(by_query)).all()
+        users = {user.id: user for user in User.query.filter(User.id.in_({query.user_id for query in queries}))}
+        for query in queries:
+            user = users[query.user_id]
+            if not user.notification_preferences.get('auction_alerts', True):
+                continue
+            try:
+                NotificationManager.send_auction_alerts(
+                    user, [items[item_id] for item_id in by_query[query.query_id]], query.keyword.keyword_text
+                )
+            except Exception as e:
+                current_app.logger.error(f"[Auction Alerts] Sending to user {user.id} failed: {str(e)}")
+        return len(claimed)
+
+    def run_pending(self, now=None):
+        """Reload if due and fire due alerts. Returns seconds until there is more to do"""
+        now = now or utcnow()
+        if self._next_reload is None or now >= self._next_reload:
+            self.reload(now)
+        for lead, item_ids in self.pop_due(now).items():
+            self.fire(lead, item_ids)
+
+        next_event = self._next_reload
+        if self._heap:
+            next_event = min(next_event, self._heap[0][0])
+        return max((next_event - utcnow()).total_seconds(), 0.0)
+
+    def start(self, app):
+        """Run the engine on a daemon thread"""
+        def loop():
+            while not self._stop.is_set():
+                with app.app_context():
+                    try:
+                        wait = self.run_pending()
+                    except Exception as e:
+                        app.logger.error(f"[Auction Alerts] Error: {str(e)}", exc_info=True)
+                        db.session.rollback()
+                        wait = self.reload_interval
+                    finally:
+                        db.session.remove()
+                self._stop.wait(wait)
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=loop, name='auction-alerts', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+
+def start_auction_alerts(app):
+    """Start the alert engine configured by AUCTION_ALERT_LEAD_MINUTES / AUCTION_ALERT_RELOAD_SECONDS"""
+    engine = AuctionAlertEngine(
+        lead_minutes=app.config.get('AUCTION_ALERT_LEAD_MINUTES', (720, 60)),
+        reload_interval=app.config.get('AUCTION_ALERT_RELOAD_SECONDS', 60)
+    )
+    return engine.start(app)
+
+
+__all__ = ['AuctionAlertEngine', 'start_auction_alerts']
@@ -0,0 +1,9 @@
+"""
+Celery worker entry point, e.g.
+    celery -A app.jobs.celery_worker worker -Q scrape.recent.EBAY_GB,scrape.full.EBAY_GB,notifications
+"""
+from app import create_app
+from app.celery_app import celery
+import app.jobs.tasks  # Registers the tasks
+
+flask_app = create_app()
@@ -0,0 +1,161 @@
+import hashlib
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from app.models import Item, KeywordItems, KeywordItemScore, UserQueryItems
+from app.utils.tfidf import get_keyword_tfidf
+
+# INSERT ... ON CONFLICT constructs for the dialects we run on
+DIALECT_INSERTS = {
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert,
+}
+
+
+def dialect_insert(model):
+    """INSERT for the session's database that supports ON CONFLICT"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect not in DIALECT_INSERTS:
+        raise ValueError(f"Upsert ingestion does not support the {dialect} dialect")
+    return DIALECT_INSERTS[dialect](model)
+
+def upsert_items(rows):
+    """
+    Insert Item rows whose ebay_id is not stored yet; existing rows are left untouched.
+    Safe when several workers ingest the same listing at once.
+    Returns ({ebay_id: item_id} for every row, set of ebay_ids inserted by this call)
+    """
+    rows = list({row['ebay_id']: row for row in rows}.values())
+    if not rows:
+        return {}, set()
+
+    stmt = dialect_insert(Item).values(rows).on_conflict_do_nothing(
+        index_elements=['ebay_id']
+    ).returning(Item.ebay_id, Item.item_id)
+    item_ids = dict(db.session.execute(stmt).all())
+    inserted = set(item_ids)
+
+    existing = [row['ebay_id'] for row in rows if row['ebay_id'] not in inserted]
+    if existing:
+        item_ids.update(db.session.execute(
+            select(Item.ebay_id, Item.item_id).where(Item.ebay_id.in_(existing))
+        ).all())
+    return item_ids, inserted
+
+def link_keyword_items(keyword_id, item_ids, found_at):
+    """Link items to a keyword, returning the item_ids that were not linked before"""
+    if not item_ids:
+        return set()
+    stmt = dialect_insert(KeywordItems).values([
+        {'keyword_id': keyword_id, 'item_id': item_id, 'found_at': found_at}
+        for item_id in set(item_ids)
+    ]).on_conflict_do_nothing(
+        index_elements=['keyword_id', 'item_id']
+    ).returning(KeywordItems.item_id)
+    return set(db.session.execute(stmt).scalars())
+
+def link_query_items(query_id, item_ids, created_at):
+    """Link items to a user query, returning the item_ids that were not linked before"""
+    if not item_ids:
+        return set()
+    stmt = dialect_insert(UserQueryItems).values([
+        {'query_id': query_id, 'item_id': item_id, 'created_at': created_at, 'auction_ending_notification_sent': False}
+        for item_id in set(item_ids)
+    ]).on_conflict_do_nothing(
+        index_elements=['query_id', 'item_id']
+    ).returning(UserQueryItems.item_id)
+    return set(db.session.execute(stmt).scalars())
+
+def title_hash(title):
+    return hashlib.sha1((title or '').encode()).hexdigest()[:16]
+
+def cached_relevance_scores(scorer, keyword_id, titles, scored_at, min_score=None):
+    """
+    Relevance scores ({item_id: title} -> {item_id: score}) for a keyword, reusing
+    keyword_item_scores rows whose title is unchanged and storing the rest.
+    With min_score, titles that cannot clear it score None (see RelevanceScorer.score).
+    """
+    if not titles:
+        return {}
+    cached = {
+        row.item_id: row for row in db.session.execute(
+            select(
+                KeywordItemScore.item_id,
+                KeywordItemScore.title_hash,
+                KeywordItemScore.simple_hybrid_levenshtein_confidence,
+                KeywordItemScore.score_ceiling
+            ).where(
+                KeywordItemScore.keyword_id == keyword_id,
+                KeywordItemScore.item_id.in_(titles)
+            )
+        )
+    }
+
+    scores = {}
+    rows = []
+    for item_id, title in titles.items():
+        hashed = title_hash(title)
+        entry = cached.get(item_id)
+        if entry and entry.title_hash == hashed:
+            if entry.simple_hybrid_levenshtein_confidence is not None:
+                scores[item_id] = entry.simple_hybrid_levenshtein_confidence
+                continue
+            # Already known to fall short of this threshold
+            if min_score is not None and entry.score_ceiling is not None and entry.score_ceiling <= min_score:
+                scores[item_id] = None
+                continue
+
+        score = scorer.score(title, min_score)
+        scores[item_id] = score
+        rows.append({
+            'keyword_id': keyword_id,
+            'item_id': item_id,
+            'title_hash': hashed,
+            'simple_hybrid_levenshtein_confidence': score,
+            'score_ceiling': min_score if score is None else None,
+            'scored_at': scored_at,
+        })
+
+    if rows:
+        # TF-IDF cosine for the newly scored titles in one matrix operation
+        tfidf = get_keyword_tfidf(keyword_id, scorer.query, lambda: scored_titles(keyword_id))
+        new_titles = [titles[row['item_id']] for row in rows]
+        # Rescored items (retitled, or cut short before) are already counted in the document frequencies
+        tfidf.update([titles[row['item_id']] for row in rows if row['item_id'] not in cached])
+        for row, cosine in zip(rows, tfidf.cosine_similarities(new_titles)):
+            row['cosine_similarity'] = float(cosine)
+
+        insert = dialect_insert(KeywordItemScore)
+        db.session.execute(insert.values(rows).on_conflict_do_update(
+            index_elements=['keyword_id', 'item_id'],
+            set_={
+                'title_hash': insert.excluded.title_hash,
+                'simple_hybrid_levenshtein_confidence': insert.excluded.simple_hybrid_levenshtein_confidence,
+                'score_ceiling': insert.excluded.score_ceiling,
+                'cosine_similarity': insert.excluded.cosine_similarity,
+                'scored_at': insert.excluded.scored_at,
+            }
+        ))
+    return scores
+
+def load_cosine_similarities(keyword_id, item_ids):
+    """{item_id: cosine_similarity} from keyword_item_scores"""
+    if not item_ids:
+        return {}
+    return dict(db.session.execute(
+        select(KeywordItemScore.item_id, KeywordItemScore.cosine_similarity).where(
+            KeywordItemScore.keyword_id == keyword_id,
+            KeywordItemScore.item_id.in_(item_ids)
+        )
+    ).all())
+
+def scored_titles(keyword_id):
+    """Titles of every item already scored for a keyword (seeds its TF-IDF model)"""
+    return db.session.execute(
+        select(Item.title).join(KeywordItemScore, KeywordItemScore.item_id == Item.item_id).where(
+            KeywordItemScore.keyword_id == keyword_id
+        )
+    ).scalars().all()
+
+
+__all__ = ['upsert_items', 'link_keyword_items', 'link_query_items', 'cached_relevance_scores', 'load_cosine_similarities']
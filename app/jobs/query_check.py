@@ -1,13 +1,19 @@
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timedelta, timezone
 from app import db, scheduler
-from app.models import Item, ItemRelevanceFeedback, Keyword, KeywordItems, User, UserQuery, UserQueryItems
-from app.utils.levenshtein_string_similarity_helper import calculate_relevance_score
+from app.ebay.rate_limit import RateLimitExceeded
+from app.jobs.ingestion import cached_relevance_scores, link_keyword_items, link_query_items, load_cosine_similarities, upsert_items
+from app.models import Item, User, UserQuery
+from app.utils.levenshtein_string_similarity_helper import RelevanceScorer
 from app.utils.notifications import NotificationManager
-from app.utils.scraper import scrape_ebay, scrape_new_items
+from app.utils.price_history import detect_price_drops, record_price_changes
+from app.utils.relevance_model import build_features, keyword_profile, load_relevance_model
+from app.utils.scrape_coalescer import scrape_query_items, scrape_recent_query_items
 from flask import current_app
-from sqlalchemy import inspect
+from sqlalchemy import update
+from sqlalchemy.orm.attributes import set_committed_value
 from app.scheduler.core import scheduler  # Import the instance
-from app.scheduler.job_manager import add_query_jobs, remove_query_jobs
+from app.scheduler.dispatcher import utcnow
+from app.scheduler.job_manager import reconcile_query_jobs
 
 def full_scrape_job(query_id):
     app = current_app._get_current_object() if current_app else scheduler.flask_app
@@ -22,16 +28,8 @@ def full_scrape_job(query_id):
                 if not query or not query.is_active:
                     app.logger.debug(f"[Job {query_id}] Aborting - no active query")
                     return
-            # Get the kewords based on the query keyword_id
-            keywords = Keyword.query.get(query.keyword_id)
-            # Call scrape ebay with the right filters
-            items = scrape_ebay(
-                keywords.keyword_text,
-                filters={'min_price': query.min_price, 'max_price': query.max_price, 'item_location': query.item_location,'condition': query.condition},
-                required_keywords=query.required_keywords,
-                excluded_keywords=query.excluded_keywords,
-                marketplace=query.marketplace
-            )
+            # Scrape once per keyword signature and apply this query's filters locally
+            items = scrape_query_items(query)
             app.logger.debug(f"[Job {query_id}] Found {len(items)} items")
             if query.first_run == True:
                 process_items(items, query, full_scan=True, notify=False, first_run=True)
@@ -40,9 +38,12 @@ def full_scrape_job(query_id):
                 #It is not the first time the query has been run
                 process_items(items, query, full_scan=True, notify=True, first_run=False)
                         
+            # next_full_run belongs to the dispatcher, which moved it to the query's next phase slot when it claimed this run
             query.last_full_run = datetime.now(timezone.utc)
-            query.next_full_run = datetime.now(timezone.utc) + timedelta(hours=24)
             db.session.commit()
+        except RateLimitExceeded as e:
+            app.logger.warning(f"[Job {query_id}] Skipped full scrape: {str(e)}")
+            retry_after_rate_limit(query_id, 'next_full_run', e)
         except Exception as e:
             app.logger.error(f"[Job {query_id}] Error: {str(e)}", exc_info=True)
         finally:
@@ -60,17 +61,17 @@ def recent_scrape_job(query_id):
                 if not query or not query.is_active:
                     return
             try:
-                keywords = Keyword.query.get(query.keyword_id)
-                new_items = scrape_new_items(
-                    keywords.keyword_text,
-                    filters={'min_price': query.min_price, 'max_price': query.max_price, 'item_location': query.item_location,'condition': query.condition},
-                    required_keywords=query.required_keywords,
-                    excluded_keywords=query.excluded_keywords,
-                    marketplace=query.marketplace
-                )
-                process_items(new_items, query, check_existing=False, notify=True)
+                # Only listings newer than the query's high-water mark come back
+                new_items, high_water_mark = scrape_recent_query_items(query)
+                if new_items:
+                    process_items(new_items, query, check_existing=False, notify=True)
+                if high_water_mark:
+                    query.last_seen_ebay_id, query.last_seen_created_at = high_water_mark
                 query.last_recent_run = datetime.now(timezone.utc)
                 db.session.commit()
+            except RateLimitExceeded as e:
+                app.logger.warning(f"Recent scrape skipped: {e}")
+                retry_after_rate_limit(query_id, 'next_recent_run', e)
             except Exception as e:
                 app.logger.error(f"Recent scrape failed: {e}")
         except Exception as e:
@@ -84,182 +85,111 @@ def process_items(items, query, check_existing=False, full_scan=False, notify=Tr
     new_items = []
     updated_items = []
     price_drops = []
-    ending_auctions = []
-    item_columns = {c.key for c in inspect(Item).mapper.column_attrs}
+    batch_size = app.config.get('PROCESS_ITEMS_BATCH_SIZE', 500)
 
     if first_run:
         relevance_scores = []
 
-    # Get the keyword once at the start
+    # Get the keyword (and its scorer) once at the start
     keyword = query.keyword
+    scorer = RelevanceScorer(keyword.keyword_text)
     current_time = datetime.now(timezone.utc)
+    min_score = query.average_relevance_score - 0.15
 
-    for idx, item_data in enumerate(items):
-        # Remove query-specific data from item
-        item_data.pop('query_id', None)
-        item_data.pop('keywords', None)
-
-        existing = Item.query.filter_by(ebay_id=item_data['ebay_id']).first()
-
-        # Calculate the relevance score for the new item
-        relevance_score = calculate_relevance_score(query.keyword.keyword_text, item_data['title'])
-
-        if first_run:
-            relevance_scores.append(relevance_score)
-            # Find existing item globally (not per-query)
-            if existing:
-                app.logger.debug(f"[Process Items] Item {idx+1}/{len(items)}: Existing item found (ID: {existing.item_id})")
-                # Check if item needs to be linked to keyword
-                if not KeywordItems.query.filter_by(keyword_id=keyword.keyword_id, item_id=existing.item_id).first():
-                    app.logger.debug(f"[Process Items] Linking existing item {existing.item_id} to keyword {keyword.keyword_text}")
-                    db.session.add(KeywordItems(keyword_id=keyword.keyword_id, item_id=existing.item_id))
-                # Check if the item is already linked to the query
-                if not UserQueryItems.query.filter_by(query_id=query.query_id, item_id=existing.item_id).first():
-                    app.logger.debug(f"[Process Items] Linking existing item {existing.item_id} to query {query.query_id}")
-                    # If not add the link and include in new_items for notification
-                    db.session.add(UserQueryItems(query_id=query.query_id, item_id=existing.item_id, created_at=current_time))
-                    new_items.append(existing)
-            else:
-                # If we have never seen this item before, create a new global item
-                valid_data = {k: v for k, v in item_data.items() if k in item_columns}
-                new_item = Item(**valid_data)
-                db.session.add(new_item)
-                new_items.append(new_item)
-                item = new_item
-                app.logger.debug(f"[Process Items] Item {idx+1}/{len(items)}: New item created (eBay ID: {item_data['ebay_id']})")
-
-                # Flush to get the new item ID
-                db.session.flush()
-            
-                # Link to keyword
-                db.session.add(KeywordItems(
-                keyword_id=keyword.keyword_id,
-                item_id=new_item.item_id,
-                found_at=current_time
-                ))
-
-                # Link to user query
-                db.session.add(UserQueryItems(
-                query_id=query.query_id,
-                item_id=new_item.item_id,
-                auction_ending_notification_sent=False,
-                created_at=current_time
-                ))
-            
-                db.session.commit()
-        
-        else:
-            # Find existing item globally (not per-query)
-            if existing:
-                app.logger.debug(f"[Process Items] Item {idx+1}/{len(items)}: Existing item found (ID: {existing.item_id})")
-                # Check if item needs to be linked to keyword
-                if not KeywordItems.query.filter_by(keyword_id=keyword.keyword_id, item_id=existing.item_id).first() and relevance_score > query.average_relevance_score - 0.15:
-                    app.logger.debug(f"[Process Items] Linking existing item {existing.item_id} to keyword {keyword.keyword_text}")
-                    db.session.add(KeywordItems(keyword_id=keyword.keyword_id, item_id=existing.item_id))
-                # Check if the item is already linked to the query
-                if not UserQueryItems.query.filter_by(query_id=query.query_id, item_id=existing.item_id).first() and relevance_score > query.average_relevance_score - 0.15:
-                    app.logger.debug(f"[Process Items] Linking existing item {existing.item_id} to query {query.query_id}")
-                    # If not add the link and include in new_items for notification
-                    db.session.add(UserQueryItems(query_id=query.query_id, item_id=existing.item_id, created_at=current_time))
-                    new_items.append(existing)
-            else:
-                # If we have never seen this item before, create a new global item
-                valid_data = {k: v for k, v in item_data.items() if k in item_columns}
-                new_item = Item(**valid_data)
-                db.session.add(new_item)
-                new_items.append(new_item)
-                item = new_item
-                app.logger.debug(f"[Process Items] Item {idx+1}/{len(items)}: New item created (eBay ID: {item_data['ebay_id']})")
-
-                # Flush to get the new item ID
-                db.session.flush()
-            
-                # Link to keyword
-                if relevance_score > query.average_relevance_score - 0.15:  
-                    db.session.add(KeywordItems(
-                    keyword_id=keyword.keyword_id,
-                    item_id=new_item.item_id,
-                    found_at=current_time
-                    ))
-
-                # Link to user query
-                if relevance_score > query.average_relevance_score - 0.15:
-                    db.session.add(UserQueryItems(
-                    query_id=query.query_id,
-                    item_id=new_item.item_id,
-                    auction_ending_notification_sent=False,
-                    created_at=current_time
-                    ))
-            
-                db.session.commit()
-        
-        if existing:
-            item = existing
-
-        # Create/update data for ML training
-        feedback_data = {
-                'user_id': query.user_id,
-            'item_id': item.item_id,  # Use existing.item_id or new_item.item_id
-            'keyword_id': keyword.keyword_id,
-            'simple_hybrid_levenshtein_confidence': relevance_score,
-            }
-
-        feedback_entry = ItemRelevanceFeedback.query.filter_by(
-                user_id=query.user_id,
-                item_id=item.item_id,
-                keyword_id=keyword.keyword_id
-            ).first()
-
-        if feedback_entry:
-            # Update ML scores only, preserve user feedback
-            feedback_entry.simple_hybrid_levenshtein_confidence = relevance_score
-        else:
-            app.logger.debug(f"[Process Items] Item {idx+1}/{len(items)}: Item ID: {item.item_id} Keywords: {keyword.keyword_text}")
-            # New entry with simple relevance score
-            new_feedback = ItemRelevanceFeedback(**feedback_data)
-            db.session.add(new_feedback)
-        
-
-        # Update existing item if needed
-        if existing:
-            update_count = 0
-            for key in item_columns - {'item_id', 'created_at'}:
-                if key in item_data and getattr(existing, key) != item_data[key]:
-                    update_count += 1
-                    setattr(existing, key, item_data[key])
-                    existing.last_updated = current_time
-            if update_count > 0:
-                updated_items.append(existing)
-                app.logger.debug(f"[Process Items] Updated {update_count} fields for item {existing.item_id}")
-
-        # Track price changes (using first query that found the item)
-        if full_scan and existing:
-            old_price = existing.price
-            new_price = item_data.get('price')
-            if new_price and old_price and new_price < old_price:
+    # Once trained on enough feedback, the learned model also has to accept each candidate
+    model = None if first_run else load_relevance_model(min_samples=app.config.get('RELEVANCE_MODEL_MIN_SAMPLES', 50))
+
+    for start in range(0, len(items), batch_size):
+        batch = items[start:start + batch_size]
+
+        # Insert unseen items (globally, not per-query) in one statement; ON CONFLICT
+        # keeps this safe when another worker ingests the same listing
+        rows = [item_data.to_row() for item_data in batch]
+        item_ids, inserted = upsert_items(rows)
+        stored_items = load_items_by_ebay_id(item_ids)
+
+        # Relevance scores for the whole batch, shared by every query on this keyword and only
+        # computed for titles not scored before. After the first run, titles that cannot clear
+        # the query's threshold are cut short and come back as None
+        scores = cached_relevance_scores(
+            scorer,
+            keyword.keyword_id,
+            {item_ids[item_data['ebay_id']]: item_data['title'] for item_data in batch},
+            current_time,
+            min_score=None if first_run else min_score
+        )
+
+        relevant_ids = set()
+        for idx, item_data in enumerate(batch, start=start):
+            item_id = item_ids[item_data['ebay_id']]
+            relevance_score = scores[item_id]
+            if first_run:
+                relevance_scores.append(relevance_score)
+            if first_run or (relevance_score is not None and relevance_score > min_score):
+                relevant_ids.add(item_id)
+            app.logger.debug(
+                f"[Process Items] Item {idx+1}/{len(items)}: "
+                f"{'New item created' if item_data['ebay_id'] in inserted else 'Existing item found'} (ID: {item_id})"
+            )
+
+        if model and relevant_ids:
+            relevant_ids = model_relevant_ids(
+                model, scorer, keyword.keyword_id, relevant_ids, scores,
+                {item_ids[item_data['ebay_id']]: item_data for item_data in batch},
+                app.config.get('RELEVANCE_MODEL_THRESHOLD', 0.5)
+            )
+
+        # Link relevant items to the keyword and the user query
+        link_keyword_items(keyword.keyword_id, relevant_ids, current_time)
+        newly_linked = link_query_items(query.query_id, relevant_ids, current_time)
+
+        # Only items that passed the relevance checks and are new to this query get notified
+        for ebay_id in item_ids:
+            item = stored_items[ebay_id]
+            if item.item_id in newly_linked:
+                new_items.append(item)
+
+        changed_rows = []
+        for item_data, row in zip(batch, rows):
+            if item_data['ebay_id'] in inserted:
+                continue
+            existing = stored_items[item_data['ebay_id']]
+
+            # Unchanged listings are skipped without comparing any fields
+            if existing.content_hash == row['content_hash']:
+                continue
+
+            changed_rows.append(dict(row, item_id=existing.item_id, last_updated=current_time))
+            updated_items.append(existing)
+
+        # Changed items go out as one executemany UPDATE
+        if changed_rows:
+            db.session.execute(update(Item), changed_rows)
+            for row in changed_rows:
+                existing = stored_items[row['ebay_id']]
+                for key, value in row.items():
+                    set_committed_value(existing, key, value)
+            app.logger.debug(f"[Process Items] Updated {len(changed_rows)} changed items")
+
+        # Append price changes to the history, then find drops for the whole batch in one query.
+        # Drops are read from the history since this query's last full scan, so every query on
+        # the keyword sees a change even when another query's scrape wrote it
+        changed_ids = [row['item_id'] for row in changed_rows]
+        record_price_changes([item_ids[ebay_id] for ebay_id in inserted] + changed_ids, current_time)
+        if full_scan:
+            items_by_id = {item.item_id: item for item in stored_items.values()}
+            for item_id, old_price, new_price in detect_price_drops(list(items_by_id), query.last_full_run):
                 price_drops.append({
-                    'item': existing,
+                    'item': items_by_id[item_id],
                     'old_price': old_price,
                     'new_price': new_price
                 })
 
-        # Auction ending detection (now global)
-        end_time = item_data.get('end_time')
-        if end_time:
-            end_time = end_time.replace(tzinfo=timezone.utc)
-            if (end_time - current_time) < timedelta(hours=12):
-                item = existing or new_item
-                user_query_item = UserQueryItems.query.filter_by(
-                    query_id=query.query_id,
-                    item_id=item.item_id
-                ).first()
-                
-                if user_query_item and not user_query_item.auction_ending_notification_sent:
-                    ending_auctions.append(item)
-                    user_query_item.auction_ending_notification_sent = True
-    
+        # Write the batch's changes; everything commits together below
+        db.session.flush()
+
     #Updates the average relevance score for the query (only on the first run)
-    if first_run:
+    if first_run and relevance_scores:
         UserQuery.query.filter_by(query_id=query.query_id).update({
             'average_relevance_score': sum(relevance_scores) / len(relevance_scores)
         })
@@ -270,30 +200,14 @@ def process_items(items, query, check_existing=False, full_scan=False, notify=Tr
         db.session.commit()
         app.logger.debug(f"[Process Items] Commit successful")
         app.logger.debug(f"[Process Items] New items: {len(new_items)}, Updated items: {len(updated_items)}")
-        app.logger.debug(f"[Process Items] Price drops: {len(price_drops)}, Ending auctions: {len(ending_auctions)}")
-
-        if notify:
-            # Notify only for this query's user
-            user = User.query.get(query.user_id)
-            prefs = user.notification_preferences
-            notification_counts = {'new_items': 0, 'price_drops': 0, 'auction_alerts': 0}
-            
-            if new_items:
-                if new_items and prefs.get('new_items', True):
-                    notification_counts['new_items'] = len(new_items)
-                    NotificationManager.send_item_notification(user, new_items, query.keyword.keyword_text)
-
-            if price_drops:
-                if price_drops and prefs.get('price_drops', True):
-                    notification_counts['price_drops'] = len(price_drops)
-                    NotificationManager.send_price_drops(user, price_drops, query.keyword.keyword_text)
-
-            if ending_auctions:
-                if ending_auctions and prefs.get('auction_alerts', True):
-                    notification_counts['auction_alerts'] = len(ending_auctions)
-                    NotificationManager.send_auction_alerts(user, ending_auctions, query.keyword.keyword_text)
-
-            app.logger.debug(f"[Process Items] Notifications sent: {notification_counts}")
+        app.logger.debug(f"[Process Items] Price drops: {len(price_drops)}")
+
+        if notify and app.config.get('SCRAPE_BACKEND') == 'celery':
+            # Sent from the notifications queue, so Telegram latency doesn't hold up scrape workers
+            from app.jobs.tasks import enqueue_notifications
+            enqueue_notifications(query, new_items, price_drops)
+        elif notify:
+            send_query_notifications(query, new_items, price_drops)
 
         return new_items, updated_items
 
@@ -303,31 +217,72 @@ def process_items(items, query, check_existing=False, full_scan=False, notify=Tr
         raise
 
 
-# Check queries job
-def check_queries():
+# Reconcile queries job
+def reconcile_queries_job():
     app = scheduler.flask_app
     with app.app_context():
-        # Get active query UUIDs
-        active = {str(q.query_id) for q in UserQuery.query.filter_by(is_active=True).all()}
-        
-        # Get scheduled UUIDs from job IDs
-        scheduled = set()
-        for job in scheduler.get_jobs():
-            if job.id.startswith('query_'):
-                parts = job.id.split('_')
-                if len(parts) >= 3:
-                    uuid_str = '_'.join(parts[1:-1])  # Handle UUIDs with underscores
-                    scheduled.add(uuid_str)
-        
-        # Add missing jobs
-        for qid in active - scheduled:
-            add_query_jobs(qid)
-            
-        # Remove deleted jobs
-        for qid in scheduled - active:
-            remove_query_jobs(qid)
+        try:
+            changed = reconcile_query_jobs()
+            app.logger.debug(f"[Reconcile] Unscheduled {changed} changed queries")
+        finally:
+            db.session.remove()
 
 
 # ***********************
 # HELPER FUNCTIONS
-# ***********************
\ No newline at end of file
+# ***********************
+
+def retry_after_rate_limit(query_id, due_column, error):
+    """
+    The dispatcher moved next_*_run to the next slot when it claimed this run, which
+    for a full scan is a day away. Bring it back to when the back-off ends (capped)
+    """
+    delay = min(error.retry_after, current_app.config.get('SCRAPE_RATE_LIMIT_RETRY_MAX_SECONDS', 3600))
+    db.session.rollback()
+    db.session.execute(
+        update(UserQuery).where(UserQuery.query_id == query_id).values({due_column: utcnow() + timedelta(seconds=delay)})
+    )
+    db.session.commit()
+
+def load_items_by_ebay_id(ebay_ids):
+    """Stored items for these eBay IDs, keyed by ebay_id"""
+    if not ebay_ids:
+        return {}
+    return {item.ebay_id: item for item in Item.query.filter(Item.ebay_id.in_(ebay_ids))}
+
+def model_relevant_ids(model, scorer, keyword_id, candidate_ids, scores, records, threshold):
+    """The candidates the learned relevance model accepts, predicted in one batch"""
+    candidate_ids = list(candidate_ids)
+    cosines = load_cosine_similarities(keyword_id, candidate_ids)
+    profile = keyword_profile(keyword_id)
+    features = [
+        build_features(
+            scores[item_id],
+            scorer.exact_match(records[item_id]['title']),
+            cosines.get(item_id),
+            records[item_id]['price'],
+            records[item_id]['categories'],
+            profile
+        )
+        for item_id in candidate_ids
+    ]
+    accepted = model.predict(features, threshold)
+    return {item_id for item_id, keep in zip(candidate_ids, accepted) if keep}
+
+def send_query_notifications(query, new_items, price_drops):
+    """Send a query's new-item and price-drop notifications to its user"""
+    user = db.session.get(User, query.user_id)
+    prefs = user.notification_preferences
+    notification_counts = {'new_items': 0, 'price_drops': 0}
+
+    if new_items and prefs.get('new_items', True):
+        notification_counts['new_items'] = len(new_items)
+        NotificationManager.send_item_notification(user, new_items, query.keyword.keyword_text)
+
+    if price_drops and prefs.get('price_drops', True):
+        notification_counts['price_drops'] = len(price_drops)
+        NotificationManager.send_price_drops(user, price_drops, query.keyword.keyword_text)
+
+    # Auction-ending alerts are sent by the AuctionAlertEngine (app/jobs/auction_alerts.py)
+
+    current_app.logger.debug(f"[Process Items] Notifications sent: {notification_counts}")
@@ -0,0 +1,118 @@
+import json
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy import func, or_, select, update
+from app import db
+from app.jobs.ingestion import dialect_insert
+from app.models import Item, ItemRelevanceFeedback, Keyword, RelevanceModelState
+from app.utils.levenshtein_string_similarity_helper import RelevanceScorer
+from app.utils.relevance_model import RelevanceModel, build_features, keyword_profile, load_relevance_model, save_relevance_model
+
+# relevance_training_job runs this often on every scheduler node
+TRAINING_INTERVAL_HOURS = 6
+
+
+def feedback_training_data(*conditions, limit=None, sample=False):
+    """
+    Feature rows and labels for labelled feedback matching `conditions`, plus the
+    newest updated_at among them. With sample=True, `limit` random rows are taken
+    """
+    rows = db.session.execute(
+        select(ItemRelevanceFeedback, Item.title, Item.price, Item.categories, Keyword.keyword_text)
+        .join(Item, Item.item_id == ItemRelevanceFeedback.item_id)
+        .join(Keyword, Keyword.keyword_id == ItemRelevanceFeedback.keyword_id)
+        .where(ItemRelevanceFeedback.is_relevant.isnot(None), *conditions)
+        .order_by(func.random() if sample else ItemRelevanceFeedback.updated_at)
+        .limit(limit)
+    ).all()
+
+    scorers = {}
+    X, y, newest = [], [], None
+    for feedback, title, price, categories, keyword_text in rows:
+        if feedback.keyword_id not in scorers:
+            scorers[feedback.keyword_id] = RelevanceScorer(keyword_text)
+        scorer = scorers[feedback.keyword_id]
+        hybrid_score = feedback.simple_hybrid_levenshtein_confidence
+        if hybrid_score is None:
+            hybrid_score = scorer.score(title)
+        X.append(build_features(
+            hybrid_score,
+            scorer.exact_match(title),
+            feedback.cosine_similarity,
+            price,
+            categories,
+            keyword_profile(feedback.keyword_id)
+        ))
+        y.append(1.0 if feedback.is_relevant else 0.0)
+        if feedback.updated_at and (newest is None or feedback.updated_at > newest):
+            newest = feedback.updated_at
+    return X, y, newest
+
+def train_relevance_model(full=False):
+    """
+    Fold feedback labelled or relabelled since the last run into the stored
+    model, or refit from scratch on every label with full=True.
+    Returns the number of labels trained on.
+    """
+    state = db.session.get(RelevanceModelState, 'global')
+    model = None if full else load_relevance_model()
+    since = state.last_feedback_at if model is not None else None
+
+    if since is None:
+        X, y, newest = feedback_training_data()
+        if not y:
+            return 0
+        model = RelevanceModel().fit(X, y)
+    else:
+        X, y, newest = feedback_training_data(ItemRelevanceFeedback.updated_at > since)
+        if not y:
+            return 0
+        # Replaying older labels keeps a handful of new ones from dragging the weights their way
+        replay_X, replay_y, _ = feedback_training_data(
+            ItemRelevanceFeedback.updated_at <= since,
+            limit=current_app.config.get('RELEVANCE_MODEL_REPLAY_SAMPLES', 500),
+            sample=True
+        )
+        model.partial_fit(X, y, replay_X, replay_y)
+
+    samples = db.session.execute(
+        select(func.count(ItemRelevanceFeedback.id)).where(ItemRelevanceFeedback.is_relevant.isnot(None))
+    ).scalar()
+    save_relevance_model(model, samples, newest or since, datetime.now(timezone.utc))
+    current_app.logger.info(f"[Relevance Model] Trained on {len(y)} labels ({samples} total), log loss {model.log_loss(X, y):.4f}")
+    return len(y)
+
+def claim_training_run(min_age):
+    """
+    Whether this node should train now. Marks the stored model as trained
+    unless another node already did within min_age (a compare-and-set, so
+    only one node per interval wins)
+    """
+    now = datetime.now(timezone.utc)
+    # An untrained placeholder row first, so the very first run is claimed like any other
+    db.session.execute(dialect_insert(RelevanceModelState).values(
+        name='global', weights=json.dumps(RelevanceModel().weights.tolist()), samples=0
+    ).on_conflict_do_nothing(index_elements=['name']))
+    claimed = db.session.execute(
+        update(RelevanceModelState).where(
+            RelevanceModelState.name == 'global',
+            or_(RelevanceModelState.trained_at.is_(None), RelevanceModelState.trained_at < now - min_age)
+        ).values(trained_at=now).execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return bool(claimed)
+
+def relevance_training_job():
+    from app.scheduler.core import scheduler
+    app = scheduler.flask_app
+    with app.app_context():
+        try:
+            if not claim_training_run(timedelta(hours=TRAINING_INTERVAL_HOURS / 2)):
+                app.logger.debug("[Relevance Model] Trained recently by another node")
+                return
+            train_relevance_model()
+        except Exception as e:
+            app.logger.error(f"[Relevance Model] Training failed: {str(e)}", exc_info=True)
+            db.session.rollback()
+        finally:
+            db.session.remove()
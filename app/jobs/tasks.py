@@ -0,0 +1,131 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+from flask import current_app
+from sqlalchemy import select
+from app import db
+from app.celery_app import celery
+from app.ebay.shared_state import get_state_store
+from app.models import Item, UserQuery
+from app.scheduler.core import scheduler
+
+NOTIFICATION_QUEUE = 'notifications'
+# Sent notifications are remembered this long, to drop redelivered tasks
+SENT_KEY_TTL = 24 * 3600
+
+
+def scrape_queue(kind, marketplace):
+    """Queue per job type and marketplace, e.g. scrape.recent.EBAY_GB"""
+    return f"scrape.{kind}.{marketplace}"
+
+def scrape_task_id(kind, query_id, claimed_at):
+    """Same id for the same claimed run, however many times it is sent"""
+    return f"scrape.{kind}.{query_id}.{int(claimed_at.replace(tzinfo=timezone.utc).timestamp())}"
+
+
+#**********************
+#PRODUCERS
+#**********************
+
+def enqueue_scrapes(due, claimed_at):
+    """
+    Dispatcher producer (SCRAPE_BACKEND = 'celery'): send claimed jobs,
+    [(query_id, kind, interval)], to their marketplace queues
+    """
+    if not due:
+        return
+    marketplaces = dict(db.session.execute(
+        select(UserQuery.query_id, UserQuery.marketplace).where(
+            UserQuery.query_id.in_({query_id for query_id, _, _ in due})
+        )
+    ).all())
+    for query_id, kind, _ in due:
+        if query_id not in marketplaces:
+            continue
+        scrape_query.apply_async(
+            args=[kind, query_id, claimed_at.isoformat()],
+            task_id=scrape_task_id(kind, query_id, claimed_at),
+            queue=scrape_queue(kind, marketplaces[query_id] or 'EBAY_GB')
+        )
+
+def enqueue_notifications(query, new_items, price_drops):
+    """Send a query's notifications from the notifications queue"""
+    if not new_items and not price_drops:
+        return
+    new_item_ids = sorted(item.item_id for item in new_items)
+    drops = sorted((drop['item'].item_id, drop['old_price'], drop['new_price']) for drop in price_drops)
+    key = hashlib.sha1(f"{query.query_id}:{new_item_ids}:{drops}".encode()).hexdigest()
+    notify_query.apply_async(
+        args=[query.query_id, new_item_ids, drops],
+        task_id=f"notify.{key}",
+        queue=NOTIFICATION_QUEUE
+    )
+
+
+#**********************
+#TASKS
+#**********************
+
+@celery.task(name='app.jobs.tasks.scrape_query')
+def scrape_query(kind, query_id, claimed_at):
+    """Run a claimed full or recent scrape, unless a previous delivery already finished it"""
+    from app.jobs.query_check import full_scrape_job, recent_scrape_job
+    claimed_at = datetime.fromisoformat(claimed_at).replace(tzinfo=None)
+    app = scheduler.flask_app
+    with app.app_context():
+        query = db.session.get(UserQuery, query_id)
+        last_run = None
+        if query is not None:
+            last_run = query.last_full_run if kind == 'full' else query.last_recent_run
+        db.session.remove()
+        if query is None or (last_run and last_run.replace(tzinfo=None) >= claimed_at):
+            app.logger.debug(f"[Tasks] Skipping {kind} scrape of query {query_id}: already ran")
+            return False
+
+        if kind == 'full':
+            full_scrape_job(query_id)
+        else:
+            recent_scrape_job(query_id)
+        return True
+
+@celery.task(name='app.jobs.tasks.notify_query', bind=True)
+def notify_query(self, query_id, new_item_ids, drops):
+    from app.jobs.query_check import send_query_notifications
+    app = scheduler.flask_app
+    with app.app_context():
+        try:
+            store = get_state_store(current_app.config['EBAY_SHARED_STATE_URL'])
+            if self.request.id and already_sent(store, self.request.id):
+                return False
+
+            query = db.session.get(UserQuery, query_id)
+            if query is None:
+                return False
+            items = {item.item_id: item for item in Item.query.filter(
+                Item.item_id.in_(list(new_item_ids) + [item_id for item_id, _, _ in drops])
+            )}
+            send_query_notifications(
+                query,
+                [items[item_id] for item_id in new_item_ids if item_id in items],
+                [{'item': items[item_id], 'old_price': old_price, 'new_price': new_price}
+                 for item_id, old_price, new_price in drops if item_id in items]
+            )
+            if self.request.id:
+                mark_sent(store, self.request.id)
+            return True
+        finally:
+            db.session.remove()
+
+
+def already_sent(store, key):
+    return store.read('sent_notifications').get(key, 0) > time.time()
+
+def mark_sent(store, key):
+    now = time.time()
+    with store.transaction('sent_notifications') as sent:
+        for old_key in [k for k, expires_at in sent.items() if expires_at <= now]:
+            del sent[old_key]
+        sent[key] = now + SENT_KEY_TTL
+
+
+__all__ = ['scrape_queue', 'scrape_task_id', 'enqueue_scrapes', 'enqueue_notifications', 'scrape_query', 'notify_query']
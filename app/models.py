@@ -66,20 +66,35 @@ class Item(db.Model):
     location_country = db.Column(db.String(10)) 
     postal_code = db.Column(db.String(20))
     start_time = db.Column(db.DateTime)
-    end_time = db.Column(db.DateTime)
+    end_time = db.Column(db.DateTime, index=True)
     buying_options = db.Column(db.Text)
     auction_details = db.Column(db.Text)
     categories = db.Column(db.Text)
     marketplace = db.Column(db.String(20))
     images = db.Column(db.Text)
+    content_hash = db.Column(db.String(64))  # Hash of the parsed listing, see ItemRecord.content_hash
     last_updated = db.Column(db.DateTime)
     
+# Append-only: a row is only written when an item's price changes
+class PriceHistory(db.Model):
+    __tablename__ = 'price_history'
+    id = db.Column(db.Integer, primary_key=True)
+    item_id = db.Column(db.Integer, db.ForeignKey('items.item_id'), nullable=False)
+    price = db.Column(db.Float, nullable=False)
+    currency = db.Column(db.String(10))
+    recorded_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_price_history_item_recorded', 'item_id', 'recorded_at'),
+    )
+    
 class UserQueryItems(db.Model):
     __tablename__ = 'user_query_items'
     query_id = db.Column(String(36), db.ForeignKey('user_queries.query_id'), primary_key=True, nullable=False)
     item_id = db.Column(db.Integer, db.ForeignKey('items.item_id'), primary_key=True, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     auction_ending_notification_sent = db.Column(db.Boolean, default=False)
+    auction_alert_lead_minutes = db.Column(db.Integer)  # Closest lead time already alerted (e.g. 720, 60)
 
     #Relationship to UserQuery
     user_query = db.relationship('UserQuery', backref='user_query_items', lazy='joined')
@@ -96,6 +111,7 @@ class UserQuery(db.Model):
     keyword_id = db.Column(db.Integer, db.ForeignKey('keywords.keyword_id'), nullable=False)
     keyword = db.relationship('Keyword', backref='user_queries')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)  # Set by schedule changes, not by scrapes
     is_active = db.Column(db.Boolean, default=True)
 
     # Scheduling/operational
@@ -105,6 +121,11 @@ class UserQuery(db.Model):
     last_full_run = db.Column(db.DateTime)
     next_full_run = db.Column(db.DateTime)
     last_recent_run = db.Column(db.DateTime)
+    next_recent_run = db.Column(db.DateTime)
+
+    # High-water mark: newest listing seen by the recent poll
+    last_seen_ebay_id = db.Column(db.String(50))
+    last_seen_created_at = db.Column(db.DateTime)
 
     # Critical filters (indexed)
     min_price = db.Column(db.Numeric(10, 2), index=True)
@@ -119,6 +140,12 @@ class UserQuery(db.Model):
     # Relevance average score
     average_relevance_score = db.Column(db.Float, default=0.3)
 
+    # The dispatcher only reads active queries that are due soon
+    __table_args__ = (
+        db.Index('ix_user_queries_due_full', 'is_active', 'next_full_run'),
+        db.Index('ix_user_queries_due_recent', 'is_active', 'next_recent_run'),
+    )
+
 class Keyword(db.Model):
     __tablename__ = 'keywords'
     keyword_id = db.Column(db.Integer, primary_key=True)
@@ -130,6 +157,17 @@ class KeywordItems(db.Model):
     item_id = db.Column(db.Integer, db.ForeignKey('items.item_id'), primary_key=True, nullable=False)
     found_at = db.Column(db.DateTime, default=datetime.now(timezone.utc))
 
+# Relevance of an item's title to a keyword, computed once and shared by every query on the keyword
+class KeywordItemScore(db.Model):
+    __tablename__ = 'keyword_item_scores'
+    keyword_id = db.Column(db.Integer, db.ForeignKey('keywords.keyword_id'), primary_key=True, nullable=False)
+    item_id = db.Column(db.Integer, db.ForeignKey('items.item_id'), primary_key=True, nullable=False)
+    title_hash = db.Column(db.String(16), nullable=False)  # Rescored when the title changes
+    simple_hybrid_levenshtein_confidence = db.Column(db.Float)  # NULL when scoring stopped early...
+    score_ceiling = db.Column(db.Float)  # ...because the score could not exceed this
+    cosine_similarity = db.Column(db.Float)  # TF-IDF cosine between keyword and title
+    scored_at = db.Column(db.DateTime)
+
 # Feedback data to train the ML model
 class ItemRelevanceFeedback(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -140,12 +178,22 @@ class ItemRelevanceFeedback(db.Model):
     simple_hybrid_levenshtein_confidence = db.Column(db.Float)  # Optional: Hybrid confidence score
     cosine_similarity = db.Column(db.Float)  # Optional: Cosine similarity score
     created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc))
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)  # Relabels retrain the model
 
     __table_args__ = (
         db.UniqueConstraint('user_id', 'item_id', 'keyword_id', 
                           name='uq_user_item_keyword_feedback'),
     )
 
+# Weights of the learned relevance model (app/utils/relevance_model.py)
+class RelevanceModelState(db.Model):
+    __tablename__ = 'relevance_models'
+    name = db.Column(db.String(50), primary_key=True)
+    weights = db.Column(db.Text, nullable=False)  # JSON list, bias first
+    samples = db.Column(db.Integer, default=0)
+    last_feedback_at = db.Column(db.DateTime)  # Feedback labelled or relabelled up to this updated_at is in the weights
+    trained_at = db.Column(db.DateTime)
+
 class Feedback(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     feedback_type = db.Column(db.String(255))
@@ -1,11 +1,13 @@
 from flask import Blueprint, jsonify, render_template, redirect, url_for, request, flash, abort
 from flask_login import login_required, current_user
 from sqlalchemy import func
-from app.models import ItemRelevanceFeedback, Keyword, KeywordItems, UserQuery, UserQueryItems, db, Item, copy_item
+from app.models import ItemRelevanceFeedback, Keyword, KeywordItems, KeywordItemScore, UserQuery, UserQueryItems, db, Item, copy_item
 from app.forms import QueryForm, DeleteForm  # Create this form if needed
 from flask import current_app
 from datetime import datetime, timezone
 from app.utils.query_helpers import update_user_usage
+from app.scheduler.job_manager import add_query_jobs, remove_query_jobs, reschedule_query_jobs
+from app.utils.price_history import item_price_series, keyword_price_series
 
 bp = Blueprint('queries', __name__, url_prefix='/queries')
 
@@ -64,6 +66,7 @@ def edit_query(query_id):
             user_query.updated_at = datetime.now(timezone.utc)
             
             db.session.commit()
+            reschedule_query_jobs(user_query.query_id)
             flash('Query updated successfully', 'success')
             return redirect(url_for('queries.manage_queries'))
             
@@ -99,6 +102,7 @@ def delete_query(query_id):
             raise ValueError("Usage update failed during deletion")
             
         db.session.commit()
+        remove_query_jobs(query_id)
         flash('Query deleted successfully', 'success')
         
     except Exception as e:
@@ -167,7 +171,8 @@ def create_query():
             except ValueError as e:
                 flash(str(e), 'danger')
                 return render_template('queries/create.html', form=form)
-            
+
+            add_query_jobs(new_user_query.query_id)
             return redirect(url_for('queries.manage_queries'))
         except Exception as e:
             db.session.rollback()
@@ -182,17 +187,24 @@ def create_query():
 def toggle_all_queries():
     print("Toggling all queries")
     new_state = not UserQuery.query.filter_by(user_id=current_user.id, is_active=True).count() > 0
+    toggled = []
     for query in UserQuery.query.filter_by(user_id=current_user.id).all():
         if query.is_active != new_state:
             operation = 'add' if new_state else 'remove'
             try:
                 update_user_usage(current_user, query.check_interval, operation)
                 query.is_active = new_state
+                toggled.append(query.query_id)
             except ValueError as e:
                 db.session.rollback()
                 flash(str(e), 'danger')
-                return redirect(url_for('queries.manage_queries'))
+                break
     db.session.commit()
+    for query_id in toggled:
+        if new_state:
+            add_query_jobs(query_id)
+        else:
+            remove_query_jobs(query_id)
     return redirect(url_for('queries.manage_queries'))
 
 @bp.route('/<string:query_id>/toggle', methods=['POST'])
@@ -210,6 +222,11 @@ def toggle_query(query_id):
     except ValueError as e:
         flash(str(e), 'danger')
         return redirect(url_for('queries.manage_queries'))
+
+    if query.is_active:
+        add_query_jobs(query.query_id)
+    else:
+        remove_query_jobs(query.query_id)
     
     return redirect(url_for('queries.manage_queries'))
 
@@ -240,6 +257,23 @@ def query_details(query_id):
                          stats=stats,
                          )
 
+@bp.route('/items/<int:item_id>/prices')
+@login_required
+def item_prices(item_id):
+    # Only items found by one of the user's queries
+    UserQueryItems.query.join(UserQuery).filter(
+        UserQuery.user_id == current_user.id,
+        UserQueryItems.item_id == item_id
+    ).first_or_404()
+    return jsonify({'item_id': item_id, 'prices': item_price_series(item_id)})
+
+@bp.route('/keywords/<int:keyword_id>/prices')
+@login_required
+def keyword_prices(keyword_id):
+    UserQuery.query.filter_by(user_id=current_user.id, keyword_id=keyword_id).first_or_404()
+    days = request.args.get('days', 30, type=int)
+    return jsonify({'keyword_id': keyword_id, 'days': days, 'prices': keyword_price_series(keyword_id, days)})
+
 @bp.route('/feedback/<string:query_id>/<int:item_id>', methods=['POST'])
 @login_required
 def submit_feedback(query_id, item_id):
@@ -262,11 +296,15 @@ def submit_feedback(query_id, item_id):
     if feedback_entry:
         feedback_entry.is_relevant = (feedback == 'relevant')
     else:
+        # Feedback rows are only created here, copying the keyword's shared scores
+        score = KeywordItemScore.query.get((user_query_item.user_query.keyword_id, user_query_item.item_id))
         feedback_entry = ItemRelevanceFeedback(
             user_id=current_user.id,
             item_id=user_query_item.item_id,
             keyword_id=user_query_item.user_query.keyword_id,
             is_relevant=(feedback == 'relevant'),
+            simple_hybrid_levenshtein_confidence=score.simple_hybrid_levenshtein_confidence if score else None,
+            cosine_similarity=score.cosine_similarity if score else None,
             created_at=datetime.utcnow()
         )
         db.session.add(feedback_entry)
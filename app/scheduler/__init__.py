@@ -1,14 +1,24 @@
 from flask import current_app
-from app.jobs.query_check import check_queries
+from app.jobs.query_check import reconcile_queries_job
+from app.jobs.relevance_training import TRAINING_INTERVAL_HOURS
 from .core import scheduler
 
 
 def init_scheduler(flask_app):
     scheduler.flask_app = flask_app
+    # Schedule changes reach the dispatcher through its reloads (see job_manager); this trims its queue
     scheduler.add_job(
-        check_queries,
+        reconcile_queries_job,
         'interval',
-        seconds=30,
-        id='query_check',
+        minutes=flask_app.config.get('QUERY_RECONCILE_MINUTES', 15),
+        id='query_reconcile',
+        replace_existing=True
+    )
+    # Fold new relevance feedback into the learned model
+    scheduler.add_job(
+        'app.jobs.relevance_training:relevance_training_job',
+        'interval',
+        hours=TRAINING_INTERVAL_HOURS,
+        id='relevance_model_training',
         replace_existing=True
     )
\ No newline at end of file
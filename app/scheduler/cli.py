@@ -1,14 +1,39 @@
 import click
 import time
-from .core import scheduler
+from .core import scheduler, start_background_scheduler
+from app.jobs.auction_alerts import start_auction_alerts
+from .dispatcher import start_query_dispatcher
 
 @click.command("start-scheduler")
 def start_scheduler():
     try:
-        scheduler.start()
+        start_background_scheduler(scheduler.flask_app)
+        dispatcher = start_query_dispatcher(scheduler.flask_app)
+        auction_alerts = start_auction_alerts(scheduler.flask_app)
         click.echo("Scheduler running. Ctrl+C to stop")
         while True:
             time.sleep(1)
     except KeyboardInterrupt:
+        auction_alerts.stop()
+        dispatcher.stop()
         scheduler.shutdown()
-        click.echo("Scheduler stopped")
\ No newline at end of file
+        click.echo("Scheduler stopped")
+
+@click.command("train-relevance-model")
+@click.option('--full', is_flag=True, help='Refit on every label instead of warm starting')
+def train_relevance_model_command(full):
+    from app.jobs.relevance_training import train_relevance_model
+    with scheduler.flask_app.app_context():
+        labels = train_relevance_model(full=full)
+    click.echo(f"Trained relevance model on {labels} new labels")
+
+@click.command("request-histogram")
+@click.option('--window', default=300, help='Seconds to look back')
+def request_histogram_command(window):
+    """How many seconds saw each number of eBay calls; a flat load has no tall right tail"""
+    from app.ebay.rate_limit import get_rate_limiter
+    with scheduler.flask_app.app_context():
+        stats = get_rate_limiter().request_histogram(window)
+    click.echo(f"{stats['calls']} calls in {stats['window']}s: mean {stats['mean']}/s, p99 {stats['p99']}/s, max {stats['max']}/s")
+    for calls, seconds in stats['histogram'].items():
+        click.echo(f"{calls:>4}/s {seconds:>5}s {'#' * max(1, 60 * seconds // stats['window'])}")
\ No newline at end of file
@@ -1,17 +1,43 @@
+import redis
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.jobstores.redis import RedisJobStore
 from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from sqlalchemy import create_engine
 
-# Create engine for job store
-jobstore_engine = create_engine('sqlite:///instance/app.db')
+# Initialize scheduler; its job store is attached when it starts (see start_background_scheduler)
+scheduler = BackgroundScheduler()
 
-# Configure job store
-jobstores = {
-    'default': SQLAlchemyJobStore(
-        engine=jobstore_engine,
-        tablename='apscheduler_jobs'
-    )
-}
 
-# Initialize scheduler
-scheduler = BackgroundScheduler(jobstores=jobstores)
\ No newline at end of file
+def create_jobstore(url, pool_size=5, max_overflow=5, pool_recycle=1800, tablename='apscheduler_jobs'):
+    """
+    Job store for SCHEDULER_JOBSTORE_URL.
+    memory:// (or no URL) keeps jobs in memory, redis:// and rediss:// use Redis,
+    anything else is a SQLAlchemy URL such as postgresql://.
+    A persistent store only keeps one scheduler's jobs across restarts: APScheduler 3
+    does not support several running schedulers sharing a store, so give each node
+    its own. Running a scheduler on several nodes is safe because query runs are
+    claimed with a compare-and-set (QueryDispatcher.claim) and model training with
+    claim_training_run; reconcile is per node, as it tidies that node's queue.
+    """
+    if not url or url.startswith('memory://'):
+        return MemoryJobStore()
+    if url.startswith(('redis://', 'rediss://')):
+        pool = redis.ConnectionPool.from_url(url, max_connections=pool_size + max_overflow)
+        return RedisJobStore(connection_pool=pool)
+
+    options = {'pool_pre_ping': True}
+    if not url.startswith('sqlite'):
+        options.update(pool_size=pool_size, max_overflow=max_overflow, pool_recycle=pool_recycle)
+    return SQLAlchemyJobStore(engine=create_engine(url, **options), tablename=tablename)
+
+def start_background_scheduler(app):
+    """Attach the configured job store and start the scheduler"""
+    scheduler.add_jobstore(create_jobstore(
+        app.config.get('SCHEDULER_JOBSTORE_URL'),
+        pool_size=app.config.get('SCHEDULER_JOBSTORE_POOL_SIZE', 5),
+        max_overflow=app.config.get('SCHEDULER_JOBSTORE_MAX_OVERFLOW', 5),
+        pool_recycle=app.config.get('SCHEDULER_JOBSTORE_POOL_RECYCLE', 1800)
+    ), 'default')
+    scheduler.start()
+    return scheduler
@@ -0,0 +1,301 @@
+import heapq
+import random
+import threading
+import zlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from apscheduler.util import ref_to_obj
+from sqlalchemy import case, or_, select, update
+from app import db
+from app.models import UserQuery
+from app.utils.scrape_coalescer import scrape_signature
+
+# Full scans run once a day; recent polls every UserQuery.check_interval minutes
+FULL_SCAN_MINUTES = 24 * 60
+
+JOBS = {
+    'full': 'app.jobs.query_check:full_scrape_job',
+    'recent': 'app.jobs.query_check:recent_scrape_job',
+}
+
+DUE_COLUMNS = {
+    'full': UserQuery.next_full_run,
+    'recent': UserQuery.next_recent_run,
+}
+
+
+# What a query's phase is hashed from: the columns scrape_signature reads
+PHASE_COLUMNS = (
+    UserQuery.keyword_id,
+    UserQuery.marketplace,
+    UserQuery.item_location,
+    UserQuery.condition,
+    UserQuery.required_keywords,
+)
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def utcnow():
+    """Naive UTC now, matching how next_full_run / next_recent_run are stored"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def query_phase_key(query):
+    """
+    What a query is phased by: its scrape signature, so every query sharing a scrape
+    fires in the same slot and the coalescer can serve them from one call.
+    Takes a UserQuery or a row of PHASE_COLUMNS
+    """
+    return repr(scrape_signature(query, 'full')[1:])
+
+def phase_offset(key, period_seconds):
+    """Deterministic offset of a phase key within a period (crc32, so stable across processes and restarts)"""
+    return zlib.crc32(str(key).encode()) % max(int(period_seconds), 1)
+
+def next_phased_run(key, interval_minutes, after, jitter_seconds=0):
+    """
+    The first slot after `after` for phase key `key`, plus up to jitter_seconds of random jitter.
+    Slots repeat every interval at the key's phase offset, so different scrapes sharing
+    an interval are spread across it instead of firing together
+    """
+    period = interval_minutes * 60
+    elapsed = int((after - EPOCH).total_seconds())
+    last_slot = elapsed - (elapsed - phase_offset(key, period)) % period
+    jitter = random.uniform(0, min(jitter_seconds, period / 10))
+    return EPOCH + timedelta(seconds=last_slot + period + jitter)
+
+
+class QueryDispatcher:
+    """
+    Runs every query's full and recent scrapes from one loop instead of two
+    APScheduler jobs per query.
+
+    Due work sits in a min-heap of (due_at, query_id, kind). reload() only
+    reads queries due within the next two reload intervals, through the
+    (is_active, next_*_run) indexes, so each pass costs O(due queries).
+    Before a job is handed to the bounded executor its next_*_run is moved
+    forward (claimed), so the job is not picked up again while it runs.
+    The claim is a compare-and-set on the stored due time, so when several
+    nodes run a dispatcher each run is claimed by exactly one of them.
+    Runs are phase-smeared: each scrape signature fires at its own offset
+    within its interval (see query_phase_key and next_phased_run), so
+    subscribers to one keyword run together while different keywords are
+    spread out, and jobs that are new or were missed,
+    e.g. across a restart, are spread over catchup_seconds instead of all
+    running at once.
+    With a producer (e.g. app.jobs.tasks.enqueue_scrapes) claimed jobs are
+    handed to it instead and run by workers elsewhere.
+    """
+    def __init__(self, max_workers=8, reload_interval=30, jobs=None, producer=None, jitter_seconds=10, catchup_seconds=600):
+        self.max_workers = max_workers
+        self.reload_interval = reload_interval
+        self.jitter_seconds = jitter_seconds
+        self.catchup_seconds = catchup_seconds
+        self.jobs = dict(jobs or JOBS)
+        self.producer = producer
+
+        self._heap = []
+        self._entries = {}  # (query_id, kind) -> (due_at, interval minutes) for live heap entries
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._next_reload = None
+        self._executor = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def schedule(self, query_id, kind, due_at, interval, replace=True):
+        """Queue (or move) a query's job; an existing entry for the same job is replaced unless replace=False"""
+        with self._lock:
+            key = (query_id, kind)
+            if key in self._in_flight:
+                return
+            if key in self._entries and (not replace or self._entries[key][0] == due_at):
+                return
+            self._entries[key] = (due_at, interval)
+            heapq.heappush(self._heap, (due_at, query_id, kind))
+        self._wake.set()
+
+    def unschedule(self, query_id):
+        """Forget a query's queued jobs (stale heap entries are skipped when popped)"""
+        with self._lock:
+            for kind in self.jobs:
+                self._entries.pop((query_id, kind), None)
+
+    def queued_query_ids(self):
+        with self._lock:
+            return {query_id for query_id, _ in self._entries}
+
+    def reload(self, now=None):
+        """Queue active queries due within the next two reload intervals"""
+        now = now or utcnow()
+        horizon = now + timedelta(seconds=2 * self.reload_interval)
+        loaded = 0
+        for kind, column in DUE_COLUMNS.items():
+            conditions = [UserQuery.is_active == True, or_(column.is_(None), column <= horizon)]
+            if kind == 'recent':
+                # Recent polls start once the first full scan has set the query up
+                conditions.append(UserQuery.first_run == False)
+            rows = db.session.execute(
+                select(UserQuery.query_id, column.label('due_at'), UserQuery.check_interval, *PHASE_COLUMNS)
+                .where(*conditions)
+            ).all()
+            for row in rows:
+                query_id, due_at = row.query_id, row.due_at
+                interval = FULL_SCAN_MINUTES if kind == 'full' else row.check_interval
+                if due_at is None or due_at < now - timedelta(seconds=self.reload_interval):
+                    # New or missed: smear over the catch-up window, keeping a slot already given
+                    spread = min(interval * 60, self.catchup_seconds)
+                    due_at = now + timedelta(seconds=phase_offset(query_phase_key(row), spread))
+                    self.schedule(query_id, kind, due_at, interval, replace=False)
+                else:
+                    self.schedule(query_id, kind, due_at, interval)
+            loaded += len(rows)
+        self._next_reload = now + timedelta(seconds=self.reload_interval)
+        return loaded
+
+    def pop_due(self, now=None, limit=None):
+        """Take up to `limit` due jobs off the heap, returning [(query_id, kind, interval)]"""
+        now = now or utcnow()
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now and (limit is None or len(due) < limit):
+                due_at, query_id, kind = heapq.heappop(self._heap)
+                entry = self._entries.get((query_id, kind))
+                if entry is None or entry[0] != due_at:
+                    continue  # Rescheduled or unscheduled since it was pushed
+                del self._entries[(query_id, kind)]
+                due.append((query_id, kind, entry[1]))
+        return due
+
+    def claim(self, due, now=None):
+        """
+        Move next_*_run to each due job's next phased slot, one UPDATE ... RETURNING per kind.
+        Only rows still active and due are moved, so a job another node claimed first,
+        or one paused, deleted or moved later since it was queued, is dropped.
+        Returns the claimed jobs
+        """
+        now = now or utcnow()
+        phase_keys = {
+            row.query_id: query_phase_key(row) for row in db.session.execute(
+                select(UserQuery.query_id, *PHASE_COLUMNS).where(UserQuery.query_id.in_({job[0] for job in due}))
+            )
+        } if due else {}
+        next_runs = defaultdict(dict)
+        for query_id, kind, interval in due:
+            if query_id in phase_keys:  # Deleted since it was queued otherwise
+                next_runs[kind][query_id] = next_phased_run(phase_keys[query_id], interval, now, self.jitter_seconds)
+
+        claimed = set()
+        for kind, runs in next_runs.items():
+            column = DUE_COLUMNS[kind]
+            claimed.update((query_id, kind) for query_id in db.session.execute(
+                update(UserQuery).where(
+                    UserQuery.query_id.in_(runs),
+                    UserQuery.is_active == True,
+                    or_(column.is_(None), column <= now)
+                ).values({column.key: case(runs, value=UserQuery.query_id)})
+                .returning(UserQuery.query_id)
+                .execution_options(synchronize_session=False)
+            ).scalars())
+        db.session.commit()
+        return [job for job in due if (job[0], job[1]) in claimed]
+
+    def dispatch(self, app, now=None):
+        """Claim due jobs and submit as many as there are free workers. Returns how many were submitted"""
+        now = now or utcnow()
+        if self.producer is not None:
+            due = self.pop_due(now)
+            if due:
+                due = self.claim(due, now)
+                self.producer(due, now)
+            return len(due)
+
+        with self._lock:
+            free = self.max_workers - len(self._in_flight)
+        if free <= 0:
+            return 0
+        due = self.pop_due(now, limit=free)
+        if due:
+            due = self.claim(due, now)
+        if not due:
+            return 0
+        with self._lock:
+            self._in_flight.update((query_id, kind) for query_id, kind, _ in due)
+        for query_id, kind, _ in due:
+            self._executor.submit(self._run, app, query_id, kind)
+        return len(due)
+
+    def _run(self, app, query_id, kind):
+        try:
+            with app.app_context():
+                ref_to_obj(self.jobs[kind])(query_id)
+        except Exception as e:
+            app.logger.error(f"[Dispatcher] {kind} job for query {query_id} failed: {str(e)}", exc_info=True)
+        finally:
+            with self._lock:
+                self._in_flight.discard((query_id, kind))
+            self._wake.set()
+
+    def run_pending(self, app, now=None):
+        """Reload if due and dispatch due jobs. Returns seconds until there is more to do"""
+        now = now or utcnow()
+        if self._next_reload is None or now >= self._next_reload:
+            self.reload(now)
+        self.dispatch(app, now)
+
+        next_event = self._next_reload
+        with self._lock:
+            if self._heap and len(self._in_flight) < self.max_workers:
+                next_event = min(next_event, self._heap[0][0])
+        return max((next_event - utcnow()).total_seconds(), 0.0)
+
+    def start(self, app):
+        """Run the dispatcher loop on a daemon thread, with jobs on a bounded thread pool"""
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='query-job')
+
+        def loop():
+            while not self._stop.is_set():
+                self._wake.clear()
+                with app.app_context():
+                    try:
+                        wait = self.run_pending(app)
+                    except Exception as e:
+                        app.logger.error(f"[Dispatcher] Error: {str(e)}", exc_info=True)
+                        db.session.rollback()
+                        wait = self.reload_interval
+                    finally:
+                        db.session.remove()
+                # Woken early by schedule() or a finished job
+                self._wake.wait(wait)
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=loop, name='query-dispatcher', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        if self._executor:
+            self._executor.shutdown(wait=False)
+
+
+dispatcher = QueryDispatcher()
+
+def start_query_dispatcher(app):
+    """Start the dispatcher configured by DISPATCHER_MAX_WORKERS / DISPATCHER_RELOAD_SECONDS / SCRAPE_BACKEND"""
+    dispatcher.max_workers = app.config.get('DISPATCHER_MAX_WORKERS', 8)
+    dispatcher.reload_interval = app.config.get('DISPATCHER_RELOAD_SECONDS', 30)
+    dispatcher.jitter_seconds = app.config.get('DISPATCHER_JITTER_SECONDS', 10)
+    dispatcher.catchup_seconds = app.config.get('DISPATCHER_CATCHUP_SECONDS', 600)
+    if app.config.get('SCRAPE_BACKEND') == 'celery':
+        from app.jobs.tasks import enqueue_scrapes
+        dispatcher.producer = enqueue_scrapes
+    return dispatcher.start(app)
+
+
+__all__ = ['QueryDispatcher', 'dispatcher', 'start_query_dispatcher', 'phase_offset', 'next_phased_run', 'FULL_SCAN_MINUTES']
@@ -1,37 +1,76 @@
-from datetime import datetime
-from .core import scheduler
+from datetime import timedelta
+from flask import current_app
+from sqlalchemy import select
+from .dispatcher import dispatcher, next_phased_run, phase_offset, query_phase_key, utcnow
 from app.models import UserQuery
 from app import db
 
+# Schedule events come from the web process, so they only write next_*_run and updated_at.
+# The dispatcher in the scheduler process picks the new due times up on its next reload,
+# and its compare-and-set claim drops queued runs that were paused, deleted or moved.
+
+# Newest updated_at already reconciled; drift is only looked for after it
+_reconciled_until = None
+
 def add_query_jobs(query_id):
-    query = UserQuery.query.get(query_id)
-
-    # Full job - runs immediately and every 24h
-    scheduler.add_job(
-        'app.jobs.query_check:full_scrape_job',
-        'interval',
-        hours=24,
-        args=[query_id],
-        id=f'query_{query_id}_full',
-        next_run_time=datetime.utcnow(),  # First run now
-        misfire_grace_time=3600,  # 1 hour grace period
-        coalesce=True  # Combine missed runs
-    )
-    
-    # Recent job
-    scheduler.add_job(
-        'app.jobs.query_check:recent_scrape_job',
-        'interval',
-        minutes=query.check_interval,
-        args=[query_id],
-        id=f'query_{query_id}_recent'
-    )
-    
-    
+    """Run the query's full scan soon; its recent polls follow from next_recent_run"""
+    query = db.session.get(UserQuery, query_id)
+    if query is None or not query.is_active:
+        return
+
+    # A batch of new or re-activated queries is spread over a short window rather than all scraped at once
+    now = utcnow()
+    spread = current_app.config.get('DISPATCHER_FIRST_RUN_SPREAD_SECONDS', 120)
+    due_at = now + timedelta(seconds=phase_offset(query_phase_key(query), spread))
+    query.next_full_run = due_at
+    query.updated_at = now
+    db.session.commit()
+
+def reschedule_query_jobs(query_id):
+    """After an edit: the next recent poll follows the query's (possibly new) check interval"""
+    query = db.session.get(UserQuery, query_id)
+    if query is None or not query.is_active:
+        remove_query_jobs(query_id)
+        return
+
+    now = utcnow()
+    last_run = query.last_recent_run.replace(tzinfo=None) if query.last_recent_run else now
+    query.next_recent_run = next_phased_run(query_phase_key(query), query.check_interval, last_run)
+    query.updated_at = now
+    db.session.commit()
 
 def remove_query_jobs(query_id):
-    try:
-        scheduler.remove_job(f'query_{query_id}_recent')
-        scheduler.remove_job(f'query_{query_id}_full')
-    except LookupError:
-        pass
\ No newline at end of file
+    """After a pause or delete: mark the change so reconcile drops the query's queued jobs"""
+    query = db.session.get(UserQuery, query_id)
+    if query is not None:
+        query.updated_at = utcnow()
+        db.session.commit()
+
+def reconcile_query_jobs(now=None, overlap_seconds=60):
+    """
+    Tidy the local queue after schedule events from other processes: unschedule
+    queries changed since the last pass (the next reload requeues the active
+    ones from their stored due times) and queued queries that are no longer
+    active. Reads only changed rows and the few queued ids
+    """
+    global _reconciled_until
+    now = now or utcnow()
+    since = _reconciled_until
+    _reconciled_until = now
+    if since is None:
+        # The dispatcher's first reload already read every due query
+        return 0
+
+    # Overlap the previous window a little so clock skew between hosts can't hide a change
+    changed = set(db.session.execute(
+        select(UserQuery.query_id).where(UserQuery.updated_at >= since - timedelta(seconds=overlap_seconds))
+    ).scalars())
+    queued = dispatcher.queued_query_ids()
+    if queued:
+        active = set(db.session.execute(
+            select(UserQuery.query_id).where(UserQuery.query_id.in_(queued), UserQuery.is_active == True)
+        ).scalars())
+        changed |= queued - active
+    for query_id in changed:
+        dispatcher.unschedule(query_id)
+    return len(changed)
@@ -1,6 +1,9 @@
 import pytest
 from app import create_app, db
-from app.models import User
+from app.models import (
+    Item, ItemRelevanceFeedback, Keyword, KeywordItems, KeywordItemScore, PriceHistory,
+    RelevanceModelState, User, UserQuery, UserQueryItems
+)
 from datetime import datetime, timedelta, timezone
 
 # Fixture: Create a Flask app for testing
@@ -35,3 +38,50 @@ def test_user(app):
         db.session.add(user)
         db.session.commit()
         return user.id
+
+# Fixture: Factory for saved user queries; every row the test created is deleted afterwards
+@pytest.fixture
+def make_query(app):
+    from app.utils.relevance_model import clear_keyword_profiles
+    from app.utils.tfidf import clear_tfidf_models
+    with app.app_context():
+        def make(keyword_text='charizard', email='queries@example.com', **fields):
+            # Queries made with the same keyword or email share the row
+            user = User.query.filter_by(email=email).first() or User(email=email)
+            keyword = Keyword.query.filter_by(keyword_text=keyword_text).first() or Keyword(keyword_text=keyword_text)
+            db.session.add_all([user, keyword])
+            db.session.flush()
+            query = UserQuery(user_id=user.id, keyword_id=keyword.keyword_id, **fields)
+            db.session.add(query)
+            db.session.commit()
+            return query
+
+        yield make
+        db.session.rollback()
+        clear_keyword_profiles()
+        clear_tfidf_models()
+        for model in (RelevanceModelState, PriceHistory, KeywordItemScore, ItemRelevanceFeedback,
+                      UserQueryItems, KeywordItems, UserQuery, Item, Keyword, User):
+            model.query.delete()
+        db.session.commit()
+
+# Fixture: Local fake eBay API, with the app pointed at it
+@pytest.fixture
+def fake_ebay(app, tmp_path):
+    from app.tests.fake_ebay import FakeEbayServer
+    server = FakeEbayServer(seed=1).start()
+    previous = {key: app.config.get(key) for key in (
+        'EBAY_CLIENT_ID', 'EBAY_CLIENT_SECRET', 'EBAY_TOKEN_URL', 'EBAY_BROWSE_URL',
+        'EBAY_SHARED_STATE_URL', 'EBAY_RESPONSE_CACHE_TTL'
+    )}
+    app.config.update(
+        EBAY_CLIENT_ID='fake-client-id',
+        EBAY_CLIENT_SECRET='fake-client-secret',
+        EBAY_TOKEN_URL=server.token_url,
+        EBAY_BROWSE_URL=server.browse_url,
+        EBAY_SHARED_STATE_URL=str(tmp_path / 'ebay_state'),
+        EBAY_RESPONSE_CACHE_TTL=0
+    )
+    yield server
+    server.stop()
+    app.config.update(previous)
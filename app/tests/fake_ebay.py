@@ -0,0 +1,223 @@
+"""
+Local stand-in for the eBay OAuth and Browse search endpoints.
+
+Replays recorded `itemSummaries` fixtures with eBay's pagination (limit,
+offset, total) and can inject latency, 429s with Retry-After and 5xx
+errors, so the scrape pipeline can be tested and soak-tested offline.
+
+Run it on its own for benchmarking:
+    python -m app.tests.fake_ebay --port 8089 --scale 5000 --latency 0.2
+then point EBAY_TOKEN_URL / EBAY_BROWSE_URL at it.
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'item_summaries')
+TOKEN_PATH = '/identity/v1/oauth2/token'
+SEARCH_PATH = '/buy/browse/v1/item_summary/search'
+
+
+def load_fixture(name):
+    """itemSummaries recorded under fixtures/item_summaries/<name>.json"""
+    with open(os.path.join(FIXTURES_DIR, f"{name}.json")) as f:
+        return json.load(f)['itemSummaries']
+
+def record_fixture(api, keywords, name, max_pages=1, filters=None, sort_order='newlyListed'):
+    """Save live search results (through an EbayAPI) as a replayable fixture"""
+    summaries = []
+    for page in range(max_pages):
+        response = api.raw_search(keywords, filters=filters, limit=200, offset=page * 200, sort_order=sort_order)
+        summaries.extend(response.get('itemSummaries', []))
+        if len(response.get('itemSummaries', [])) < 200:
+            break
+    with open(os.path.join(FIXTURES_DIR, f"{name}.json"), 'w') as f:
+        json.dump({'keywords': keywords, 'itemSummaries': summaries}, f, indent=2)
+    return len(summaries)
+
+
+class FakeEbayServer:
+    """
+    Threaded HTTP server replaying fixtures.
+
+    fixtures: {keyword: [itemSummary, ...]}; unknown keywords get `default`.
+    scale: pad every result set to this many items (unique itemIds) to mimic busy keywords.
+    latency: seconds added to every search.
+    throttle_rate / error_rate: chance of a 429 / 500 per search.
+    fail_next(): queue exact failures for deterministic tests.
+    """
+    def __init__(self, fixtures=None, default=None, scale=None, latency=0.0,
+                 throttle_rate=0.0, error_rate=0.0, retry_after=1, token_ttl=7200,
+                 host='127.0.0.1', port=0, seed=None):
+        self.fixtures = {k.lower(): v for k, v in (fixtures or {}).items()}
+        self.default = default if default is not None else load_fixture('pokemon_cards')
+        self.scale = scale
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.token_ttl = token_ttl
+        self.random = random.Random(seed)
+
+        self.requests = []  # (path, params) of every search
+        self.token_calls = 0
+        self._failures = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def token_url(self):
+        return self.url + TOKEN_PATH
+
+    @property
+    def browse_url(self):
+        return self.url + '/buy/browse/v1'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def fail_next(self, status, count=1, retry_after=None):
+        """Answer the next `count` searches with `status` (429s carry Retry-After)"""
+        with self._lock:
+            self._failures.extend([(status, retry_after or self.retry_after)] * count)
+
+    def search_count(self):
+        with self._lock:
+            return len(self.requests)
+
+    def summaries_for(self, keywords):
+        summaries = self.fixtures.get((keywords or '').lower(), self.default)
+        if self.scale and summaries and len(summaries) < self.scale:
+            padded = []
+            for i in range(self.scale):
+                summary = dict(summaries[i % len(summaries)])
+                summary['itemId'] = f"v1|fake{i}|0"
+                padded.append(summary)
+            summaries = padded
+        return summaries
+
+    def _next_failure(self):
+        with self._lock:
+            if self._failures:
+                return self._failures.pop(0)
+        roll = self.random.random()
+        if roll < self.throttle_rate:
+            return 429, self.retry_after
+        if roll < self.throttle_rate + self.error_rate:
+            return 500, None
+        return None
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status, body, headers=None):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, str(value))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                if urlparse(self.path).path != TOKEN_PATH:
+                    return self._send_json(404, {'errors': [{'message': 'Not found'}]})
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                with server._lock:
+                    server.token_calls += 1
+                    token = f"fake-token-{server.token_calls}"
+                self._send_json(200, {
+                    'access_token': token,
+                    'expires_in': server.token_ttl,
+                    'token_type': 'Application Access Token'
+                })
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                if parsed.path != SEARCH_PATH:
+                    return self._send_json(404, {'errors': [{'message': 'Not found'}]})
+                if not self.headers.get('Authorization', '').startswith('Bearer fake-token-'):
+                    return self._send_json(401, {'errors': [{'message': 'Invalid access token'}]})
+
+                params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+                with server._lock:
+                    server.requests.append((parsed.path, params))
+                if server.latency:
+                    time.sleep(server.latency)
+
+                failure = server._next_failure()
+                if failure:
+                    status, retry_after = failure
+                    headers = {'Retry-After': retry_after} if status == 429 else None
+                    return self._send_json(status, {'errors': [{'message': 'Injected failure'}]}, headers)
+
+                summaries = server.summaries_for(params.get('q'))
+                limit = int(params.get('limit', 50))
+                offset = int(params.get('offset', 0))
+                body = {
+                    'href': self.path,
+                    'total': len(summaries),
+                    'limit': limit,
+                    'offset': offset,
+                }
+                page = summaries[offset:offset + limit]
+                # eBay leaves itemSummaries out entirely when a page is empty
+                if page:
+                    body['itemSummaries'] = page
+                self._send_json(200, body)
+
+        return Handler
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve a fake eBay Browse API')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--scale', type=int, default=None)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    fake = FakeEbayServer(
+        scale=args.scale,
+        latency=args.latency,
+        throttle_rate=args.throttle_rate,
+        error_rate=args.error_rate,
+        port=args.port
+    ).start()
+    print(f"EBAY_TOKEN_URL={fake.token_url}")
+    print(f"EBAY_BROWSE_URL={fake.browse_url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        fake.stop()
@@ -0,0 +1,104 @@
+import pytest
+from datetime import timedelta
+from app import db
+from app.jobs.auction_alerts import AuctionAlertEngine, utcnow
+from app.models import Item, UserQueryItems
+
+
+@pytest.fixture
+def auction_query(make_query):
+    return make_query(email='auctions@example.com').query_id
+
+def add_auction(query_id, ebay_id, ends_in):
+    item = Item(ebay_id=ebay_id, title=f'Charizard {ebay_id}', price=10.0, end_time=utcnow() + ends_in)
+    db.session.add(item)
+    db.session.flush()
+    db.session.add(UserQueryItems(query_id=query_id, item_id=item.item_id))
+    db.session.commit()
+    return item.item_id
+
+@pytest.fixture
+def sent(monkeypatch):
+    sent = []
+    monkeypatch.setattr(
+        'app.jobs.auction_alerts.NotificationManager.send_auction_alerts',
+        lambda user, items, text: sent.extend(item.ebay_id for item in items)
+    )
+    return sent
+
+#***********************
+#Heap Tests
+#***********************
+
+def test_alerts_fire_at_each_lead_time():
+    engine = AuctionAlertEngine(lead_minutes=(720, 60))
+    now = utcnow()
+    engine.schedule(1, now + timedelta(hours=13), now)
+
+    assert engine.pop_due(now) == {}
+    assert engine.pop_due(now + timedelta(hours=1, seconds=1)) == {720: [1]}
+    assert engine.pop_due(now + timedelta(hours=6)) == {}
+    assert engine.pop_due(now + timedelta(hours=12, seconds=1)) == {60: [1]}
+
+def test_passed_lead_times_collapse_to_closest():
+    engine = AuctionAlertEngine(lead_minutes=(720, 60))
+    now = utcnow()
+    engine.schedule(1, now + timedelta(minutes=30), now)
+    engine.schedule(2, now + timedelta(hours=5), now)
+
+    assert engine.pop_due(now) == {60: [1], 720: [2]}
+    assert engine.pop_due(now + timedelta(hours=4, seconds=1)) == {60: [2]}
+
+def test_ended_auctions_are_dropped():
+    engine = AuctionAlertEngine(lead_minutes=(60,))
+    now = utcnow()
+    engine.schedule(1, now + timedelta(minutes=30), now)
+    assert engine.pop_due(now + timedelta(hours=1)) == {}
+
+#***********************
+#Engine Tests
+#***********************
+
+def test_engine_alerts_once_per_lead(app, auction_query, sent):
+    with app.app_context():
+        add_auction(auction_query, 'soon', timedelta(minutes=30))
+        add_auction(auction_query, 'later', timedelta(hours=5))
+        add_auction(auction_query, 'far', timedelta(days=3))
+
+        engine = AuctionAlertEngine(lead_minutes=(720, 60))
+        engine.run_pending()
+        assert sorted(sent) == ['later', 'soon']
+
+        links = {link.item.ebay_id: link for link in UserQueryItems.query.filter_by(query_id=auction_query)}
+        assert links['soon'].auction_alert_lead_minutes == 60
+        assert links['later'].auction_alert_lead_minutes == 720
+        assert links['far'].auction_ending_notification_sent is not True
+
+        # A fresh engine (e.g. after a restart) does not repeat alerts already sent
+        AuctionAlertEngine(lead_minutes=(720, 60)).run_pending()
+        assert sorted(sent) == ['later', 'soon']
+
+def test_reload_picks_up_new_items_inside_loaded_window(app, auction_query, sent):
+    with app.app_context():
+        engine = AuctionAlertEngine(lead_minutes=(720, 60))
+        engine.run_pending()
+        add_auction(auction_query, 'new', timedelta(hours=2))
+
+        assert engine.reload() == 1
+        assert engine.reload() == 0
+        engine.run_pending()
+        assert sent == ['new']
+
+def test_each_alert_sent_from_one_node(app, auction_query, sent):
+    with app.app_context():
+        add_auction(auction_query, 'soon', timedelta(minutes=30))
+        nodes = [AuctionAlertEngine(lead_minutes=(720, 60)) for _ in range(2)]
+        now = utcnow()
+        due = []
+        for node in nodes:
+            node.reload(now)
+            due.append(node.pop_due(now))
+        # Both nodes found the alert due; only the first to claim it sends
+        assert due[0] == due[1] == {60: due[0][60]}
+        assert [node.fire(60, due[0][60]) for node in nodes] == [1, 0]
+        assert sent == ['soon']
@@ -0,0 +1,378 @@
+import threading
+import pytest
+from datetime import timedelta
+from app import db
+from app.models import User, UserQuery
+from app.scheduler.dispatcher import EPOCH, FULL_SCAN_MINUTES, QueryDispatcher, next_phased_run, phase_offset, query_phase_key, utcnow
+from app.scheduler import job_manager
+from app.scheduler.dispatcher import dispatcher as shared_dispatcher
+from app.scheduler.job_manager import add_query_jobs, reconcile_query_jobs, remove_query_jobs, reschedule_query_jobs
+from app.utils.query_helpers import pause_queries_exceeding_limit
+
+ran = []
+release = threading.Event()
+
+def record_job(query_id):
+    ran.append(query_id)
+
+def blocking_job(query_id):
+    ran.append(query_id)
+    release.wait(5)
+
+@pytest.fixture
+def queries(make_query):
+    now = utcnow()
+    queries = {
+        'new': make_query(email='dispatcher@example.com'),
+        'due': make_query(email='dispatcher@example.com', first_run=False, check_interval=5,
+                          next_full_run=now + timedelta(hours=3), next_recent_run=now - timedelta(seconds=5)),
+        'later': make_query(email='dispatcher@example.com', first_run=False, check_interval=60,
+                            next_full_run=now + timedelta(hours=3), next_recent_run=now + timedelta(minutes=30)),
+        'paused': make_query(email='dispatcher@example.com', is_active=False, first_run=False),
+    }
+    ran.clear()
+    yield {name: query.query_id for name, query in queries.items()}
+    release.set()
+
+#***********************
+#Loading Tests
+#***********************
+
+def test_reload_only_queues_active_queries_due_soon(app, queries):
+    with app.app_context():
+        dispatcher = QueryDispatcher(reload_interval=30)
+        now = utcnow()
+        assert dispatcher.reload(now) == 2
+        assert dispatcher.pop_due(now) == [(queries['due'], 'recent', 5)]
+
+        # New queries get their full scan within the catch-up window; recent polls wait for it
+        due = dispatcher.pop_due(now + timedelta(seconds=dispatcher.catchup_seconds))
+        assert due == [(queries['new'], 'full', FULL_SCAN_MINUTES)]
+        assert dispatcher.pop_due(now + timedelta(hours=1)) == []
+
+def test_missed_runs_are_smeared_over_catchup_window(app, queries):
+    with app.app_context():
+        dispatcher = QueryDispatcher(reload_interval=30, catchup_seconds=0)
+        now = utcnow()
+        dispatcher.reload(now)
+        due = dispatcher.pop_due(now)
+        assert sorted(due) == sorted([
+            (queries['new'], 'full', FULL_SCAN_MINUTES),
+            (queries['due'], 'recent', 5),
+        ])
+        assert dispatcher.pop_due(now) == []
+
+def test_reload_is_idempotent_and_unschedule_drops_entries(app, queries):
+    with app.app_context():
+        dispatcher = QueryDispatcher()
+        now = utcnow()
+        dispatcher.reload(now)
+        queued = set(dispatcher._entries.items())
+        # A later pass keeps the catch-up slot already given
+        dispatcher.reload(now + timedelta(seconds=5))
+        assert set(dispatcher._entries.items()) == queued
+        dispatcher.unschedule(queries['new'])
+        assert dispatcher.queued_query_ids() == {queries['due']}
+        assert dispatcher.pop_due(now) == [(queries['due'], 'recent', 5)]
+
+#***********************
+#Dispatch Tests
+#***********************
+
+def test_claim_moves_due_times_forward(app, queries):
+    with app.app_context():
+        dispatcher = QueryDispatcher(jitter_seconds=0, catchup_seconds=0, jobs={'full': 'app.tests.test_dispatcher:record_job', 'recent': 'app.tests.test_dispatcher:record_job'})
+        dispatcher._executor = InlineExecutor()
+        now = utcnow()
+        dispatcher.reload(now)
+        assert dispatcher.dispatch(app, now) == 2
+        assert sorted(ran) == sorted([queries['new'], queries['due']])
+
+        db.session.expire_all()
+        # Moved to the query's next phase slot within one interval
+        due = db.session.get(UserQuery, queries['due'])
+        assert now < due.next_recent_run <= now + timedelta(minutes=5)
+        assert on_phase_slot(query_phase_key(due), due.next_recent_run, 5 * 60)
+        new = db.session.get(UserQuery, queries['new'])
+        assert now < new.next_full_run <= now + timedelta(minutes=FULL_SCAN_MINUTES)
+        assert on_phase_slot(query_phase_key(new), new.next_full_run, FULL_SCAN_MINUTES * 60)
+        # Claimed, so a reload right after finds nothing due
+        dispatcher.reload(now)
+        assert dispatcher.pop_due(now) == []
+
+def test_full_scrape_keeps_claimed_phase_slot(app, queries, monkeypatch):
+    from app.jobs import query_check
+    monkeypatch.setattr(query_check, 'scrape_query_items', lambda query: [])
+    with app.app_context():
+        dispatcher = QueryDispatcher(catchup_seconds=0, jobs={'full': 'app.jobs.query_check:full_scrape_job', 'recent': 'app.tests.test_dispatcher:record_job'})
+        dispatcher._executor = InlineExecutor()
+        now = utcnow()
+        dispatcher.reload(now)
+        dispatcher.dispatch(app, now)
+
+        db.session.expire_all()
+        query = db.session.get(UserQuery, queries['new'])
+        assert query.last_full_run is not None
+        assert on_phase_slot(query_phase_key(query), query.next_full_run, FULL_SCAN_MINUTES * 60, jitter_seconds=10)
+
+def test_rate_limited_scrape_retries_after_back_off(app, make_query, fake_ebay):
+    from app.jobs.query_check import full_scrape_job
+    from app.utils.scrape_coalescer import coalescer
+    coalescer.clear()
+    fake_ebay.fail_next(429, retry_after=30)
+    with app.app_context():
+        # Claimed: the next slot is a day away
+        query_id = make_query('pokemon', next_full_run=utcnow() + timedelta(hours=24)).query_id
+        full_scrape_job(query_id)
+
+        query = db.session.get(UserQuery, query_id)
+        assert utcnow() < query.next_full_run <= utcnow() + timedelta(seconds=30)
+        assert query.first_run is True
+        assert fake_ebay.search_count() == 1
+
+def test_each_run_is_claimed_by_one_node(app, queries):
+    with app.app_context():
+        jobs = {'full': 'app.tests.test_dispatcher:record_job', 'recent': 'app.tests.test_dispatcher:record_job'}
+        nodes = [QueryDispatcher(catchup_seconds=0, jobs=jobs) for _ in range(2)]
+        now = utcnow()
+        for node in nodes:
+            node._executor = InlineExecutor()
+            node.reload(now)
+        assert [node.dispatch(app, now) for node in nodes] == [2, 0]
+        assert sorted(ran) == sorted([queries['new'], queries['due']])
+
+def test_claim_drops_jobs_paused_or_moved_since_queued(app, queries):
+    with app.app_context():
+        dispatcher = QueryDispatcher(catchup_seconds=0)
+        now = utcnow()
+        dispatcher.reload(now)
+        db.session.get(UserQuery, queries['new']).is_active = False
+        db.session.get(UserQuery, queries['due']).next_recent_run = now + timedelta(minutes=10)
+        db.session.commit()
+        assert dispatcher.claim(dispatcher.pop_due(now), now) == []
+
+def test_dispatch_bounded_by_free_workers(app, queries):
+    with app.app_context():
+        release.clear()
+        dispatcher = QueryDispatcher(max_workers=1, catchup_seconds=0, jobs={'full': 'app.tests.test_dispatcher:blocking_job', 'recent': 'app.tests.test_dispatcher:blocking_job'})
+        dispatcher.start(app)
+        try:
+            wait_for(lambda: len(ran) == 1)
+            # The other due job waits on the heap for the only worker
+            assert len(dispatcher.queued_query_ids()) == 1
+            release.set()
+            wait_for(lambda: len(ran) == 2)
+        finally:
+            dispatcher.stop()
+        assert sorted(ran) == sorted([queries['new'], queries['due']])
+
+def test_add_query_jobs_runs_full_scan_soon(app, queries):
+    with app.app_context():
+        add_query_jobs(queries['later'])
+        spread = app.config.get('DISPATCHER_FIRST_RUN_SPREAD_SECONDS', 120)
+        due_at = db.session.get(UserQuery, queries['later']).next_full_run
+        assert due_at <= utcnow() + timedelta(seconds=spread)
+        # Routes only write the schedule; the scheduler process's dispatcher reads it on reload
+        assert shared_dispatcher.queued_query_ids() == set()
+        dispatcher = QueryDispatcher()
+        dispatcher.reload(due_at)
+        assert (queries['later'], 'full', FULL_SCAN_MINUTES) in dispatcher.pop_due(due_at)
+
+        # Paused queries are not scheduled
+        add_query_jobs(queries['paused'])
+        assert db.session.get(UserQuery, queries['paused']).next_full_run is None
+
+#***********************
+#Schedule Event Tests
+#***********************
+
+def test_edit_moves_next_recent_run_to_new_interval(app, queries):
+    with app.app_context():
+        dispatcher = QueryDispatcher()
+        query = db.session.get(UserQuery, queries['later'])
+        old_due = query.next_recent_run
+        dispatcher.schedule(query.query_id, 'recent', old_due, 60)
+        last_run = utcnow() - timedelta(minutes=2)
+        query.last_recent_run = last_run
+        query.check_interval = 10
+        db.session.commit()
+
+        reschedule_query_jobs(query.query_id)
+        next_recent = db.session.get(UserQuery, queries['later']).next_recent_run
+        assert last_run < next_recent <= last_run + timedelta(minutes=10)
+
+        # The next reload queues the new due time in place of the old one
+        dispatcher.reload(next_recent)
+        assert (queries['later'], 'recent', 10) in dispatcher.pop_due(next_recent)
+        assert queries['later'] not in {query_id for query_id, _, _ in dispatcher.pop_due(old_due)}
+
+def test_pause_over_limit_stops_queued_runs(app, queries):
+    with app.app_context():
+        dispatcher = QueryDispatcher()
+        query = db.session.get(UserQuery, queries['due'])
+        user = db.session.get(User, query.user_id)
+        user.tier = {'name': 'free', 'query_limit': 0}
+        user.query_usage = 288
+        db.session.commit()
+        now = utcnow()
+        dispatcher.reload(now)
+
+        assert pause_queries_exceeding_limit(user) >= 1
+        assert db.session.get(UserQuery, queries['due']).is_active is False
+        # Still queued in the scheduler process, but no longer claimable
+        assert dispatcher.claim(dispatcher.pop_due(now), now) == []
+
+def test_reconcile_reads_only_changed_and_stale_queries(app, queries, monkeypatch):
+    with app.app_context():
+        monkeypatch.setattr(job_manager, '_reconciled_until', None)
+        UserQuery.query.update({'updated_at': utcnow() - timedelta(hours=1)})
+        db.session.commit()
+        now = utcnow()
+        # The first pass only sets the watermark
+        assert reconcile_query_jobs(now) == 0
+
+        # A query paused by another process, still queued here
+        query = db.session.get(UserQuery, queries['due'])
+        query.is_active = False
+        db.session.commit()
+        shared_dispatcher.schedule(queries['due'], 'recent', now, 5)
+        shared_dispatcher.schedule(queries['later'], 'recent', now + timedelta(minutes=30), 60)
+        # Nothing was updated since the watermark, but the paused query is dropped
+        assert reconcile_query_jobs() == 1
+        assert shared_dispatcher.queued_query_ids() == {queries['later']}
+
+        remove_query_jobs(queries['later'])
+        assert reconcile_query_jobs(utcnow()) == 1
+
+
+#***********************
+#Phase Tests
+#***********************
+
+def test_phase_offset_is_stable_and_spreads_queries():
+    assert phase_offset(42, 300) == phase_offset(42, 300)
+    offsets = [phase_offset(query_id, 300) for query_id in range(1, 101)]
+    assert all(0 <= offset < 300 for offset in offsets)
+    # 100 queries on a 5 minute interval: no second carries more than a handful
+    assert len(set(offsets)) > 70
+    assert max(offsets.count(offset) for offset in offsets) <= 3
+
+def test_next_phased_run_lands_on_slot_within_jitter():
+    now = utcnow()
+    for query_id in range(1, 50):
+        exact = next_phased_run(query_id, 5, now)
+        assert now < exact <= now + timedelta(minutes=5)
+        assert on_phase_slot(query_id, exact, 300)
+        # From the slot itself the next run is one interval later
+        assert next_phased_run(query_id, 5, exact) == exact + timedelta(minutes=5)
+
+        jittered = next_phased_run(query_id, 5, now, jitter_seconds=10)
+        assert exact <= jittered <= exact + timedelta(seconds=10)
+    # Jitter never exceeds a tenth of the interval
+    assert next_phased_run(7, 1, now, jitter_seconds=60) <= next_phased_run(7, 1, now) + timedelta(seconds=6)
+
+def test_queries_on_one_keyword_share_a_slot(app, make_query):
+    first = make_query('pokemon', next_full_run=None).query_id
+    second = make_query('pokemon', email='other@example.com', next_full_run=None).query_id
+    other = make_query('lego', next_full_run=None).query_id
+    with app.app_context():
+        dispatcher = QueryDispatcher(jitter_seconds=0, jobs={'full': 'app.tests.test_dispatcher:record_job'})
+        now = utcnow()
+        due = [(query_id, 'full', FULL_SCAN_MINUTES) for query_id in (first, second, other)]
+        assert len(dispatcher.claim(due, now)) == 3
+
+        db.session.expire_all()
+        next_runs = {query_id: db.session.get(UserQuery, query_id).next_full_run for query_id in (first, second, other)}
+        # Same scrape, same slot, so the coalescer serves both from one call
+        assert next_runs[first] == next_runs[second]
+        assert next_runs[other] != next_runs[first]
+
+def on_phase_slot(key, at, period, jitter_seconds=0):
+    return (int((at - EPOCH).total_seconds()) - phase_offset(key, period)) % period <= jitter_seconds
+
+
+class InlineExecutor:
+    def submit(self, fn, *args):
+        fn(*args)
+
+def wait_for(condition, timeout=5):
+    deadline = utcnow() + timedelta(seconds=timeout)
+    while not condition():
+        assert utcnow() < deadline, 'timed out'
+        threading.Event().wait(0.01)
+
+#***********************
+#Job Store Tests
+#***********************
+
+def test_jobstore_from_url(tmp_path):
+    from apscheduler.jobstores.memory import MemoryJobStore
+    from apscheduler.jobstores.redis import RedisJobStore
+    from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+    from app.scheduler.core import create_jobstore
+
+    assert isinstance(create_jobstore(None), MemoryJobStore)
+    assert isinstance(create_jobstore('memory://'), MemoryJobStore)
+
+    # Nothing connects until the scheduler starts
+    store = create_jobstore('redis://localhost:6379/3', pool_size=4, max_overflow=2)
+    assert isinstance(store, RedisJobStore)
+    assert store.redis.connection_pool.max_connections == 6
+
+    store = create_jobstore('postgresql://scheduler@localhost/jobs', pool_size=4, max_overflow=2)
+    assert isinstance(store, SQLAlchemyJobStore)
+    assert store.engine.pool.size() == 4
+
+    store = create_jobstore(f"sqlite:///{tmp_path / 'jobs.db'}")
+    store.start(None, 'default')
+    assert store.get_all_jobs() == []
+    store.shutdown()
+
+#***********************
+#Celery Task Tests
+#***********************
+
+def test_producer_sends_claimed_jobs_to_marketplace_queues(app, queries, monkeypatch):
+    from app.jobs import tasks
+    sent = []
+    monkeypatch.setattr(tasks.scrape_query, 'apply_async', lambda **kwargs: sent.append(kwargs))
+    with app.app_context():
+        dispatcher = QueryDispatcher(producer=tasks.enqueue_scrapes, catchup_seconds=0)
+        now = utcnow()
+        dispatcher.reload(now)
+        assert dispatcher.dispatch(app, now) == 2
+
+        queues = {kwargs['args'][1]: kwargs['queue'] for kwargs in sent}
+        assert queues == {queries['new']: 'scrape.full.EBAY_GB', queries['due']: 'scrape.recent.EBAY_GB'}
+        assert {kwargs['task_id'] for kwargs in sent} == {
+            tasks.scrape_task_id('full', queries['new'], now),
+            tasks.scrape_task_id('recent', queries['due'], now),
+        }
+        # Claimed like a local run
+        dispatcher.reload(now)
+        assert dispatcher.pop_due(now) == []
+
+def test_redelivered_scrape_is_skipped(app, queries, monkeypatch):
+    from app.jobs import query_check
+    from app.jobs.tasks import scrape_query
+    monkeypatch.setattr(query_check, 'recent_scrape_job', record_job)
+    with app.app_context():
+        claimed_at = utcnow()
+        assert scrape_query('recent', queries['due'], claimed_at.isoformat()) is True
+
+        query = db.session.get(UserQuery, queries['due'])
+        query.last_recent_run = claimed_at + timedelta(seconds=3)
+        db.session.commit()
+        assert scrape_query('recent', queries['due'], claimed_at.isoformat()) is False
+        assert ran == [queries['due']]
+
+def test_notification_task_sends_once_per_key(app, queries, monkeypatch, tmp_path):
+    from app.jobs import query_check
+    from app.jobs.tasks import notify_query
+    sent = []
+    monkeypatch.setattr(query_check, 'send_query_notifications', lambda query, items, drops: sent.append(query.query_id))
+    monkeypatch.setitem(app.config, 'EBAY_SHARED_STATE_URL', str(tmp_path / 'state'))
+    with app.app_context():
+        assert notify_query.apply(args=[queries['due'], [], []], task_id='notify.abc').get() is True
+        assert notify_query.apply(args=[queries['due'], [], []], task_id='notify.abc').get() is False
+        assert sent == [queries['due']]
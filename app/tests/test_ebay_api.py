@@ -1,12 +1,23 @@
+import asyncio
+import time
 import pytest
+import requests
 from unittest.mock import Mock
 from app.ebay.api import EbayAPI
+from app.ebay.async_api import AsyncEbayAPI
+from app.ebay.rate_limit import RateLimitExceeded
+from app.ebay.records import ItemRecord
+from app.tests.fake_ebay import load_fixture
+from app.utils.keyword_matcher import get_keyword_matcher
+from app.utils.search_expressions import SearchExpressionError, ebay_query_terms, is_expression, validate_search_expression
+from app.utils.text_helpers import filter_items_by_keywords
 
 
 
 @pytest.fixture
-def ebay_api():
-    return EbayAPI(marketplace='EBAY_GB')
+def ebay_api(app, fake_ebay):
+    with app.app_context():
+        yield EbayAPI(marketplace='EBAY_GB')
 
 @pytest.fixture
 def mock_response():
@@ -26,79 +37,119 @@ def mock_items():
         {'title': 'Pikachu Rare Card', 'price': 50}
     ]
 
-@pytest.fixture
-def mock_ebay_api(mocker, mock_items):
-    api = EbayAPI()
-    mocker.patch.object(api, 'search', return_value={'items': mock_items})
-    return api
-
 #***********************
 #Keyword Filtering Tests
 #***********************
 
-def test_required_keywords(app, mock_ebay_api, mock_items):
-    with app.app_context():
-        filtered = mock_ebay_api._filter_items(
-            mock_items, 
-            required_keywords='charizard',
-            excluded_keywords=''
-        )
-        assert len(filtered) == 2
+def test_required_keywords(mock_items):
+    filtered = filter_items_by_keywords(
+        mock_items, 
+        required_keywords='charizard',
+        excluded_keywords=''
+    )
+    assert len(filtered) == 2
 
-def test_excluded_keywords(app, mock_ebay_api, mock_items):
+def test_excluded_keywords(mock_items):
     # Test single exclusion
-    with app.app_context():
-        filtered = mock_ebay_api._filter_items(
+    filtered = filter_items_by_keywords(
         mock_items,
         required_keywords='',
         excluded_keywords='base'
     )
-        assert len(filtered) == 3
-        assert all('base' not in item['title'].lower() for item in filtered)
-    
-        # Test multiple exclusions
-        filtered = mock_ebay_api._filter_items(
+    assert len(filtered) == 3
+    assert all('base' not in item['title'].lower() for item in filtered)
+
+    # Test multiple exclusions
+    filtered = filter_items_by_keywords(
         mock_items,
         required_keywords='',
         excluded_keywords='base,shadowless'
-        )
-        assert len(filtered) == 2
+    )
+    assert len(filtered) == 2
 
-def test_combined_filters(app,mock_ebay_api, mock_items):
-    with app.app_context():
-        filtered = mock_ebay_api._filter_items(
-            mock_items,
-            required_keywords='card',
-            excluded_keywords='rare'
-        )
-        # Should get first 2 items
-        assert len(filtered) == 2
-        assert all('card' in item['title'].lower() for item in filtered)
-        assert all('rare' not in item['title'].lower() for item in filtered)
+def test_combined_filters(mock_items):
+    filtered = filter_items_by_keywords(
+        mock_items,
+        required_keywords='card',
+        excluded_keywords='rare'
+    )
+    # Should get first 2 items
+    assert len(filtered) == 2
+    assert all('card' in item['title'].lower() for item in filtered)
+    assert all('rare' not in item['title'].lower() for item in filtered)
 
-def test_empty_filters(app, mock_ebay_api, mock_items):
-    with app.app_context():
-        filtered = mock_ebay_api._filter_items(
-            mock_items,
-            required_keywords='',
-            excluded_keywords=''
-        )
+def test_empty_filters(mock_items):
+    filtered = filter_items_by_keywords(
+        mock_items,
+        required_keywords='',
+        excluded_keywords=''
+    )
     assert len(filtered) == len(mock_items)
 
-def test_no_matches(app, mock_ebay_api, mock_items):
-    with app.app_context():
-        filtered = mock_ebay_api._filter_items(
-            mock_items,
-            required_keywords='mewtwo',
-            excluded_keywords=''
-        )
+def test_no_matches(mock_items):
+    filtered = filter_items_by_keywords(
+        mock_items,
+        required_keywords='mewtwo',
+        excluded_keywords=''
+    )
     assert len(filtered) == 0
 
+def test_required_whole_words_and_excluded_substrings(mock_items):
+    # 'char' is not a whole word in any title; 'dow' is inside 'Shadowless'
+    assert filter_items_by_keywords(mock_items, 'char', '') == []
+    filtered = filter_items_by_keywords(mock_items, 'charizard, card', 'dow')
+    assert [item['title'] for item in filtered] == ['Charizard Card Holo']
+
+def test_required_keywords_sharing_a_prefix():
+    items = [{'title': 'Pokemon Card Lot'}, {'title': 'Pokemon Binder', 'description': 'fits any card'}]
+    assert filter_items_by_keywords(items, 'pokemon card,pokemon', '') == items[:1]
+    assert filter_items_by_keywords(items, 'card,pokemon', 'lot') == items[1:]
+
+def test_keyword_matcher_cached_per_signature():
+    assert get_keyword_matcher(' Charizard,holo', 'base') is get_keyword_matcher('holo,charizard', 'BASE')
+    assert get_keyword_matcher('charizard', '') is not get_keyword_matcher('charizard', 'base')
+
+def test_search_expressions():
+    items = [
+        {'title': 'Charizard Holo 1st Edition'},
+        {'title': 'Charizard Reverse Holo Proxy'},
+        {'title': 'Charizard Card', 'description': 'first edition'},
+        {'title': 'Blastoise Holo'},
+    ]
+    def titles(required, excluded=''):
+        return [item['title'] for item in filter_items_by_keywords(items, required, excluded)]
+
+    assert titles('charizard AND (holo OR "first edition")') == [item['title'] for item in items[:3]]
+    assert titles('charizard (holo OR "first edition") NOT proxy') == ['Charizard Holo 1st Edition', 'Charizard Card']
+    assert titles('holo OR blastoise', 'charizard OR pikachu') == ['Blastoise Holo']
+    # A legacy list on the other side keeps its meaning (excluded as substrings)
+    assert titles('(holo)', 'prox') == ['Charizard Holo 1st Edition', 'Blastoise Holo']
+    assert titles('"1st edition"') == ['Charizard Holo 1st Edition']
+
+def test_legacy_lists_with_operator_words_keep_their_meaning():
+    items = [{'title': 'Nintendo DS spares'}, {'title': 'Nintendo DS', 'description': 'not working'}, {'title': 'Nintendo DS Lite'}]
+    assert filter_items_by_keywords(items, '', 'spares, NOT WORKING') == items[2:]
+    assert filter_items_by_keywords(items, '', 'spares, not working') == items[2:]
+    assert not is_expression('spares, NOT WORKING')
+    assert validate_search_expression('(boxed), "mint"') is None
+
+@pytest.mark.parametrize('text', ['(holo', 'holo)', 'holo AND', 'NOT', '"1st edition', 'OR holo'])
+def test_invalid_search_expressions(text):
+    with pytest.raises(SearchExpressionError):
+        validate_search_expression(text)
+
+def test_search_expression_pushdown():
+    assert ebay_query_terms('holo, card') == ''
+    assert ebay_query_terms('holo AND (psa OR bgs) NOT proxy') == 'holo (psa, bgs)'
+    assert ebay_query_terms('"1st edition" OR shadowless') == ''
+    assert ebay_query_terms('"1st edition" holo') == '1st edition holo'
+    assert ebay_query_terms('(holo') == ''
+
 #***********************
 #Condition Filtering Tests
 #***********************
 
-def test_condition_filter_combinations(app):
+def test_condition_filter_combinations(app, fake_ebay):
     with app.app_context():
         api = EbayAPI()
         
@@ -122,7 +173,7 @@ def test_condition_filter_combinations(app):
 #Buying Options Filtering Tests
 #***********************
 
-def test_buying_options_filter(app):
+def test_buying_options_filter(app, fake_ebay):
     with app.app_context():
         api = EbayAPI()
         
@@ -171,11 +222,10 @@ def test_real_buying_options(app):
 #Price Filtering Tests
 #***********************
 
-def test_response_price_format(app):
+def test_response_price_format(app, fake_ebay):
     with app.app_context():
         api = EbayAPI(marketplace='EBAY_US')
         items = api.custom_search_query("pokemon base set booster box", filters={})
-        print(items[0])
         assert len(items) > 0
         for item in items:
             assert 'price' in item
@@ -185,37 +235,131 @@ def test_response_price_format(app):
 #Scraping Ebay Tests
 #***********************
 
-def test_scrape_all_pages(app):
+def test_scrape_all_pages(app, fake_ebay):
+    fake_ebay.scale = 350
     with app.app_context():
         api = EbayAPI()
-        items = api.search_all_pages("book")
+        items = api.custom_search_query("book", max_pages=None)
         assert 200 <= len(items) <= 400
         assert len(set(item['ebay_id'] for item in items)) == len(items)
+        assert [params['offset'] for _, params in fake_ebay.requests] == ['0', '200']
 
-def test_search_new_items(app):
+def test_search_new_items(app, fake_ebay):
+    fake_ebay.scale = 1000
     with app.app_context():
         api = EbayAPI()
-        items = api.custom_search_query("book")
+        items = api.custom_search_query("book", max_pages=1)
         assert len(items) <= 200
 
-def test_search_raw_response(app):
+def test_search_raw_response(app, fake_ebay):
     with app.app_context():
         api = EbayAPI("EBAY_GB")
         raw_response = api.raw_search("iphone", limit=1)  # Get raw response
         items = api.parse_response(raw_response)  # Processed items
-        
-        print("\n=== Raw Response Type ===")
-        print(raw_response)  # Should be dict
-        
-        print("\n=== Parsed Items Type ===")
-        print(f"Type: {type(items)}")  # Should be list
-        print(f"Length: {len(items)}")
-        
-        if items:
-            print("\n=== First Item ===")
-            print(items[0])
-        else:
-            print("No items found in parsed response")
+
+        assert isinstance(raw_response, dict)
+        assert raw_response['total'] == len(load_fixture('pokemon_cards'))
+        assert len(items) == 1
+        assert isinstance(items[0], ItemRecord)
+
+def test_parse_response_fields(app, fake_ebay):
+    with app.app_context():
+        api = EbayAPI("EBAY_GB")
+        summaries = load_fixture('pokemon_cards')
+        items = api.parse_response({'itemSummaries': summaries})
+
+        auction = next(item for item in items if 'AUCTION' in item.buying_options)
+        row = auction.to_row()
+        assert row['ebay_id'] == auction['ebay_id']
+        assert row['location_country'] == 'GB'
+        assert row['start_time'] is not None
+        assert '"current_bid"' in row['auction_details']
+
+        fixed = next(item for item in items if 'AUCTION' not in item.buying_options)
+        assert fixed['auction_details'] is None
+
+def test_token_shared_between_clients(app, fake_ebay):
+    with app.app_context():
+        EbayAPI().raw_search("pokemon")
+        EbayAPI().raw_search("pokemon")
+        assert fake_ebay.token_calls == 1
+
+def test_sort_order_sent(app, fake_ebay):
+    with app.app_context():
+        EbayAPI().raw_search("pokemon", sort_order='newlyListed')
+        assert fake_ebay.requests[0][1]['sort'] == 'newlyListed'
+
+#***********************
+#Async Client Tests
+#***********************
+
+def test_async_pages_fetched_concurrently(app, fake_ebay):
+    fake_ebay.scale = 1200
+    fake_ebay.latency = 0.2
+    with app.app_context():
+        api = AsyncEbayAPI(max_concurrency=5)
+        started = time.monotonic()
+        items = asyncio.run(api.custom_search_query("pokemon", sort_order='newlyListed', max_pages=6))
+        elapsed = time.monotonic() - started
+
+    assert len(items) == 1200
+    assert sorted(int(params['offset']) for _, params in fake_ebay.requests) == [0, 200, 400, 600, 800, 1000]
+    # First page, then the other five together (sequential would take ~1.2s)
+    assert elapsed < 0.9
+
+def test_async_matches_sync_results(app, fake_ebay):
+    fake_ebay.scale = 450
+    with app.app_context():
+        sync_items = EbayAPI().custom_search_query("pokemon", max_pages=3, required_keywords='charizard')
+        async_items = asyncio.run(AsyncEbayAPI().custom_search_query("pokemon", max_pages=3, required_keywords='charizard'))
+    assert [item['ebay_id'] for item in sync_items] == [item['ebay_id'] for item in async_items]
+
+def test_async_token_refresh_does_not_block_event_loop(app, fake_ebay, monkeypatch):
+    with app.app_context():
+        api = AsyncEbayAPI()
+        get_token = api.token_provider.get_token
+        def slow_get_token():
+            time.sleep(0.2)  # A cold token: the refresh POST runs under the store lock
+            return get_token()
+        monkeypatch.setattr(api.token_provider, 'get_token', slow_get_token)
+
+        async def main():
+            ticks = []
+            async def ticker():
+                while True:
+                    ticks.append(1)
+                    await asyncio.sleep(0.01)
+            task = asyncio.create_task(ticker())
+            await api.raw_search("pokemon")
+            task.cancel()
+            return len(ticks)
+
+        assert asyncio.run(main()) > 5
+
+#***********************
+#Error Handling Tests
+#***********************
+
+def test_429_raises_and_blocks_other_callers(app, fake_ebay):
+    fake_ebay.fail_next(429, retry_after=30)
+    with app.app_context():
+        api = EbayAPI()
+        with pytest.raises(RateLimitExceeded) as excinfo:
+            api.raw_search("pokemon")
+        assert excinfo.value.retry_after == 30
+
+        # The Retry-After applies to every worker sharing the limiter
+        with pytest.raises(RateLimitExceeded):
+            EbayAPI().raw_search("pokemon")
+    assert fake_ebay.search_count() == 1
+
+def test_server_error_raises(app, fake_ebay):
+    fake_ebay.fail_next(500)
+    with app.app_context():
+        with pytest.raises(requests.HTTPError):
+            EbayAPI().raw_search("pokemon")
+        # The next call goes through
+        assert EbayAPI().raw_search("pokemon")['total'] > 0
 
 @pytest.mark.live
 def test_custom_search_query(app):
@@ -0,0 +1,366 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import event
+from app import db
+from app.ebay.records import ItemRecord
+from app.jobs.ingestion import cached_relevance_scores, link_query_items, upsert_items
+from app.jobs.query_check import process_items
+from app.utils.price_history import item_price_series, keyword_price_series
+from app.jobs.relevance_training import claim_training_run, train_relevance_model
+from app.models import Item, ItemRelevanceFeedback, KeywordItems, KeywordItemScore, PriceHistory, RelevanceModelState, User, UserQuery, UserQueryItems
+from app.tests.fake_ebay import load_fixture
+from app.utils.levenshtein_string_similarity_helper import RelevanceScorer
+from app.utils.relevance_model import RelevanceModel, load_relevance_model, save_relevance_model
+from app.utils.tfidf import get_keyword_tfidf
+
+
+@pytest.fixture
+def query(make_query):
+    return make_query('pokemon charizard card', email='process-items@example.com')
+
+def fixture_records():
+    return [ItemRecord.from_summary(summary, 'GBP') for summary in load_fixture('pokemon_cards')]
+
+class StatementCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+        self.selects = 0
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._count)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._count)
+
+    def _count(self, conn, cursor, statement, *args):
+        self.count += 1
+        if statement.lstrip().upper().startswith('SELECT'):
+            self.selects += 1
+
+#***********************
+#Batch Processing Tests
+#***********************
+
+def test_first_run_links_every_item(app, query):
+    records = fixture_records()
+    with app.app_context():
+        query = db.session.merge(query)
+        new_items, _ = process_items(records, query, full_scan=True, notify=False, first_run=True)
+
+        assert len(new_items) == len(records)
+        assert Item.query.count() == len(records)
+        assert KeywordItems.query.count() == len(records)
+        assert UserQueryItems.query.filter_by(query_id=query.query_id).count() == len(records)
+        assert KeywordItemScore.query.count() == len(records)
+
+def test_statement_count_does_not_grow_per_item(app, query):
+    records = fixture_records()
+    with app.app_context():
+        query = db.session.merge(query)
+        with StatementCounter(db.engine) as first:
+            process_items(records, query, full_scan=True, notify=False, first_run=True)
+
+        # Every item now exists and is linked: a rescan reads each batch with a handful of queries
+        with StatementCounter(db.engine) as rescan:
+            new_items, _ = process_items(records, query, full_scan=True, notify=False)
+
+        assert new_items == []
+        assert rescan.selects < 10
+        assert first.selects < 10
+        assert KeywordItems.query.count() == len(records)
+
+def test_batches_share_one_preload_per_batch(app, query):
+    records = fixture_records()
+    app.config['PROCESS_ITEMS_BATCH_SIZE'] = 10
+    try:
+        with app.app_context():
+            query = db.session.merge(query)
+            process_items(records, query, full_scan=True, notify=False, first_run=True)
+            with StatementCounter(db.engine) as rescan:
+                process_items(records, query, full_scan=True, notify=False)
+    finally:
+        app.config['PROCESS_ITEMS_BATCH_SIZE'] = 500
+
+    # 3 batches x (items + keyword links + query links + feedback), plus reloading the query
+    assert rescan.selects <= 3 * 4 + 2
+
+#***********************
+#Change Detection Tests
+#***********************
+
+def test_content_hash_ignores_encoding_but_not_changes():
+    summary = load_fixture('pokemon_cards')[0]
+    record = ItemRecord.from_summary(summary, 'GBP')
+    assert record.content_hash == ItemRecord.from_summary(dict(summary), 'GBP').content_hash
+
+    cheaper = dict(summary, price={'value': '1.00', 'currency': 'GBP'})
+    assert record.content_hash != ItemRecord.from_summary(cheaper, 'GBP').content_hash
+
+def test_unchanged_items_are_not_written(app, query):
+    records = fixture_records()
+    with app.app_context():
+        query = db.session.merge(query)
+        process_items(records, query, full_scan=True, notify=False, first_run=True)
+        with StatementCounter(db.engine) as rescan:
+            _, updated_items = process_items(records, query, full_scan=True, notify=False)
+
+        assert updated_items == []
+        assert rescan.count == rescan.selects + 3  # Only the item and link upserts, all no-ops
+
+def test_changed_items_are_updated(app, query):
+    summaries = load_fixture('pokemon_cards')
+    with app.app_context():
+        query = db.session.merge(query)
+        process_items(fixture_records(), query, full_scan=True, notify=False, first_run=True)
+
+        changed = [dict(summary, price={'value': '1.00', 'currency': 'GBP'}) for summary in summaries[:2]]
+        records = [ItemRecord.from_summary(summary, 'GBP') for summary in changed + summaries[2:]]
+        _, updated_items = process_items(records, query, full_scan=True, notify=False)
+
+        assert sorted(item.ebay_id for item in updated_items) == sorted(summary['itemId'] for summary in changed)
+        assert Item.query.filter_by(ebay_id=changed[0]['itemId']).one().price == 1.0
+        assert Item.query.filter_by(content_hash=records[0].content_hash).count() == 1
+
+#***********************
+#Price History Tests
+#***********************
+
+def reprice(summaries, prices):
+    return [
+        ItemRecord.from_summary(dict(summary, price={'value': str(price), 'currency': 'GBP'}), 'GBP')
+        for summary, price in zip(summaries, prices)
+    ]
+
+def test_price_drops_detected_and_history_appended(app, query):
+    summaries = load_fixture('pokemon_cards')[:3]
+    with app.app_context():
+        query = db.session.merge(query)
+        process_items(reprice(summaries, [10, 20, 30]), query, full_scan=True, notify=False, first_run=True)
+        # Unchanged prices add no history rows
+        process_items(reprice(summaries, [10, 20, 30]), query, full_scan=True, notify=False)
+        assert PriceHistory.query.count() == 3
+        query.last_full_run = datetime.now(timezone.utc)
+
+        with pytest.MonkeyPatch.context() as mp:
+            sent = []
+            mp.setattr('app.jobs.query_check.NotificationManager.send_price_drops', lambda user, drops, text: sent.extend(drops))
+            process_items(reprice(summaries, [8, 25, 30]), query, full_scan=True, notify=True)
+
+        assert [(drop['item'].ebay_id, drop['old_price'], drop['new_price']) for drop in sent] == [(summaries[0]['itemId'], 10.0, 8.0)]
+        assert PriceHistory.query.count() == 5
+
+        item_id = Item.query.filter_by(ebay_id=summaries[0]['itemId']).one().item_id
+        assert [point['price'] for point in item_price_series(item_id)] == [10.0, 8.0]
+        daily = keyword_price_series(query.keyword_id)
+        assert len(daily) == 1 and daily[0]['changes'] == 5 and daily[0]['min_price'] == 8.0
+
+def test_price_drop_reaches_every_query_on_keyword(app, query):
+    summaries = load_fixture('pokemon_cards')[:3]
+    with app.app_context():
+        query = db.session.merge(query)
+        other_user = User(email='price-drop-other@example.com')
+        db.session.add(other_user)
+        db.session.flush()
+        other = UserQuery(user_id=other_user.id, keyword_id=query.keyword_id)
+        db.session.add(other)
+        db.session.commit()
+        for subscriber in (query, other):
+            process_items(reprice(summaries, [10, 20, 30]), subscriber, full_scan=True, notify=False, first_run=True)
+            subscriber.last_full_run = datetime.now(timezone.utc)
+        db.session.commit()
+
+        # A recent scan sees the new price first; neither full scan rewrites the item afterwards
+        process_items(reprice(summaries[:1], [8]), query, check_existing=False, notify=False)
+        with pytest.MonkeyPatch.context() as mp:
+            sent = []
+            mp.setattr('app.jobs.query_check.NotificationManager.send_price_drops', lambda user, drops, text: sent.append((user.id, len(drops))))
+            for subscriber in (query, other):
+                process_items(reprice(summaries, [8, 20, 30]), subscriber, full_scan=True, notify=True)
+
+        assert sorted(sent) == sorted([(query.user_id, 1), (other.user_id, 1)])
+
+#***********************
+#Upsert Ingestion Tests
+#***********************
+
+def test_upsert_items_reports_inserted_and_existing(app, query):
+    rows = [record.to_row() for record in fixture_records()]
+    with app.app_context():
+        first_ids, first_inserted = upsert_items(rows[:10])
+        ids, inserted = upsert_items(rows)
+        db.session.commit()
+
+        assert first_inserted == set(first_ids)
+        assert set(ids) == {row['ebay_id'] for row in rows}
+        assert inserted == {row['ebay_id'] for row in rows[10:]}
+        assert all(ids[ebay_id] == item_id for ebay_id, item_id in first_ids.items())
+        assert Item.query.count() == len(rows)
+
+def test_link_query_items_only_returns_new_links(app, query):
+    rows = [record.to_row() for record in fixture_records()]
+    with app.app_context():
+        ids, _ = upsert_items(rows)
+        item_ids = list(ids.values())
+        assert link_query_items(query.query_id, item_ids[:5], datetime.now(timezone.utc)) == set(item_ids[:5])
+        assert link_query_items(query.query_id, item_ids, datetime.now(timezone.utc)) == set(item_ids[5:])
+        db.session.commit()
+
+#***********************
+#Relevance Score Cache Tests
+#***********************
+
+class CountingScorer(RelevanceScorer):
+    def __init__(self, query):
+        super().__init__(query)
+        self.calls = 0
+
+    def score(self, item_text, min_score=None):
+        self.calls += 1
+        return super().score(item_text, min_score)
+
+def test_scores_reused_until_title_changes(app, query):
+    rows = [record.to_row() for record in fixture_records()]
+    with app.app_context():
+        query = db.session.merge(query)
+        ids, _ = upsert_items(rows)
+        titles = {ids[row['ebay_id']]: row['title'] for row in rows}
+        scorer = CountingScorer('pokemon charizard card')
+
+        first = cached_relevance_scores(scorer, query.keyword_id, titles, datetime.now(timezone.utc))
+        again = cached_relevance_scores(scorer, query.keyword_id, titles, datetime.now(timezone.utc))
+        assert first == again
+        assert scorer.calls == len(rows)
+
+        relisted = dict(titles)
+        relisted[ids[rows[0]['ebay_id']]] = 'Charizard (relisted)'
+        cached_relevance_scores(scorer, query.keyword_id, relisted, datetime.now(timezone.utc))
+        assert scorer.calls == len(rows) + 1
+        db.session.commit()
+
+def test_pruned_scores_reused_for_stricter_thresholds(app, query):
+    rows = [record.to_row() for record in fixture_records()]
+    with app.app_context():
+        query = db.session.merge(query)
+        ids, _ = upsert_items(rows)
+        titles = {ids[row['ebay_id']]: row['title'] for row in rows}
+        scorer = CountingScorer('pokemon charizard card')
+
+        pruned = cached_relevance_scores(scorer, query.keyword_id, titles, datetime.now(timezone.utc), min_score=0.9)
+        assert None in pruned.values()
+        calls = scorer.calls
+
+        # A stricter threshold trusts the stored ceiling; a looser one rescored them
+        cached_relevance_scores(scorer, query.keyword_id, titles, datetime.now(timezone.utc), min_score=0.95)
+        assert scorer.calls == calls
+        exact = cached_relevance_scores(scorer, query.keyword_id, titles, datetime.now(timezone.utc))
+        assert scorer.calls == calls + list(pruned.values()).count(None)
+        assert None not in exact.values()
+        db.session.commit()
+
+def test_rescored_titles_are_not_counted_twice(app, query):
+    rows = [record.to_row() for record in fixture_records()]
+    with app.app_context():
+        query = db.session.merge(query)
+        ids, _ = upsert_items(rows)
+        titles = {ids[row['ebay_id']]: row['title'] for row in rows}
+        scorer = RelevanceScorer('pokemon charizard card')
+
+        cached_relevance_scores(scorer, query.keyword_id, titles, datetime.now(timezone.utc), min_score=0.9)
+        tfidf = get_keyword_tfidf(query.keyword_id, scorer.query)
+        document_frequency = dict(tfidf.document_frequency)
+        assert tfidf.documents == len(rows)
+
+        # A looser threshold and a retitle rescore items the model already counted
+        relisted = dict(titles)
+        relisted[ids[rows[0]['ebay_id']]] = 'Charizard (relisted)'
+        cached_relevance_scores(scorer, query.keyword_id, relisted, datetime.now(timezone.utc))
+        assert tfidf.documents == len(rows)
+        assert tfidf.document_frequency == document_frequency
+        db.session.commit()
+
+def test_second_query_on_keyword_reuses_scores(app, query):
+    records = fixture_records()
+    with app.app_context():
+        query = db.session.merge(query)
+        other_user = User(email='other-user@example.com')
+        db.session.add(other_user)
+        db.session.flush()
+        other = UserQuery(user_id=other_user.id, keyword_id=query.keyword_id)
+        db.session.add(other)
+        db.session.commit()
+
+        process_items(records, query, full_scan=True, notify=False, first_run=True)
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setattr(RelevanceScorer, 'score', lambda *args, **kwargs: pytest.fail('rescored a cached title'))
+            process_items(records, other, full_scan=True, notify=False, first_run=True)
+
+        assert KeywordItemScore.query.count() == len(records)
+        assert KeywordItemScore.query.filter(KeywordItemScore.cosine_similarity > 0).count() > 0
+        assert UserQueryItems.query.filter_by(query_id=other.query_id).count() == len(records)
+        # Per-user rows only appear when a user gives feedback
+        assert ItemRelevanceFeedback.query.count() == 0
+
+#***********************
+#Relevance Model Tests
+#***********************
+
+def test_training_folds_in_new_feedback(app, query):
+    records = fixture_records()
+    with app.app_context():
+        query = db.session.merge(query)
+        process_items(records, query, full_scan=True, notify=False, first_run=True)
+        items = Item.query.order_by(Item.item_id).all()
+        for item in items:
+            db.session.add(ItemRelevanceFeedback(
+                user_id=query.user_id, item_id=item.item_id, keyword_id=query.keyword_id,
+                is_relevant='charizard' in item.title.lower()
+            ))
+        db.session.commit()
+
+        assert train_relevance_model() == len(items)
+        state = db.session.get(RelevanceModelState, 'global')
+        assert state.samples == len(items)
+        # Nothing new to learn from
+        assert train_relevance_model() == 0
+
+        # A relabelled row is picked up without counting as a new sample
+        feedback = ItemRelevanceFeedback.query.first()
+        feedback.is_relevant = not feedback.is_relevant
+        db.session.commit()
+        assert train_relevance_model() == 1
+        assert db.session.get(RelevanceModelState, 'global').samples == len(items)
+        assert train_relevance_model() == 0
+        assert train_relevance_model(full=True) == len(items)
+        assert load_relevance_model(min_samples=len(items) + 1) is None
+
+def test_one_node_trains_per_interval(app, query):
+    with app.app_context():
+        # Even before any model is stored, only the first node claims the run
+        assert claim_training_run(timedelta(hours=3)) is True
+        assert claim_training_run(timedelta(hours=3)) is False
+        assert load_relevance_model(min_samples=1) is None
+
+        save_relevance_model(RelevanceModel(), 0, None, datetime.now(timezone.utc) - timedelta(hours=6))
+        assert claim_training_run(timedelta(hours=3)) is True
+        assert claim_training_run(timedelta(hours=3)) is False
+
+def test_model_gates_relevant_items(app, query):
+    records = fixture_records()
+    with app.app_context():
+        query = db.session.merge(query)
+        query.average_relevance_score = 0.0
+        # A model that rejects everything: only the bias is set
+        save_relevance_model(RelevanceModel([-10.0, 0, 0, 0, 0, 0]), 100, None, datetime.now(timezone.utc))
+        new_items, _ = process_items(records, query, full_scan=True, notify=False, first_run=False)
+        assert UserQueryItems.query.filter_by(query_id=query.query_id).count() == 0
+        # Inserted but rejected, so nothing to notify
+        assert Item.query.count() == len(records)
+        assert new_items == []
+
+        save_relevance_model(RelevanceModel([10.0, 0, 0, 0, 0, 0]), 100, None, datetime.now(timezone.utc))
+        new_items, _ = process_items(records, query, full_scan=True, notify=False, first_run=False)
+        linked = UserQueryItems.query.filter_by(query_id=query.query_id).count()
+        assert linked > 0
+        assert len(new_items) == linked
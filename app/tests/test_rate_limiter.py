@@ -0,0 +1,101 @@
+import asyncio
+import pytest
+import time
+from app.ebay.rate_limit import DailyQuotaExceeded, RateLimiter, RateLimitExceeded
+from app.ebay.shared_state import FileStateStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return FileStateStore(str(tmp_path))
+
+#***********************
+#Token Bucket Tests
+#***********************
+
+def test_burst_then_wait(store):
+    limiter = RateLimiter(store, rate=1, burst=3, daily_limit=100)
+    assert [limiter.try_acquire() for _ in range(3)] == [0, 0, 0]
+
+    # Bucket is empty, so the next call has to wait roughly 1/rate
+    assert 0 < limiter.try_acquire() <= 1
+
+def test_limiters_share_bucket(store):
+    # Two limiters on one store behave like two worker processes
+    first = RateLimiter(store, rate=1, burst=2, daily_limit=100)
+    second = RateLimiter(store, rate=1, burst=2, daily_limit=100)
+    assert first.try_acquire() == 0
+    assert second.try_acquire() == 0
+    assert first.try_acquire() > 0
+
+def test_long_wait_raises_instead_of_sleeping(store):
+    limiter = RateLimiter(store, rate=0.01, burst=1, daily_limit=100, max_wait=1)
+    limiter.acquire()
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire()
+
+def test_async_acquire_does_not_block_event_loop(store, monkeypatch):
+    limiter = RateLimiter(store, rate=100, burst=100, daily_limit=100)
+    try_acquire = limiter.try_acquire
+    def slow_try_acquire():
+        time.sleep(0.2)  # A store transaction waiting on its lock
+        return try_acquire()
+    monkeypatch.setattr(limiter, 'try_acquire', slow_try_acquire)
+
+    async def main():
+        ticks = []
+        async def ticker():
+            while True:
+                ticks.append(1)
+                await asyncio.sleep(0.01)
+        task = asyncio.create_task(ticker())
+        await limiter.acquire_async()
+        task.cancel()
+        return len(ticks)
+
+    assert asyncio.run(main()) > 5
+
+#***********************
+#Retry-After / Quota Tests
+#***********************
+
+def test_retry_after_blocks_all_callers(store):
+    limiter = RateLimiter(store, rate=100, burst=100, daily_limit=100)
+    limiter.block_for(60)
+    with pytest.raises(RateLimitExceeded) as excinfo:
+        RateLimiter(store, rate=100, burst=100, daily_limit=100).acquire()
+    assert excinfo.value.retry_after > 55
+
+def test_daily_quota(store):
+    limiter = RateLimiter(store, rate=100, burst=100, daily_limit=2)
+    limiter.acquire()
+    limiter.acquire()
+    with pytest.raises(DailyQuotaExceeded):
+        limiter.acquire()
+    assert limiter.usage() == {'calls': 2, 'limit': 2, 'remaining': 0}
+
+#***********************
+#Request Histogram Tests
+#***********************
+
+def test_request_histogram_counts_calls_per_second(store, monkeypatch):
+    clock = [1_000_000.2]
+    monkeypatch.setattr(time, 'time', lambda: clock[0])
+    limiter = RateLimiter(store, rate=100, burst=100, daily_limit=1000, histogram_window=10)
+    for calls in (3, 0, 1, 1):
+        for _ in range(calls):
+            limiter.acquire()
+        clock[0] += 1
+    clock[0] -= 1
+
+    stats = limiter.request_histogram(5)
+    assert stats['calls'] == 5
+    assert stats['max'] == 3
+    assert stats['busy_seconds'] == 3
+    # Idle seconds count towards the distribution
+    assert stats['histogram'] == {0: 2, 1: 2, 3: 1}
+
+    # Seconds older than histogram_window are dropped on the next call
+    clock[0] += 20
+    limiter.acquire()
+    assert list(store.read(limiter.key)['per_second']) == [str(int(clock[0]))]
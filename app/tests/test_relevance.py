@@ -0,0 +1,183 @@
+import math
+import numpy as np
+import pytest
+from app.tests.fake_ebay import load_fixture
+from app.utils.relevance_model import RelevanceModel, build_features
+from app.utils.tfidf import KeywordTfidf, hashed_features
+from app.utils.levenshtein_string_similarity_helper import RelevanceScorer, calculate_relevance_score, levenshtein_distance, levenshtein_distance_dp, levenshtein_distance_within
+
+KEYWORDS = [
+    'pokemon charizard card',
+    'Pokémon Base Set Booster Box',
+    'final fantasy vii',
+    'iPhone 15 Pro 256GB',
+    'Rock & Roll Hall-of-Fame vs',
+    '',
+]
+
+TITLES = [title for title in (summary['title'] for summary in load_fixture('pokemon_cards'))] + [
+    'Charizard 4/102 Holo 1st Edition – PSA 10™',
+    'POKEMON ii iii iv Card Lot',
+    "Collector's Set — Final Fantasy VII Remake",
+    'iphone15 pro 256 gb graphite',
+    'Rock&Roll ft. guests',
+    '',
+    '   ',
+]
+
+#***********************
+#Regression Tests
+#***********************
+
+@pytest.mark.parametrize('keyword', KEYWORDS)
+def test_scorer_matches_calculate_relevance_score(keyword):
+    scorer = RelevanceScorer(keyword)
+    expected = [calculate_relevance_score(keyword, title) for title in TITLES]
+    assert scorer.score_many(TITLES) == expected
+
+def test_scorer_single_title():
+    scorer = RelevanceScorer('pokemon charizard card')
+    assert scorer.score('Pokemon Charizard Card') == calculate_relevance_score('pokemon charizard card', 'Pokemon Charizard Card')
+    assert scorer.score('Pokemon Charizard Card') == 1.0
+
+#***********************
+#Levenshtein Tests
+#***********************
+
+PAIRS = [
+    ('', ''),
+    ('', 'abc'),
+    ('kitten', 'sitting'),
+    ('flaw', 'lawn'),
+    ('pokémon charizard card', 'pokémon charizard 4 102 holo 1 st edition'),
+    ('a' * 70, 'a' * 35 + 'b' * 40),
+    ('abcdefghijklmnopqrstuvwxyz' * 3, 'zyxwvutsrqponmlkjihgfedcba' * 3),
+]
+
+@pytest.mark.parametrize('s1,s2', PAIRS)
+def test_bit_parallel_matches_dp(s1, s2):
+    expected = levenshtein_distance_dp(s1, s2)
+    assert levenshtein_distance(s1, s2) == expected
+    assert levenshtein_distance(s2, s1) == expected
+
+def test_bit_parallel_matches_dp_on_titles():
+    for title in TITLES:
+        for other in TITLES[:10]:
+            assert levenshtein_distance(title.lower(), other.lower()) == levenshtein_distance_dp(title.lower(), other.lower())
+
+@pytest.mark.parametrize('s1,s2', PAIRS)
+def test_bounded_distance(s1, s2):
+    distance = levenshtein_distance_dp(s1, s2)
+    for max_distance in range(0, distance + 2):
+        expected = distance if distance <= max_distance else max_distance + 1
+        assert levenshtein_distance_within(s1, s2, max_distance) == expected
+
+@pytest.mark.parametrize('keyword', KEYWORDS)
+def test_scorer_threshold_only_prunes_failing_titles(keyword):
+    scorer = RelevanceScorer(keyword)
+    for min_score in (0.15, 0.3, 0.5, 0.8):
+        for title, bounded in zip(TITLES, scorer.score_many(TITLES, min_score)):
+            exact = calculate_relevance_score(keyword, title)
+            if bounded is None:
+                assert exact <= min_score
+            else:
+                assert bounded == exact
+
+#***********************
+#TF-IDF Tests
+#***********************
+
+def naive_cosine(model, title):
+    query, document = {}, {}
+    for feature in model.query_features:
+        query[feature] = query.get(feature, 0) + 1
+    for feature in hashed_features(title):
+        document[feature] = document.get(feature, 0) + 1
+    features = set(query) | set(document)
+    idf = dict(zip(features, model.idf(list(features))))
+    dot = sum(query.get(f, 0) * document.get(f, 0) * idf[f] ** 2 for f in features)
+    query_norm = math.sqrt(sum((count * idf[f]) ** 2 for f, count in query.items()))
+    document_norm = math.sqrt(sum((count * idf[f]) ** 2 for f, count in document.items()))
+    return dot / (query_norm * document_norm) if query_norm and document_norm else 0.0
+
+def test_batch_cosine_matches_naive_computation():
+    model = KeywordTfidf('pokemon charizard card')
+    model.update(TITLES)
+    for title, cosine in zip(TITLES, model.cosine_similarities(TITLES)):
+        assert cosine == pytest.approx(naive_cosine(model, title))
+
+def test_cosine_ranks_titles():
+    model = KeywordTfidf('charizard holo')
+    model.update(['Charizard Holo', 'Pikachu Card', 'Charizard Card', 'Blastoise Card'])
+    exact, partial, unrelated = model.cosine_similarities(['Charizard Holo', 'Charizard Card', 'Pikachu Card'])
+    assert exact == pytest.approx(1.0)
+    assert 0 < partial < exact
+    assert unrelated == 0.0
+
+def test_idf_updates_incrementally():
+    model = KeywordTfidf('charizard')
+    model.update(['charizard card'])
+    charizard, card = model.idf(hashed_features('charizard card'))
+    assert charizard == card
+
+    model.update(['pikachu card', 'blastoise card'])
+    charizard, card = model.idf(hashed_features('charizard card'))
+    assert model.documents == 3
+    # 'card' is in every title, so it now carries less weight than 'charizard'
+    assert card < charizard
+    assert model.cosine_similarities([]).shape == (0,)
+
+#***********************
+#Relevance Model Tests
+#***********************
+
+def synthetic_feedback(n=400, seed=7):
+    rng = np.random.default_rng(seed)
+    relevant = rng.random(n) < 0.5
+    X = np.column_stack([
+        np.where(relevant, rng.uniform(0.5, 1.0, n), rng.uniform(0.0, 0.6, n)),
+        np.where(relevant, rng.uniform(0.3, 1.0, n), rng.uniform(0.0, 0.4, n)),
+        rng.uniform(0.0, 1.0, n),
+        np.where(relevant, rng.normal(0.0, 0.2, n), rng.normal(-1.5, 0.5, n)),
+        (rng.random(n) < np.where(relevant, 0.9, 0.2)).astype(float),
+    ])
+    return X, relevant.astype(float)
+
+def test_model_separates_feedback():
+    X, y = synthetic_feedback()
+    model = RelevanceModel().fit(X, y)
+    assert np.mean(model.predict(X) == y.astype(bool)) > 0.9
+    assert model.log_loss(X, y) < RelevanceModel().log_loss(X, y)
+
+def test_model_warm_start_continues_from_weights():
+    X, y = synthetic_feedback()
+    model = RelevanceModel().fit(X[:200], y[:200], epochs=50)
+    before = model.log_loss(X, y)
+    warm = RelevanceModel(model.weights.copy()).fit(X[200:], y[200:], epochs=50)
+    assert warm.log_loss(X, y) < before
+
+def test_partial_fit_nudges_instead_of_replacing():
+    X, y = synthetic_feedback()
+    model = RelevanceModel().fit(X, y)
+    accuracy = np.mean(model.predict(X) == y.astype(bool))
+
+    # A handful of positive labels on items that look irrelevant (a full-rate refit
+    # on just these predicts every item relevant), with a replayed sample of older labels
+    surprises = np.flatnonzero(y == 0)[:5]
+    model.partial_fit(X[surprises], np.ones(5), X[::4], y[::4])
+    assert np.mean(model.predict(X) == y.astype(bool)) > accuracy - 0.02
+    assert np.mean(model.predict(X)) < 0.6
+
+def test_batched_predict_matches_rows():
+    X, y = synthetic_feedback(50)
+    model = RelevanceModel().fit(X, y)
+    batched = model.predict_proba(X)
+    for row, probability in zip(X, batched):
+        assert model.predict_proba(row)[0] == pytest.approx(probability)
+
+def test_build_features_relative_to_keyword():
+    profile = (100.0, {'183454'})
+    features = build_features(0.8, None, 0.5, 100.0, '{"ids": ["183454"], "names": ["CCG Individual Cards"]}', profile)
+    assert features == [0.8, 0.0, 0.5, 0.0, 1.0]
+    cheap = build_features(0.8, 1.0, None, 5.0, None, profile)
+    assert cheap[3] < 0 and cheap[4] == 0.0
@@ -0,0 +1,54 @@
+from app.ebay.cache import ResponseCache
+
+
+def search_params(**overrides):
+    params = {'q': 'Charizard  Holo', 'limit': 200, 'offset': 0, 'sort': 'newlyListed', 'filter': 'itemLocationCountry:GB,priceCurrency:GBP'}
+    params.update(overrides)
+    return params
+
+#***********************
+#Key Tests
+#***********************
+
+def test_key_ignores_case_and_spacing_of_q():
+    key = ResponseCache.make_key(search_params(), 'EBAY_GB')
+    assert key == ResponseCache.make_key(search_params(q='charizard holo'), 'EBAY_GB')
+
+def test_key_changes_with_request():
+    key = ResponseCache.make_key(search_params(), 'EBAY_GB')
+    assert key != ResponseCache.make_key(search_params(offset=200), 'EBAY_GB')
+    assert key != ResponseCache.make_key(search_params(filter='itemLocationCountry:US'), 'EBAY_GB')
+    assert key != ResponseCache.make_key(search_params(), 'EBAY_US')
+
+#***********************
+#Cache Tests
+#***********************
+
+def test_hit_and_miss_counters():
+    cache = ResponseCache(ttl=60)
+    assert cache.get('k') is None
+    cache.set('k', {'total': 1})
+    assert cache.get('k') == {'total': 1}
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+def test_expired_entries_are_misses():
+    cache = ResponseCache(ttl=-1)
+    cache.set('k', {'total': 1})
+    assert cache.get('k') is None
+
+def test_lru_eviction():
+    cache = ResponseCache(max_entries=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+
+def test_disk_tier_shared_between_caches(tmp_path):
+    # A second cache on the same directory stands in for another worker process
+    ResponseCache(ttl=60, directory=str(tmp_path)).set('k', {'itemSummaries': []})
+    other = ResponseCache(ttl=60, directory=str(tmp_path))
+    assert other.get('k') == {'itemSummaries': []}
+    assert other.stats()['disk_hits'] == 1
@@ -0,0 +1,156 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from app.utils.scrape_coalescer import MAX_RECENT_LIMIT, MIN_RECENT_LIMIT, ScrapeCoalescer, items_since, scrape_signature, search_keywords
+from app.utils.text_helpers import filter_items_for_query
+
+
+def fake_query(**overrides):
+    fields = {'min_price': None, 'max_price': None, 'required_keywords': None, 'excluded_keywords': None}
+    fields.update(overrides)
+    return SimpleNamespace(**fields)
+
+#***********************
+#Coalescing Tests
+#***********************
+
+def test_one_scrape_per_signature_within_ttl():
+    coalescer = ScrapeCoalescer()
+    calls = []
+    scrape = lambda: calls.append(1) or [{'ebay_id': '1'}]
+
+    first = coalescer.fetch(('recent', 1), 60, scrape)
+    second = coalescer.fetch(('recent', 1), 60, scrape)
+    coalescer.fetch(('recent', 2), 60, scrape)
+
+    assert first is second
+    assert len(calls) == 2
+
+def test_concurrent_callers_share_inflight_scrape():
+    coalescer = ScrapeCoalescer()
+    calls = []
+
+    def slow_scrape():
+        calls.append(1)
+        time.sleep(0.1)
+        return []
+
+    threads = [threading.Thread(target=coalescer.fetch, args=(('full', 1), 60, slow_scrape)) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+
+def test_expired_result_is_scraped_again():
+    coalescer = ScrapeCoalescer()
+    calls = []
+    coalescer.fetch(('recent', 1), 0, lambda: calls.append(1) or [])
+    coalescer.fetch(('recent', 1), 0, lambda: calls.append(1) or [])
+    assert len(calls) == 2
+
+#***********************
+#Per-Query Filter Tests
+#***********************
+
+def test_filter_items_for_query():
+    items = [
+        {'ebay_id': '1', 'title': 'Charizard Holo Card', 'price': 100.0},
+        {'ebay_id': '2', 'title': 'Charizard Proxy Card', 'price': 20.0},
+        {'ebay_id': '3', 'title': 'Charizard Card', 'price': 500.0},
+        {'ebay_id': '4', 'title': 'Pikachu Card', 'price': 60.0},
+    ]
+    query = fake_query(
+        min_price=Decimal('50.00'),
+        max_price=Decimal('200.00'),
+        required_keywords='charizard',
+        excluded_keywords='proxy'
+    )
+
+    filtered = filter_items_for_query(items, query)
+    assert [item['ebay_id'] for item in filtered] == ['1']
+
+def test_expression_queries_push_down_into_q():
+    def signed(required):
+        return fake_query(
+            keyword_id=1, keyword=SimpleNamespace(keyword_text='charizard'), marketplace='EBAY_GB',
+            item_location='GB', condition=None, required_keywords=required
+        )
+    legacy, other_legacy = signed('holo, card'), signed('psa')
+    expression = signed('(holo OR reverse) AND NOT proxy')
+
+    # Legacy lists filter locally, so they keep sharing the keyword's scrape
+    assert search_keywords(legacy) == 'charizard'
+    assert scrape_signature(legacy, 'recent') == scrape_signature(other_legacy, 'recent')
+    assert search_keywords(expression) == 'charizard (holo, reverse)'
+    assert scrape_signature(expression, 'recent') != scrape_signature(legacy, 'recent')
+
+#***********************
+#High-Water Mark Tests
+#***********************
+
+def newly_listed_page(count, newest):
+    return [
+        {'ebay_id': f'v1|{count - i}|0', 'start_time': newest - timedelta(minutes=i)}
+        for i in range(count)
+    ]
+
+def test_items_since_stops_at_last_seen_id():
+    page = newly_listed_page(5, datetime(2025, 3, 1, 12, 0, tzinfo=timezone.utc))
+    assert items_since(page, 'v1|3|0', None) == page[:2]
+
+def test_items_since_stops_at_older_listing():
+    newest = datetime(2025, 3, 1, 12, 0, tzinfo=timezone.utc)
+    page = newly_listed_page(5, newest)
+    # Naive values (as read back from SQLite) are treated as UTC
+    last_seen = (newest - timedelta(minutes=1, seconds=30)).replace(tzinfo=None)
+    assert items_since(page, 'gone', last_seen) == page[:2]
+
+def test_items_since_without_mark_returns_everything():
+    page = newly_listed_page(3, datetime(2025, 3, 1, 12, 0, tzinfo=timezone.utc))
+    assert items_since(page, None, None) == page
+
+def test_recent_limit_adapts_to_new_listings():
+    coalescer = ScrapeCoalescer()
+    signature = ('recent', 1)
+    newest = datetime(2025, 3, 1, 12, 0, tzinfo=timezone.utc)
+    assert coalescer.recent_limit(signature) == MAX_RECENT_LIMIT
+
+    coalescer.record_recent_page(signature, newly_listed_page(200, newest))
+    # Nothing new on the next poll, so the page shrinks to the minimum
+    coalescer.record_recent_page(signature, newly_listed_page(200, newest))
+    assert coalescer.recent_limit(signature) == MIN_RECENT_LIMIT
+
+    # A busy keyword grows the page again
+    coalescer.record_recent_page(signature, newly_listed_page(200, newest + timedelta(minutes=30)))
+    assert coalescer.recent_limit(signature) == 60
+
+def test_gap_refill_keeps_recent_limit_large(app, monkeypatch):
+    from app.utils import scrape_coalescer
+    newest = datetime(2025, 3, 1, 12, 0, tzinfo=timezone.utc)
+    limits = []
+    def scrape_new_items(keyword_text, filters, marketplace, limit):
+        limits.append(limit)
+        return newly_listed_page(limit, newest)
+    monkeypatch.setattr(scrape_coalescer, 'scrape_new_items', scrape_new_items)
+
+    query = fake_query(
+        keyword_id=1, keyword=SimpleNamespace(keyword_text='charizard'), marketplace='EBAY_GB',
+        item_location=None, condition=None, last_seen_ebay_id='gone', last_seen_created_at=newest - timedelta(days=1)
+    )
+    signature = scrape_signature(query, 'recent')
+    coalescer = scrape_coalescer.coalescer
+    coalescer.clear()
+    # A quiet keyword: the last poll saw nothing new, hours ago
+    coalescer.record_recent_page(signature, newly_listed_page(5, newest - timedelta(hours=5)))
+    coalescer.record_recent_page(signature, newly_listed_page(5, newest - timedelta(hours=5)))
+    assert coalescer.recent_limit(signature) == MIN_RECENT_LIMIT
+
+    with app.app_context():
+        scrape_coalescer.scrape_recent_query_items(query)
+    # The short page ran into the gap, so it was refilled with a full one
+    assert limits == [MIN_RECENT_LIMIT, MAX_RECENT_LIMIT]
+    assert coalescer.recent_limit(signature) == MAX_RECENT_LIMIT
+    coalescer.clear()
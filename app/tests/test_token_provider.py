@@ -0,0 +1,47 @@
+import time
+from app.ebay.auth import TokenProvider
+from app.ebay.shared_state import FileStateStore
+
+TOKEN_URL = 'https://api.ebay.com/identity/v1/oauth2/token'
+
+
+def make_provider(store):
+    return TokenProvider('client-id', 'client-secret', TOKEN_URL, store, refresh_margin=300)
+
+#***********************
+#Shared Token Tests
+#***********************
+
+def test_token_fetched_once_across_providers(tmp_path, requests_mock):
+    token_endpoint = requests_mock.post(TOKEN_URL, json={'access_token': 'abc', 'expires_in': 7200})
+    store = FileStateStore(str(tmp_path))
+
+    # Two providers stand in for two worker processes sharing the store
+    first, second = make_provider(store), make_provider(store)
+    assert first.get_token() == 'abc'
+    assert second.get_token() == 'abc'
+    assert token_endpoint.call_count == 1
+
+def test_token_refreshed_before_expiry(tmp_path, requests_mock):
+    token_endpoint = requests_mock.post(TOKEN_URL, [
+        {'json': {'access_token': 'old', 'expires_in': 200}},
+        {'json': {'access_token': 'new', 'expires_in': 7200}},
+    ])
+    provider = make_provider(FileStateStore(str(tmp_path)))
+
+    # Still valid, so searches get the cached token straight away
+    assert provider.get_token() == 'old'
+
+    # Inside the refresh margin, so the background refresh replaces it
+    assert provider.refresh() == 'new'
+    assert provider.get_token() == 'new'
+    assert token_endpoint.call_count == 2
+
+def test_expired_token_in_store_is_replaced(tmp_path, requests_mock):
+    requests_mock.post(TOKEN_URL, json={'access_token': 'fresh', 'expires_in': 7200})
+    store = FileStateStore(str(tmp_path))
+    provider = make_provider(store)
+    with store.transaction(provider.state_key) as state:
+        state.update({'access_token': 'stale', 'expires_at': time.time() - 10})
+
+    assert provider.get_token() == 'fresh'
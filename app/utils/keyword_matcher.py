@@ -0,0 +1,58 @@
+import re
+from functools import lru_cache
+
+
+def parse_keywords(keywords):
+    """Comma-separated keywords -> sorted tuple of distinct, lower-cased keywords"""
+    return tuple(sorted({kw.strip().lower() for kw in (keywords or '').split(',') if kw.strip()}))
+
+
+class KeywordMatcher:
+    """
+    Required/excluded keyword filter for one query, compiled once.
+
+    Required keywords must all appear as whole words. They are checked by a
+    single anchored pattern of one lookahead per keyword, so a title is tested
+    in one regex call however many keywords there are.
+
+    Excluded keywords must not appear anywhere, even inside a word. They are
+    one alternation, longest first, so the text is scanned once for all of them.
+    """
+    def __init__(self, required=(), excluded=()):
+        self.required = tuple(required)
+        self.excluded = tuple(excluded)
+        self._required = re.compile(
+            '^' + ''.join(rf'(?=.*?\b{re.escape(kw)}\b)' for kw in self.required), re.DOTALL
+        ) if self.required else None
+        self._excluded = re.compile(
+            '|'.join(re.escape(kw) for kw in sorted(self.excluded, key=len, reverse=True))
+        ) if self.excluded else None
+
+    def matches(self, text):
+        """Whether lower-cased text passes the required and excluded keywords"""
+        if self._required is not None and self._required.match(text) is None:
+            return False
+        if self._excluded is not None and self._excluded.search(text) is not None:
+            return False
+        return True
+
+    def filter(self, items):
+        """The items (dicts or ItemRecords) whose title and description pass"""
+        if self._required is None and self._excluded is None:
+            return list(items)
+        return [
+            item for item in items
+            if self.matches(f"{(item.get('title') or '').lower()} {(item.get('description') or '').lower()}")
+        ]
+
+
+@lru_cache(maxsize=1024)
+def _compiled_matcher(required, excluded):
+    return KeywordMatcher(required, excluded)
+
+def get_keyword_matcher(required_keywords, excluded_keywords):
+    """Compiled matcher for a query's keyword strings, shared by queries with the same keywords"""
+    return _compiled_matcher(parse_keywords(required_keywords), parse_keywords(excluded_keywords))
+
+
+__all__ = ['KeywordMatcher', 'get_keyword_matcher', 'parse_keywords']
@@ -1,6 +1,28 @@
 import re
 import unicodedata
 
+# Precompiled once; preprocess_text and normalize_special_terms run for every title
+_TRADEMARK_RE = re.compile(r'[©®™]')
+_AMPERSAND_RE = re.compile(r'&')
+_APOSTROPHE_RE = re.compile(r"['']")
+_SEPARATOR_RE = re.compile(r'[-_]')
+_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+_WHITESPACE_RE = re.compile(r'\s+')
+_NUMBER_SUFFIX_RE = re.compile(r'(\d+)([a-zA-Z]+)')
+_NUMBER_PREFIX_RE = re.compile(r'([a-zA-Z]+)(\d+)')
+
+_SPECIAL_TERMS = [
+    (re.compile(pattern, re.IGNORECASE), replacement)
+    for pattern, replacement in {
+        r'\biii\b': '3',
+        r'\bii\b': '2',
+        r'\biv\b': '4',
+        r'\bvs\b': 'versus',
+        r'\bft\b': 'feet',
+        r'\bpokemon\b': 'pokémon',  # Standardize spelling
+    }.items()
+]
+
 def preprocess_text(text: str) -> str:
     """
     Enhanced text normalization:
@@ -13,37 +35,28 @@ def preprocess_text(text: str) -> str:
     text = text.encode('ascii', 'ignore').decode('ascii')
     
     # Standardize common characters
-    text = re.sub(r'[©®™]', '', text)  # Remove common trademark symbols
-    text = re.sub(r'&', ' and ', text)  # Replace ampersands
+    text = _TRADEMARK_RE.sub('', text)  # Remove common trademark symbols
+    text = _AMPERSAND_RE.sub(' and ', text)  # Replace ampersands
     
     # Handle special cases
-    text = re.sub(r"['']", '', text)    # Remove apostrophes
-    text = re.sub(r'[-_]', ' ', text)   # Treat hyphens/underscores as spaces
+    text = _APOSTROPHE_RE.sub('', text)    # Remove apostrophes
+    text = _SEPARATOR_RE.sub(' ', text)   # Treat hyphens/underscores as spaces
     
     # Normalize remaining characters
     text = text.lower()
-    text = re.sub(r'[^\w\s]', '', text)  # Remove remaining punctuation
-    text = re.sub(r'\s+', ' ', text).strip()
+    text = _PUNCTUATION_RE.sub('', text)  # Remove remaining punctuation
+    text = _WHITESPACE_RE.sub(' ', text).strip()
     
     # Handle number normalization (e.g., "1st" -> "1 st")
-    text = re.sub(r'(\d+)([a-zA-Z]+)', r'\1 \2', text)
-    text = re.sub(r'([a-zA-Z]+)(\d+)', r'\1 \2', text)
+    text = _NUMBER_SUFFIX_RE.sub(r'\1 \2', text)
+    text = _NUMBER_PREFIX_RE.sub(r'\1 \2', text)
     
     return text
 
 def normalize_special_terms(text: str) -> str:
     """Handle common substitutions for better matching"""
-    substitutions = {
-        r'\biii\b': '3',
-        r'\bii\b': '2',
-        r'\biv\b': '4',
-        r'\bvs\b': 'versus',
-        r'\bft\b': 'feet',
-        r'\bpokemon\b': 'pokémon',  # Standardize spelling
-    }
-    
-    for pattern, replacement in substitutions.items():
-        text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
+    for pattern, replacement in _SPECIAL_TERMS:
+        text = pattern.sub(replacement, text)
     
     return text
 
@@ -66,13 +79,75 @@ def get_exact_match_score(query: str, item_text: str) -> float:
     exact_matches = len(query_words & item_words) + number_matches
     return min(exact_matches / len(query_words), 1.0)
 
+def pattern_masks(pattern: str) -> dict:
+    """Bit mask of the positions of each character in `pattern` (bit i = pattern[i])"""
+    masks = {}
+    for i, c in enumerate(pattern):
+        masks[c] = masks.get(c, 0) | (1 << i)
+    return masks
+
+def bit_parallel_levenshtein(pattern: str, text: str, masks: dict = None, max_distance: int = None) -> int:
+    """
+    Levenshtein distance using Myers' bit-vector algorithm (Hyyro's
+    formulation), with one Python int holding a whole column of the DP
+    matrix. O(len(text)) big-int operations instead of O(n*m) cell updates.
+
+    With max_distance, stops as soon as the distance must exceed it and
+    returns max_distance + 1.
+    """
+    m = len(pattern)
+    n = len(text)
+    if max_distance is not None and abs(m - n) > max_distance:
+        return max_distance + 1
+    if m == 0:
+        return n
+    if masks is None:
+        masks = pattern_masks(pattern)
+
+    full = (1 << m) - 1
+    last = 1 << (m - 1)
+    pv = full  # Vertical +1 deltas
+    mv = 0     # Vertical -1 deltas
+    score = m
+    for j, c in enumerate(text):
+        eq = masks.get(c, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & full)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        # Each remaining character can lower the distance by at most one
+        if max_distance is not None and score - (n - j - 1) > max_distance:
+            return max_distance + 1
+        ph = ((ph << 1) | 1) & full
+        mh = (mh << 1) & full
+        pv = mh | (~(xv | ph) & full)
+        mv = ph & xv
+    return score
+
 def levenshtein_distance(s1: str, s2: str) -> int:
     """
     Calculates minimum single-character edits (insert, delete, substitute)
     needed to change s1 into s2
     """
+    # The shorter string is the bit vector
+    if len(s1) > len(s2):
+        s1, s2 = s2, s1
+    return bit_parallel_levenshtein(s1, s2)
+
+def levenshtein_distance_within(s1: str, s2: str, max_distance: int) -> int:
+    """levenshtein_distance, or max_distance + 1 once it is certain to be larger"""
+    if len(s1) > len(s2):
+        s1, s2 = s2, s1
+    return bit_parallel_levenshtein(s1, s2, max_distance=max_distance)
+
+def levenshtein_distance_dp(s1: str, s2: str) -> int:
+    """Textbook row-by-row DP; kept as the reference for the bit-parallel version"""
     if len(s1) < len(s2):
-        return levenshtein_distance(s2, s1)
+        return levenshtein_distance_dp(s2, s1)
 
     if len(s2) == 0:
         return len(s1)
@@ -124,3 +199,68 @@ def calculate_relevance_score(
         (exact_score * 0.6) +
         (lev_score * 0.4)
     )
+
+class RelevanceScorer:
+    """
+    calculate_relevance_score for one keyword against many titles.
+    The keyword is normalized once (along with its bit masks for the
+    Levenshtein distance), and each title once rather than once for the
+    exact-match score and again for the Levenshtein score.
+
+    Given min_score, titles that cannot score above it return None, and
+    the distance calculation stops as soon as that is certain.
+    """
+    def __init__(self, query: str):
+        self.query = query
+        self.processed_query = normalize_special_terms(preprocess_text(query))
+        self.query_words = set(self.processed_query.split())
+        self.query_numbers = [word for word in self.query_words if word.isdigit()]
+        self.query_masks = pattern_masks(self.processed_query)
+
+    def exact_match_score(self, item_words: set) -> float:
+        if not self.query_words:
+            return 0.0
+        number_matches = sum(
+            1 for q in self.query_numbers if any(i.startswith(q) for i in item_words)
+        )
+        exact_matches = len(self.query_words & item_words) + number_matches
+        return min(exact_matches / len(self.query_words), 1.0)
+
+    def exact_match(self, item_text: str) -> float:
+        return self.exact_match_score(set(normalize_special_terms(preprocess_text(item_text)).split()))
+
+    def distance(self, processed_item: str, max_distance: int = None) -> int:
+        return bit_parallel_levenshtein(self.processed_query, processed_item, self.query_masks, max_distance)
+
+    def levenshtein_similarity(self, processed_item: str) -> float:
+        max_len = max(len(self.processed_query), len(processed_item))
+        if max_len == 0:
+            return 1.0
+        distance = self.distance(processed_item)
+        return 1.0 - (distance / max_len)
+
+    def score(self, item_text: str, min_score: float = None):
+        processed_item = normalize_special_terms(preprocess_text(item_text))
+        exact_score = self.exact_match_score(set(processed_item.split()))
+        max_len = max(len(self.processed_query), len(processed_item))
+
+        if min_score is None or max_len == 0:
+            lev_score = self.levenshtein_similarity(processed_item)
+        else:
+            # Largest distance that could still give a score above min_score
+            needed = (min_score - exact_score * 0.6) / 0.4
+            max_distance = int((1.0 - needed) * max_len + 1e-9)
+            if max_distance < 0:
+                return None
+            distance = self.distance(processed_item, min(max_distance, max_len))
+            if distance > max_distance:
+                return None
+            lev_score = 1.0 - (distance / max_len)
+
+        return (
+            (exact_score * 0.6) +
+            (lev_score * 0.4)
+        )
+
+    def score_many(self, titles, min_score: float = None) -> list:
+        return [self.score(title, min_score) for title in titles]
@@ -1,3 +1,4 @@
+import json
 import requests
 from flask import current_app, url_for
 from datetime import datetime, timezone
@@ -122,13 +123,14 @@ class NotificationManager:
             )
             query_text = f" for '{query_text}'" if query_text else ""
             for item in items:
-                if item.auction_details['current_bid']['value']:
-                    current_bid = item.auction_details['current_bid']['value']
+                auction_details = json.loads(item.auction_details) if item.auction_details else {}
+                if auction_details.get('current_bid', {}).get('value'):
+                    current_bid = auction_details['current_bid']['value']
                 else:
                     current_bid = item.price
                 if item.end_time:
-                    item.end_time = item.end_time.replace(tzinfo=timezone.utc)
-                    time_left = item.end_time - datetime.now(timezone.utc)
+                    end_time = item.end_time.replace(tzinfo=timezone.utc)
+                    time_left = end_time - datetime.now(timezone.utc)
                     hours_left = round(time_left.total_seconds() / 3600, 1)
 
                     message = (
@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, insert, literal, or_, select
+from app import db
+from app.models import Item, KeywordItems, PriceHistory
+
+
+def record_price_changes(item_ids, recorded_at):
+    """
+    Append the current price of each item whose price differs from its latest
+    price_history row (or that has no history yet). Run after the batch's items
+    have been written; it is a single INSERT ... SELECT.
+    """
+    if not item_ids:
+        return
+    latest_ids = select(func.max(PriceHistory.id).label('id')).where(
+        PriceHistory.item_id.in_(item_ids)
+    ).group_by(PriceHistory.item_id).subquery()
+    latest = select(PriceHistory.item_id, PriceHistory.price).join(
+        latest_ids, PriceHistory.id == latest_ids.c.id
+    ).subquery()
+
+    changed = select(
+        Item.item_id, Item.price, Item.currency, literal(recorded_at, PriceHistory.recorded_at.type)
+    ).outerjoin(latest, latest.c.item_id == Item.item_id).where(
+        Item.item_id.in_(item_ids),
+        Item.price.isnot(None),
+        or_(latest.c.price.is_(None), latest.c.price != Item.price)
+    )
+    db.session.execute(insert(PriceHistory).from_select(
+        ['item_id', 'price', 'currency', 'recorded_at'], changed
+    ))
+
+def detect_price_drops(item_ids, since):
+    """
+    Items whose latest recorded price is lower than their price as of `since`
+    (e.g. the query's last full scan), whichever scrape recorded the change.
+    Returns [(item_id, old_price, new_price)]
+    """
+    if not item_ids or since is None:
+        return []
+    def latest(*conditions):
+        return select(
+            PriceHistory.item_id,
+            PriceHistory.price,
+            PriceHistory.recorded_at,
+            func.row_number().over(
+                partition_by=PriceHistory.item_id, order_by=PriceHistory.id.desc()
+            ).label('position')
+        ).where(PriceHistory.item_id.in_(item_ids), *conditions).subquery()
+
+    current = latest()
+    previous = latest(PriceHistory.recorded_at <= since)
+    return db.session.execute(
+        select(current.c.item_id, previous.c.price, current.c.price).join(
+            previous, previous.c.item_id == current.c.item_id
+        ).where(
+            current.c.position == 1,
+            previous.c.position == 1,
+            current.c.recorded_at > since,
+            current.c.price < previous.c.price
+        )
+    ).all()
+
+def item_price_series(item_id):
+    """Every recorded price change for an item, oldest first"""
+    rows = PriceHistory.query.filter_by(item_id=item_id).order_by(PriceHistory.id).all()
+    return [
+        {'recorded_at': row.recorded_at.isoformat(), 'price': row.price, 'currency': row.currency}
+        for row in rows
+    ]
+
+def keyword_price_series(keyword_id, days=30):
+    """Daily min/avg/max of the price changes recorded for a keyword's items"""
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    day = func.date(PriceHistory.recorded_at)
+    rows = db.session.execute(
+        select(
+            day.label('day'),
+            func.min(PriceHistory.price),
+            func.avg(PriceHistory.price),
+            func.max(PriceHistory.price),
+            func.count(PriceHistory.id)
+        ).join(KeywordItems, KeywordItems.item_id == PriceHistory.item_id).where(
+            KeywordItems.keyword_id == keyword_id,
+            PriceHistory.recorded_at >= since
+        ).group_by(day).order_by(day)
+    ).all()
+    return [
+        {'date': str(row[0]), 'min_price': row[1], 'avg_price': round(row[2], 2), 'max_price': row[3], 'changes': row[4]}
+        for row in rows
+    ]
+
+
+__all__ = ['record_price_changes', 'detect_price_drops', 'item_price_series', 'keyword_price_series']
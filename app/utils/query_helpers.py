@@ -1,6 +1,7 @@
 from decimal import Decimal, InvalidOperation
 from app import db
 from app.models import UserQuery
+from app.scheduler.job_manager import remove_query_jobs
 
 
 def calculate_daily_runs(check_interval):
@@ -48,12 +49,13 @@ def pause_queries_exceeding_limit(user):
     for query in queries:
         if user.query_usage <= user.tier['query_limit']:
             break
-        print(f"Pausing query {query.id}")
+        print(f"Pausing query {query.query_id}")
         query.is_active = False
         user.query_usage = user.query_usage - calculate_daily_runs(query.check_interval)
         print(f"User query usage after pausing: {user.query_usage} compared to limit of {user.tier['query_limit']}")
         paused_queries.append(query)
         db.session.commit()
+        remove_query_jobs(query.query_id)
     
     # return the number of queries paused
     print(f"Paused {len(paused_queries)} queries")
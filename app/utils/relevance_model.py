@@ -0,0 +1,144 @@
+import json
+import math
+import threading
+import time
+from collections import Counter
+import numpy as np
+from sqlalchemy import select
+from app import db
+from app.models import Item, KeywordItems, RelevanceModelState
+
+FEATURES = ('hybrid_score', 'exact_match', 'cosine_similarity', 'price_position', 'category_match')
+
+
+class RelevanceModel:
+    """
+    Logistic regression over cheap relevance features (see FEATURES), fitted
+    with full-batch gradient descent. fit() continues from the current
+    weights; partial_fit() folds new feedback in without retraining from zero.
+    """
+    def __init__(self, weights=None, l2=1e-3):
+        self.weights = np.zeros(len(FEATURES) + 1) if weights is None else np.asarray(weights, dtype=np.float64)
+        self.l2 = l2
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float64).reshape(-1, len(FEATURES))
+        z = X @ self.weights[1:] + self.weights[0]
+        return 1.0 / (1.0 + np.exp(-np.clip(z, -30, 30)))
+
+    def predict(self, X, threshold=0.5):
+        return self.predict_proba(X) >= threshold
+
+    def fit(self, X, y, epochs=500, learning_rate=0.5):
+        X = np.asarray(X, dtype=np.float64).reshape(-1, len(FEATURES))
+        y = np.asarray(y, dtype=np.float64)
+        if not len(y):
+            return self
+        design = np.hstack([np.ones((len(y), 1)), X])
+        for _ in range(epochs):
+            error = self.predict_proba(X) - y
+            gradient = design.T @ error / len(y)
+            gradient[1:] += self.l2 * self.weights[1:]
+            self.weights -= learning_rate * gradient
+        return self
+
+    def partial_fit(self, X, y, replay_X=(), replay_y=(), epochs=20, learning_rate=0.05):
+        """
+        A few small steps over new labels mixed with a replayed sample of older
+        ones, so new feedback nudges the weights instead of overwriting them
+        """
+        X = np.vstack([np.asarray(X, dtype=np.float64).reshape(-1, len(FEATURES)),
+                       np.asarray(replay_X, dtype=np.float64).reshape(-1, len(FEATURES))])
+        y = np.concatenate([np.asarray(y, dtype=np.float64), np.asarray(replay_y, dtype=np.float64)])
+        return self.fit(X, y, epochs=epochs, learning_rate=learning_rate)
+
+    def log_loss(self, X, y):
+        p = np.clip(self.predict_proba(X), 1e-9, 1 - 1e-9)
+        y = np.asarray(y, dtype=np.float64)
+        return float(-np.mean(y * np.log(p) + (1 - y) * np.log(1 - p)))
+
+
+#**********************
+#FEATURES
+#**********************
+
+def category_ids(categories):
+    """Category ids from Item.categories (stored as JSON text)"""
+    if not categories:
+        return []
+    try:
+        return json.loads(categories).get('ids', [])
+    except (ValueError, AttributeError):
+        return []
+
+_profiles = {}
+_profiles_lock = threading.Lock()
+
+def keyword_profile(keyword_id, ttl=3600, sample=500):
+    """
+    (average price, most common category ids) of the items linked to a keyword,
+    used to place an item's price and category relative to the keyword.
+    Cached per process for `ttl` seconds.
+    """
+    now = time.monotonic()
+    with _profiles_lock:
+        cached = _profiles.get(keyword_id)
+        if cached and cached[0] > now:
+            return cached[1]
+
+    rows = db.session.execute(
+        select(Item.price, Item.categories).join(KeywordItems, KeywordItems.item_id == Item.item_id).where(
+            KeywordItems.keyword_id == keyword_id
+        ).order_by(KeywordItems.item_id.desc()).limit(sample)
+    ).all()
+    prices = [price for price, _ in rows if price]
+    counts = Counter(category for _, categories in rows for category in category_ids(categories)[:1])
+    profile = (
+        sum(prices) / len(prices) if prices else None,
+        {category for category, _ in counts.most_common(3)},
+    )
+    with _profiles_lock:
+        _profiles[keyword_id] = (now + ttl, profile)
+    return profile
+
+def clear_keyword_profiles():
+    with _profiles_lock:
+        _profiles.clear()
+
+def build_features(hybrid_score, exact_match, cosine_similarity, price, categories, profile):
+    """One feature row, in FEATURES order"""
+    average_price, top_categories = profile
+    if price and average_price:
+        price_position = math.log1p(price) - math.log1p(average_price)
+    else:
+        price_position = 0.0
+    item_categories = category_ids(categories)
+    category_match = 1.0 if item_categories and item_categories[0] in top_categories else 0.0
+    return [hybrid_score or 0.0, exact_match or 0.0, cosine_similarity or 0.0, price_position, category_match]
+
+
+#**********************
+#PERSISTENCE
+#**********************
+
+def load_relevance_model(name='global', min_samples=0):
+    """The stored model, or None if there isn't one trained on at least min_samples labels"""
+    state = db.session.get(RelevanceModelState, name)
+    if state is None or (state.samples or 0) < min_samples:
+        return None
+    return RelevanceModel(json.loads(state.weights))
+
+def save_relevance_model(model, samples, last_feedback_at, trained_at, name='global'):
+    state = db.session.get(RelevanceModelState, name) or RelevanceModelState(name=name)
+    state.weights = json.dumps(model.weights.tolist())
+    state.samples = samples
+    state.last_feedback_at = last_feedback_at
+    state.trained_at = trained_at
+    db.session.add(state)
+    db.session.commit()
+
+
+__all__ = [
+    'FEATURES', 'RelevanceModel', 'keyword_profile', 'clear_keyword_profiles', 'build_features',
+    'load_relevance_model', 'save_relevance_model',
+]
@@ -0,0 +1,169 @@
+import threading
+import time
+from datetime import timezone
+from flask import current_app
+from app.utils.scraper import scrape_ebay, scrape_new_items
+from app.utils.search_expressions import ebay_query_terms
+from app.utils.text_helpers import filter_items_for_query
+
+# Page size bounds for recent polls
+MIN_RECENT_LIMIT = 20
+MAX_RECENT_LIMIT = 200
+
+class ScrapeCoalescer:
+    """
+    Single-flight, TTL-cached scrapes keyed on a scrape signature.
+    Concurrent callers with the same signature wait for the one scrape in
+    flight instead of starting their own, and later callers reuse the
+    result until it is older than the TTL.
+    """
+    def __init__(self):
+        self._entries = {}  # signature -> (expires_at, items)
+        self._locks = {}
+        self._guard = threading.Lock()
+        self._recent_limits = {}  # signature -> adaptive page size for recent polls
+        self._newest_seen = {}  # signature -> newest itemCreationDate seen by a recent poll
+
+    def _lock_for(self, signature):
+        with self._guard:
+            return self._locks.setdefault(signature, threading.Lock())
+
+    def fetch(self, signature, ttl, scrape, force=False):
+        with self._lock_for(signature):
+            entry = self._entries.get(signature)
+            if entry and time.monotonic() < entry[0] and not force:
+                return entry[1]
+
+            items = scrape()
+            self._entries[signature] = (time.monotonic() + ttl, items)
+        self._prune()
+        return items
+
+    def _prune(self):
+        # Drop expired results so idle keywords don't pin their items in memory
+        now = time.monotonic()
+        with self._guard:
+            for signature, (expires_at, _) in list(self._entries.items()):
+                if expires_at < now:
+                    del self._entries[signature]
+
+    def recent_limit(self, signature):
+        return self._recent_limits.get(signature, MAX_RECENT_LIMIT)
+
+    def record_recent_page(self, signature, items):
+        """
+        Size the next recent poll from how many listings appeared since the
+        last one: twice the new count, between MIN_RECENT_LIMIT and MAX_RECENT_LIMIT
+        """
+        newest_seen = self._newest_seen.get(signature)
+        created = [_as_utc(item.get('start_time')) for item in items if item.get('start_time')]
+        if newest_seen is None:
+            new_count = len(items)
+        else:
+            new_count = sum(1 for value in created if value > newest_seen)
+
+        if created:
+            self._newest_seen[signature] = max(created)
+        self._recent_limits[signature] = min(max(new_count * 2, MIN_RECENT_LIMIT), MAX_RECENT_LIMIT)
+
+    def clear(self):
+        with self._guard:
+            self._entries.clear()
+            self._recent_limits.clear()
+            self._newest_seen.clear()
+
+
+coalescer = ScrapeCoalescer()
+
+def scrape_signature(query, kind):
+    """Everything that changes the eBay request; price and keyword filters are applied locally"""
+    return (
+        kind,
+        query.keyword_id,
+        query.marketplace,
+        query.item_location,
+        query.condition or '',
+        ebay_query_terms(query.required_keywords)
+    )
+
+def search_keywords(query):
+    """The eBay q for a query: its keyword plus whatever of its required expression can be pushed down"""
+    pushed_down = ebay_query_terms(query.required_keywords)
+    keyword_text = query.keyword.keyword_text
+    return f"{keyword_text} {pushed_down}" if pushed_down else keyword_text
+
+def scrape_query_items(query):
+    """
+    Full scan of the query's keyword, scraped once per signature per interval;
+    this query's price range and required/excluded keywords are applied to the
+    shared result. Recent polls go through scrape_recent_query_items
+    """
+    keyword_text = search_keywords(query)
+    filters = {'item_location': query.item_location, 'condition': query.condition}
+    signature = scrape_signature(query, 'full')
+    ttl = current_app.config.get('SCRAPE_COALESCE_FULL_SECONDS', 3600)
+    items = coalescer.fetch(
+        signature, ttl, lambda: scrape_ebay(keyword_text, filters=filters, marketplace=query.marketplace)
+    )
+    return filter_items_for_query(items, query)
+
+def scrape_recent_query_items(query):
+    """
+    Recent poll that only returns listings newer than the query's high-water
+    mark (last_seen_ebay_id / last_seen_created_at).
+    Returns (items, high_water_mark) where high_water_mark is the
+    (ebay_id, start_time) of the newest listing on the page, or None.
+    """
+    keyword_text = search_keywords(query)
+    filters = {'item_location': query.item_location, 'condition': query.condition}
+    signature = scrape_signature(query, 'recent')
+    ttl = current_app.config.get('SCRAPE_COALESCE_RECENT_SECONDS', 120)
+
+    polled = []
+    def poll(limit):
+        polled.append(limit)
+        return scrape_new_items(keyword_text, filters=filters, marketplace=query.marketplace, limit=limit)
+
+    limit = coalescer.recent_limit(signature)
+    items = coalescer.fetch(signature, ttl, lambda: poll(limit))
+    new_items = items_since(items, query.last_seen_ebay_id, query.last_seen_created_at)
+
+    # A full short page may stop before this query's mark, so fill the gap with a full page
+    if len(new_items) == len(items) and len(items) < MAX_RECENT_LIMIT and len(items) >= limit and query.last_seen_created_at:
+        items = coalescer.fetch(signature, ttl, lambda: poll(MAX_RECENT_LIMIT), force=True)
+        new_items = items_since(items, query.last_seen_ebay_id, query.last_seen_created_at)
+
+    # Sized from the final page only: recording the short page first would make the
+    # refill look like it had nothing new and shrink the next poll right after a gap
+    if polled:
+        coalescer.record_recent_page(signature, items)
+
+    high_water_mark = None
+    if items and items[0].get('ebay_id'):
+        high_water_mark = (items[0]['ebay_id'], items[0].get('start_time'))
+    return filter_items_for_query(new_items, query), high_water_mark
+
+def items_since(items, last_seen_ebay_id, last_seen_created_at):
+    """
+    Leading run of a newlyListed page that is newer than the high-water mark.
+    Stops at the last seen listing or the first one created before it.
+    """
+    last_seen_created_at = _as_utc(last_seen_created_at)
+    newer = []
+    for item in items:
+        if last_seen_ebay_id and item.get('ebay_id') == last_seen_ebay_id:
+            break
+        created = _as_utc(item.get('start_time'))
+        if last_seen_created_at and created and created < last_seen_created_at:
+            break
+        newer.append(item)
+    return newer
+
+def _as_utc(value):
+    # SQLite hands back naive datetimes, the API parser gives aware ones
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+__all__ = ['ScrapeCoalescer', 'coalescer', 'scrape_signature', 'search_keywords', 'scrape_query_items', 'scrape_recent_query_items', 'items_since']
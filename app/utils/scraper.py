@@ -1,5 +1,7 @@
+import asyncio
 from flask import current_app
 from app.ebay.api import EbayAPI
+from app.ebay.async_api import AsyncEbayAPI
 from threading import local
 from circuitbreaker import circuit
 
@@ -10,13 +12,19 @@ def create_ebay_client():
         _thread_local.ebay_client = EbayAPI()
     return _thread_local.ebay_client
 
+def create_async_ebay_client():
+    if not hasattr(_thread_local, 'async_ebay_client'):
+        _thread_local.async_ebay_client = AsyncEbayAPI()
+    return _thread_local.async_ebay_client
+
 @circuit(
     failure_threshold=3, 
     recovery_timeout=60
 )
 def scrape_ebay(keywords, filters=None, marketplace='EBAY_GB', required_keywords=None, excluded_keywords=None):
-    api = create_ebay_client()
-    return api.custom_search_query(
+    # Full scans span several pages, so fetch them concurrently
+    api = create_async_ebay_client()
+    return asyncio.run(api.custom_search_query(
         keywords=keywords,
         filters=filters,
         sort_order='newlyListed',
@@ -24,9 +32,9 @@ def scrape_ebay(keywords, filters=None, marketplace='EBAY_GB', required_keywords
         marketplace=marketplace,
         required_keywords=required_keywords,
         excluded_keywords=excluded_keywords
-    )
+    ))
     
-def scrape_new_items(keywords, filters=None, marketplace='EBAY_GB', required_keywords=None, excluded_keywords=None):
+def scrape_new_items(keywords, filters=None, marketplace='EBAY_GB', required_keywords=None, excluded_keywords=None, limit=200):
     api = create_ebay_client()
     return api.custom_search_query(
         keywords=keywords,
@@ -35,5 +43,6 @@ def scrape_new_items(keywords, filters=None, marketplace='EBAY_GB', required_key
         max_pages=1,
         marketplace=marketplace,
         required_keywords=required_keywords,
-        excluded_keywords=excluded_keywords
+        excluded_keywords=excluded_keywords,
+        page_size=limit
     )
\ No newline at end of file
@@ -0,0 +1,240 @@
+import re
+from functools import lru_cache
+from app.utils.keyword_matcher import get_keyword_matcher, parse_keywords
+
+# Operators are only recognised in upper case, so 'or' / 'not' stay ordinary words
+OPERATORS = ('AND', 'OR', 'NOT')
+TOKEN_RE = re.compile(r'\s*(?:(\()|(\))|"([^"]*)"|([^\s()"]+))')
+
+
+class SearchExpressionError(ValueError):
+    pass
+
+
+def is_expression(text):
+    """
+    Whether text uses the expression syntax rather than a legacy comma-separated list.
+    Anything with a comma is a legacy list, so saved lists such as 'spares, NOT WORKING'
+    keep their meaning; expressions never need one
+    """
+    if not text or ',' in text:
+        return False
+    return any(c in text for c in '()"') or any(word in OPERATORS for word in text.split())
+
+def tokenize(text):
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = TOKEN_RE.match(text, position)
+        if match is None:
+            raise SearchExpressionError(f"Unbalanced quote at position {position}")
+        opening, closing, phrase, word = match.groups()
+        if opening:
+            tokens.append(('(', None))
+        elif closing:
+            tokens.append((')', None))
+        elif phrase is not None:
+            if phrase.strip():
+                tokens.append(('term', ' '.join(phrase.lower().split())))
+        elif word in OPERATORS:
+            tokens.append((word, None))
+        else:
+            tokens.append(('term', word.lower()))
+        position = match.end()
+    return tokens
+
+
+class Parser:
+    """
+    Recursive descent over:
+        or   := and (OR and)*
+        and  := not ([AND] not)*      adjacent terms are ANDed
+        not  := NOT not | atom
+        atom := '(' or ')' | word | "quoted phrase"
+    Nodes are tuples: ('term', text), ('substring', text), ('not', node),
+    ('and', (nodes...)), ('or', (nodes...)).
+    """
+    def __init__(self, text):
+        self.tokens = tokenize(text)
+        self.position = 0
+
+    def parse(self):
+        if not self.tokens:
+            return None
+        node = self._or()
+        if self.position != len(self.tokens):
+            raise SearchExpressionError(f"Unexpected {self.tokens[self.position][0]!r}")
+        return node
+
+    def _peek(self):
+        return self.tokens[self.position][0] if self.position < len(self.tokens) else None
+
+    def _take(self, kind):
+        if self._peek() != kind:
+            raise SearchExpressionError(f"Expected {kind!r}")
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def _or(self):
+        nodes = [self._and()]
+        while self._peek() == 'OR':
+            self._take('OR')
+            nodes.append(self._and())
+        return nodes[0] if len(nodes) == 1 else ('or', tuple(nodes))
+
+    def _and(self):
+        nodes = [self._not()]
+        while self._peek() in ('AND', 'NOT', 'term', '('):
+            if self._peek() == 'AND':
+                self._take('AND')
+            nodes.append(self._not())
+        return nodes[0] if len(nodes) == 1 else ('and', tuple(nodes))
+
+    def _not(self):
+        if self._peek() == 'NOT':
+            self._take('NOT')
+            return ('not', self._not())
+        return self._atom()
+
+    def _atom(self):
+        kind = self._peek()
+        if kind == '(':
+            self._take('(')
+            node = self._or()
+            self._take(')')
+            return node
+        if kind == 'term':
+            return self._take('term')
+        raise SearchExpressionError('Expected a keyword' if kind is None else f"Unexpected {kind!r}")
+
+
+def parse_expression(text):
+    """Expression text -> node tree (None when empty). Raises SearchExpressionError"""
+    return Parser(text or '').parse()
+
+def parse_required(text):
+    """Required keywords as a node: an expression, or every legacy keyword as a whole word"""
+    if is_expression(text):
+        return parse_expression(text)
+    keywords = parse_keywords(text)
+    return ('and', tuple(('term', kw) for kw in keywords)) if keywords else None
+
+def parse_excluded(text):
+    """Excluded keywords as a node that must NOT match: an expression, or any legacy keyword as a substring"""
+    if is_expression(text):
+        return parse_expression(text)
+    keywords = parse_keywords(text)
+    return ('or', tuple(('substring', kw) for kw in keywords)) if keywords else None
+
+
+#**********************
+#COMPILATION
+#**********************
+
+def compile_node(node, patterns):
+    """Node -> predicate over lower-cased text; each distinct term's regex is compiled once"""
+    kind, value = node
+    if kind in ('term', 'substring'):
+        if node not in patterns:
+            if kind == 'term':
+                words = r'\s+'.join(re.escape(word) for word in value.split())
+                patterns[node] = re.compile(rf'\b{words}\b').search
+            else:
+                patterns[node] = re.compile(re.escape(value)).search
+        search = patterns[node]
+        return lambda text: search(text) is not None
+    if kind == 'not':
+        inner = compile_node(value, patterns)
+        return lambda text: not inner(text)
+    children = [compile_node(child, patterns) for child in value]
+    if kind == 'and':
+        return lambda text: all(child(text) for child in children)
+    return lambda text: any(child(text) for child in children)
+
+
+class ExpressionFilter:
+    """Compiled required/excluded expressions; same interface as KeywordMatcher"""
+    def __init__(self, required=None, excluded=None):
+        self.required = required
+        self.excluded = excluded
+        patterns = {}
+        required_match = compile_node(required, patterns) if required else None
+        excluded_match = compile_node(excluded, patterns) if excluded else None
+        if required_match and excluded_match:
+            self.matches = lambda text: required_match(text) and not excluded_match(text)
+        elif required_match:
+            self.matches = required_match
+        elif excluded_match:
+            self.matches = lambda text: not excluded_match(text)
+        else:
+            self.matches = lambda text: True
+
+    def filter(self, items):
+        if self.required is None and self.excluded is None:
+            return list(items)
+        matches = self.matches
+        return [
+            item for item in items
+            if matches(f"{(item.get('title') or '').lower()} {(item.get('description') or '').lower()}")
+        ]
+
+
+@lru_cache(maxsize=1024)
+def _compiled_filter(required_keywords, excluded_keywords):
+    return ExpressionFilter(parse_required(required_keywords), parse_excluded(excluded_keywords))
+
+def get_search_filter(required_keywords, excluded_keywords):
+    """
+    Cached predicate for a query's required/excluded keywords. Legacy
+    comma-separated lists on both sides use the plain keyword matcher
+    """
+    if not is_expression(required_keywords) and not is_expression(excluded_keywords):
+        return get_keyword_matcher(required_keywords, excluded_keywords)
+    return _compiled_filter((required_keywords or '').strip(), (excluded_keywords or '').strip())
+
+
+#**********************
+#PUSHDOWN
+#**********************
+
+def _pushdown(node):
+    """
+    eBay q terms that every item matching `node` also matches, or None.
+    Only words, AND and OR-of-words are sent; the full predicate still runs locally.
+    """
+    kind, value = node
+    if kind == 'term':
+        return ' '.join(value.split())
+    if kind == 'and':
+        parts = [part for part in (_pushdown(child) for child in value) if part]
+        return ' '.join(parts) or None
+    if kind == 'or' and all(child[0] == 'term' and ' ' not in child[1] for child in value):
+        return '(' + ', '.join(child[1] for child in value) + ')'
+    return None
+
+@lru_cache(maxsize=1024)
+def ebay_query_terms(required_keywords):
+    """
+    Terms to add to the eBay q parameter for an expression in required_keywords.
+    Legacy lists are not pushed down, so those queries keep sharing their keyword's scrape
+    """
+    if not is_expression(required_keywords):
+        return ''
+    try:
+        node = parse_expression(required_keywords)
+    except SearchExpressionError:
+        return ''
+    return (_pushdown(node) or '') if node else ''
+
+def validate_search_expression(text):
+    """Raise SearchExpressionError if text is an invalid expression"""
+    if is_expression(text):
+        parse_expression(text)
+
+
+__all__ = [
+    'SearchExpressionError', 'ExpressionFilter', 'is_expression', 'parse_expression',
+    'get_search_filter', 'ebay_query_terms', 'validate_search_expression',
+]
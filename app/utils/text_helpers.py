@@ -1,47 +1,14 @@
-import re
 from decimal import Decimal, InvalidOperation
+from app.utils.search_expressions import get_search_filter
 
 
 def filter_items_by_keywords(items, required_keywords, excluded_keywords, min_price=None, max_price=None):
-    # Convert None to empty string for safety
-    required = required_keywords or ''
-    excluded = excluded_keywords or ''
-    
-    # Normalize inputs
-    req_kws = {kw.strip().lower() for kw in required.split(',') if kw.strip()}
-    excl_kws = {ekw.strip().lower() for ekw in excluded.split(',') if ekw.strip()}
-    
-    # Preprocess titles with null handling
-    processed = []
-    for item in items:
-        # Handle null title/description
-        title = (item.get('title') or '').lower()
-        description = (item.get('description') or '').lower()
-        full_text = f"{title} {description}"
-        
-        # Split into words from both title and description
-        words = set(re.findall(r'\w+', full_text))
-        processed.append((item, full_text, words))
-
-    # Filter logic
-    filtered = []
-    for item, full_text, words in processed:
-        # Required: all keywords present as whole words
-        req_ok = all(
-            re.search(rf'\b{re.escape(kw)}\b', full_text) 
-            for kw in req_kws
-        ) if req_kws else True
-        
-        # Excluded: none present as substrings
-        excl_ok = not any(
-            ekw in full_text
-            for ekw in excl_kws
-        ) if excl_kws else True
-        
-        if req_ok and excl_ok:
-            filtered.append(item)
-    
-    return filtered
+    """
+    Items whose title/description contain every required keyword as a whole word
+    and none of the excluded keywords (as substrings). Keywords are comma-separated,
+    or a search expression (see app/utils/search_expressions.py)
+    """
+    return get_search_filter(required_keywords, excluded_keywords).filter(items)
 
 def filter_items_by_price(items, min_price=None, max_price=None):
     filtered = []
@@ -73,4 +40,26 @@ def filter_items_by_price(items, min_price=None, max_price=None):
         if price_ok:
             filtered.append(item)
     
-    return filtered
\ No newline at end of file
+    return filtered
+
+def filter_items_for_query(items, query):
+    """
+    Apply one query's price range and required/excluded keywords to items
+    scraped for its keyword (the items are shared between queries, so treat them as read-only)
+    """
+    min_dec = Decimal(str(query.min_price)) if query.min_price is not None else None
+    max_dec = Decimal(str(query.max_price)) if query.max_price is not None else None
+
+    in_range = []
+    for item in items:
+        if min_dec is not None or max_dec is not None:
+            if item.get('price') is None:
+                continue
+            item_price = Decimal(str(item.get('price')))
+            if min_dec is not None and item_price < min_dec:
+                continue
+            if max_dec is not None and item_price > max_dec:
+                continue
+        in_range.append(item)
+
+    return filter_items_by_keywords(in_range, query.required_keywords, query.excluded_keywords)
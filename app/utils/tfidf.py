@@ -0,0 +1,95 @@
+import threading
+import zlib
+import numpy as np
+from app.utils.levenshtein_string_similarity_helper import normalize_special_terms, preprocess_text
+
+# Tokens are hashed into this many features, so no global vocabulary is needed
+N_FEATURES = 1 << 18
+
+
+def hashed_features(text):
+    """Feature ids of the normalized tokens in `text` (crc32, so stable across processes)"""
+    tokens = normalize_special_terms(preprocess_text(text or '')).split()
+    return [zlib.crc32(token.encode()) % N_FEATURES for token in tokens]
+
+
+class KeywordTfidf:
+    """
+    TF-IDF model for one keyword. Document frequencies are kept sparsely
+    per hashed feature and grow as new titles arrive; a batch of titles is
+    scored against the keyword with one matrix-vector product over just
+    the features present in the batch.
+    """
+    def __init__(self, keyword_text):
+        self.keyword_text = keyword_text
+        self.query_features = hashed_features(keyword_text)
+        self.document_frequency = {}
+        self.documents = 0
+        self._lock = threading.Lock()
+
+    def update(self, titles):
+        """Count new titles into the document frequencies"""
+        with self._lock:
+            for title in titles:
+                for feature in set(hashed_features(title)):
+                    self.document_frequency[feature] = self.document_frequency.get(feature, 0) + 1
+                self.documents += 1
+
+    def idf(self, features):
+        with self._lock:
+            df = np.fromiter((self.document_frequency.get(f, 0) for f in features), dtype=np.float64, count=len(features))
+            documents = self.documents
+        # Smoothed, as if one extra document contained every feature
+        return np.log((1.0 + documents) / (1.0 + df)) + 1.0
+
+    def cosine_similarities(self, titles):
+        """Cosine similarity between the keyword and each title, as a float array"""
+        title_features = [hashed_features(title) for title in titles]
+        if not titles or not self.query_features:
+            return np.zeros(len(titles))
+
+        # Local column for every feature in the batch (and the keyword)
+        columns = {}
+        for features in [self.query_features] + title_features:
+            for feature in features:
+                columns.setdefault(feature, len(columns))
+
+        rows = np.repeat(np.arange(len(titles)), [len(features) for features in title_features])
+        cols = np.fromiter((columns[f] for features in title_features for f in features), dtype=np.int64, count=len(rows))
+        tf = np.zeros((len(titles), len(columns)))
+        np.add.at(tf, (rows, cols), 1.0)
+        query = np.zeros(len(columns))
+        np.add.at(query, [columns[f] for f in self.query_features], 1.0)
+
+        idf = self.idf(list(columns))
+        tfidf = tf * idf
+        query *= idf
+
+        norms = np.linalg.norm(tfidf, axis=1) * np.linalg.norm(query)
+        dots = tfidf @ query
+        return np.divide(dots, norms, out=np.zeros(len(titles)), where=norms > 0)
+
+
+_models = {}
+_models_lock = threading.Lock()
+
+def get_keyword_tfidf(keyword_id, keyword_text, load_titles=None):
+    """
+    Process-wide KeywordTfidf for a keyword. The first call seeds the
+    document frequencies from `load_titles()` (titles already scored for it).
+    """
+    with _models_lock:
+        model = _models.get(keyword_id)
+        if model is None or model.keyword_text != keyword_text:
+            model = KeywordTfidf(keyword_text)
+            if load_titles:
+                model.update(load_titles())
+            _models[keyword_id] = model
+        return model
+
+def clear_tfidf_models():
+    with _models_lock:
+        _models.clear()
+
+
+__all__ = ['KeywordTfidf', 'get_keyword_tfidf', 'clear_tfidf_models', 'hashed_features']
@@ -31,6 +31,70 @@ class Config:
     LOG_LEVEL = 'INFO'
     TESTING = False
 
+    #eBay client
+    EBAY_TOKEN_URL = os.getenv('EBAY_TOKEN_URL', 'https://api.ebay.com/identity/v1/oauth2/token')
+    EBAY_BROWSE_URL = os.getenv('EBAY_BROWSE_URL', 'https://api.ebay.com/buy/browse/v1')
+    EBAY_SHARED_STATE_URL = os.getenv('EBAY_SHARED_STATE_URL', os.path.join(project_root, 'instance', 'ebay_state'))  # Directory or redis:// URL
+    EBAY_TOKEN_REFRESH_MARGIN = 300  # Seconds before expiry the token is refreshed in the background
+    EBAY_RATE_LIMIT_PER_SECOND = float(os.getenv('EBAY_RATE_LIMIT_PER_SECOND', 5))  # Token bucket refill rate
+    EBAY_RATE_LIMIT_BURST = int(os.getenv('EBAY_RATE_LIMIT_BURST', 10))
+    EBAY_RATE_LIMIT_MAX_WAIT = 2.0  # Longer waits raise RateLimitExceeded instead of holding the thread
+    EBAY_DAILY_CALL_LIMIT = int(os.getenv('EBAY_DAILY_CALL_LIMIT', 5000))  # Browse API daily allowance
+    EBAY_RATE_HISTOGRAM_WINDOW = 600  # Seconds of per-second call counts kept (flask request-histogram)
+    EBAY_RESPONSE_CACHE_TTL = int(os.getenv('EBAY_RESPONSE_CACHE_TTL', 60))  # Seconds, 0 disables the cache
+    EBAY_RESPONSE_CACHE_SIZE = 512  # Responses kept in memory per process
+    EBAY_RESPONSE_CACHE_DIR = os.getenv('EBAY_RESPONSE_CACHE_DIR')  # Optional compressed on-disk tier
+    EBAY_MAX_CONCURRENT_PAGES = int(os.getenv('EBAY_MAX_CONCURRENT_PAGES', 4))  # Pages fetched at once by AsyncEbayAPI
+
+    #Scraping
+    # Queries sharing a keyword signature reuse one scrape for this long (seconds)
+    SCRAPE_COALESCE_RECENT_SECONDS = 120
+    SCRAPE_COALESCE_FULL_SECONDS = 3600
+    # Scraped items are matched against the database this many at a time
+    PROCESS_ITEMS_BATCH_SIZE = 500
+
+    #Relevance model
+    # The learned model filters items once it has this many feedback labels
+    RELEVANCE_MODEL_MIN_SAMPLES = 50
+    RELEVANCE_MODEL_THRESHOLD = 0.5
+    # Older labels replayed alongside new feedback when the model is updated
+    RELEVANCE_MODEL_REPLAY_SAMPLES = 500
+
+    #Scrape workers
+    # 'threads' runs scrapes on the dispatcher's thread pool, 'celery' sends them to
+    # scrape.<kind>.<marketplace> queues for Celery workers (app/jobs/celery_worker.py)
+    SCRAPE_BACKEND = os.getenv('SCRAPE_BACKEND', 'threads')
+    CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+    CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND')
+
+    #Scheduler job store
+    # memory:// (default), redis://... or a SQLAlchemy URL such as postgresql://...
+    # Keep it off the app's SQLite file so the scheduler doesn't fight it for the write lock.
+    # One store per scheduler node: APScheduler can't share a store between running schedulers
+    SCHEDULER_JOBSTORE_URL = os.getenv('SCHEDULER_JOBSTORE_URL', 'memory://')
+    SCHEDULER_JOBSTORE_POOL_SIZE = int(os.getenv('SCHEDULER_JOBSTORE_POOL_SIZE', 5))
+    SCHEDULER_JOBSTORE_MAX_OVERFLOW = int(os.getenv('SCHEDULER_JOBSTORE_MAX_OVERFLOW', 5))
+    SCHEDULER_JOBSTORE_POOL_RECYCLE = 1800  # Seconds
+
+    #Dispatcher
+    # Scrape jobs run on this many threads; due queries are reloaded this often
+    DISPATCHER_MAX_WORKERS = 8
+    DISPATCHER_RELOAD_SECONDS = 30
+    # A run turned away by the rate limiter is retried after its back-off, but no later than this (seconds)
+    SCRAPE_RATE_LIMIT_RETRY_MAX_SECONDS = 3600
+    # Each query runs at its own phase within its interval, plus up to this much random jitter
+    DISPATCHER_JITTER_SECONDS = 10
+    # New queries' first full scans, and runs missed e.g. across a restart, are spread over these windows
+    DISPATCHER_FIRST_RUN_SPREAD_SECONDS = 120
+    DISPATCHER_CATCHUP_SECONDS = 600
+    # Schedule changes are applied as they happen; this pass only catches drift
+    QUERY_RECONCILE_MINUTES = 15
+
+    #Auction alerts
+    # Alerts go out this many minutes before an auction ends
+    AUCTION_ALERT_LEAD_MINUTES = (720, 60)
+    AUCTION_ALERT_RELOAD_SECONDS = 60
+
     #Stripe
     STRIPE_PRICE_INDIVIDUAL = os.getenv('STRIPE_PRICE_INDIVIDUAL')
     STRIPE_PRICE_BUSINESS = os.getenv('STRIPE_PRICE_BUSINESS')
@@ -53,10 +117,12 @@ class TestingConfig(Config):
     EBAY_CLIENT_ID = os.getenv('EBAY_CLIENT_ID')
     EBAY_CLIENT_SECRET = os.getenv('EBAY_CLIENT_SECRET')
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    ENCRYPTION_KEY = os.getenv('ENCRYPTION_KEY', 'vBvC8wWl4hOYzWqXZ5eM3ihy0m6b5hbcBT4Ue9pVYfE=')  # Throwaway key for tests
     WTF_CSRF_ENABLED = False
     TESTING = True
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     TELEGRAM_BOT_TOKEN = '7914809074'
+    CELERY_BROKER_URL = 'memory://'
 
 class SchedulerConfig(Config):
     # Inherit DB settings